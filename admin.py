@@ -1,11 +1,24 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.database import db, User, Course, CourseSection, CourseLesson, Quiz, QuizQuestion, Article, Game, AITool
-from src.models.database import Category, Comment, CommunityPost, Forum, ForumPost, CourseRating, UserQuizAttempt, UserGameScore
+from src.models.database import Category, Comment, CommunityPost, Forum, ForumPost, UserQuizAttempt, UserGameScore
+from src.models.database import CourseCategory, ArticleCategory, UserCourseProgress, CourseRatingSummary, FeaturedCourse
+from src.models.database import QuizCounter, QuizQuestionAnswerHash, QuizQuestionTestCase
+from src.models.answer_keys import bump_quiz_version, store_answer_hash
+from src.models.course_facets import refresh_course_facets
+from src.models.featured_ranking import get_featured_ranking, schedule_featured_refresh
+from src.models.question_import import IMPORT_FORMATS, import_questions, read_rows
+from src.models.lesson_progress import delete_user_completions
+from src.models.quiz_attempts import delete_quiz_scores, delete_user_scores
+from src.models.quiz_counters import bump_quiz_counters, counter_fields
 from src.models.user import get_user_by_id
+from src.utils.pagination import keyset_paginate, wants_cursor, wants_total
+from src.utils.query_budget import query_budget
+from src.utils.response_cache import course_cache
 from werkzeug.security import generate_password_hash
 import datetime
 from sqlalchemy import func, desc
+from sqlalchemy.orm import defer, selectinload
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -25,6 +38,7 @@ def admin_required(fn):
     return wrapper
 
 @admin_bp.route('/admin/dashboard', methods=['GET'])
+@query_budget(9)
 @admin_required
 def admin_dashboard():
     """Get admin dashboard statistics"""
@@ -74,6 +88,7 @@ def admin_dashboard():
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/users', methods=['GET'])
+@query_budget(3)
 @admin_required
 def admin_get_users():
     """Get all users (admin view)"""
@@ -81,7 +96,23 @@ def admin_get_users():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
-        users = User.query.paginate(page=page, per_page=per_page, error_out=False)
+        # Paginate (keyset mode when a cursor is sent, page/per_page otherwise)
+        if wants_cursor(request.args):
+            users = keyset_paginate(
+                User.query, [User.id], request.args.get('cursor'), per_page,
+                with_total=wants_total(request.args)
+            )
+            pagination = users.to_dict()
+        else:
+            users = User.query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination = {
+                'page': users.page,
+                'pages': users.pages,
+                'per_page': users.per_page,
+                'total': users.total,
+                'has_next': users.has_next,
+                'has_prev': users.has_prev
+            }
         
         users_list = [{
             'id': user.id,
@@ -95,16 +126,11 @@ def admin_get_users():
         
         return jsonify({
             'users': users_list,
-            'pagination': {
-                'page': users.page,
-                'pages': users.pages,
-                'per_page': users.per_page,
-                'total': users.total,
-                'has_next': users.has_next,
-                'has_prev': users.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -132,6 +158,9 @@ def admin_update_user(user_id):
         
         db.session.commit()
         
+        # Course payloads embed the authors of recent ratings
+        course_cache.clear()
+        
         return jsonify({
             'message': 'User updated successfully',
             'user': {
@@ -159,8 +188,12 @@ def admin_delete_user(user_id):
         if user_id == current_user_id:
             return jsonify({'error': 'Cannot delete your own account'}), 400
         
+        # Side tables keyed on the user (leaderboards, history, lesson bitmaps) go first
+        delete_user_scores(user_id)
+        delete_user_completions(user_id)
         db.session.delete(user)
         db.session.commit()
+        course_cache.clear()
         
         return jsonify({
             'message': 'User deleted successfully'
@@ -170,6 +203,7 @@ def admin_delete_user(user_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/courses', methods=['GET'])
+@query_budget(4)
 @admin_required
 def admin_get_courses():
     """Get all courses (admin view)"""
@@ -177,7 +211,34 @@ def admin_get_courses():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
-        courses = Course.query.paginate(page=page, per_page=per_page, error_out=False)
+        # Paginate (keyset mode when a cursor is sent, page/per_page otherwise)
+        if wants_cursor(request.args):
+            courses = keyset_paginate(
+                Course.query, [Course.id], request.args.get('cursor'), per_page,
+                with_total=wants_total(request.args)
+            )
+            pagination = courses.to_dict()
+        else:
+            courses = Course.query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination = {
+                'page': courses.page,
+                'pages': courses.pages,
+                'per_page': courses.per_page,
+                'total': courses.total,
+                'has_next': courses.has_next,
+                'has_prev': courses.has_prev
+            }
+        
+        # Get section counts for the whole page in one grouped query
+        course_ids = [course.id for course in courses.items]
+        section_counts = {}
+        if course_ids:
+            section_counts = dict(db.session.query(
+                CourseSection.course_id,
+                func.count(CourseSection.id)
+            ).filter(
+                CourseSection.course_id.in_(course_ids)
+            ).group_by(CourseSection.course_id).all())
         
         courses_list = [{
             'id': course.id,
@@ -187,21 +248,16 @@ def admin_get_courses():
             'programming_language': course.programming_language,
             'youtube_video_id': course.youtube_video_id,
             'created_at': course.created_at.isoformat() if course.created_at else None,
-            'sections_count': len(course.sections)
+            'sections_count': section_counts.get(course.id, 0)
         } for course in courses.items]
         
         return jsonify({
             'courses': courses_list,
-            'pagination': {
-                'page': courses.page,
-                'pages': courses.pages,
-                'per_page': courses.per_page,
-                'total': courses.total,
-                'has_next': courses.has_next,
-                'has_prev': courses.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -237,6 +293,7 @@ def admin_create_course():
         
         db.session.add(course)
         db.session.commit()
+        refresh_course_facets()
         
         return jsonify({
             'message': 'Course created successfully',
@@ -285,6 +342,9 @@ def admin_update_course(course_id):
         
         course.updated_at = datetime.datetime.utcnow()
         db.session.commit()
+        course_cache.bump(course_id)
+        schedule_featured_refresh()
+        refresh_course_facets()
         
         return jsonify({
             'message': 'Course updated successfully',
@@ -304,8 +364,15 @@ def admin_delete_course(course_id):
     try:
         course = Course.query.get_or_404(course_id)
         
+        # Delete the rating summary and ranking entry first
+        CourseRatingSummary.query.filter_by(course_id=course_id).delete()
+        FeaturedCourse.query.filter_by(course_id=course_id).delete()
+        
         db.session.delete(course)
         db.session.commit()
+        course_cache.bump(course_id)
+        schedule_featured_refresh()
+        refresh_course_facets()
         
         return jsonify({
             'message': 'Course deleted successfully'
@@ -360,33 +427,26 @@ def create_admin_user():
 
 # Home Page Management
 @admin_bp.route('/admin/homepage', methods=['GET'])
+@query_budget(5)
 @admin_required
 def admin_get_homepage_settings():
     """Get homepage settings"""
     try:
-        # Get featured courses
-        featured_courses = db.session.query(
-            Course,
-            func.avg(CourseRating.rating).label('avg_rating'),
-            func.count(CourseRating.id).label('rating_count')
-        ).outerjoin(CourseRating).group_by(Course.id).order_by(
-            func.avg(CourseRating.rating).desc()
-        ).limit(6).all()
-        
-        featured_courses_list = []
-        for course, avg_rating, rating_count in featured_courses:
-            featured_courses_list.append({
-                'id': course.id,
-                'title': course.title,
-                'language': course.language,
-                'level': course.level,
-                'youtube_video_id': course.youtube_video_id,
-                'average_rating': round(float(avg_rating), 1) if avg_rating else 0,
-                'rating_count': rating_count or 0
-            })
+        # Get featured courses (precomputed ranking, held in memory)
+        featured_courses_list = [{
+            'id': course['id'],
+            'title': course['title'],
+            'language': course['language'],
+            'level': course['level'],
+            'youtube_video_id': course['youtube_video_id'],
+            'average_rating': course['average_rating'],
+            'rating_count': course['rating_count']
+        } for course in get_featured_ranking(limit=6)]
         
         # Get latest articles
-        latest_articles = Article.query.filter_by(is_published=True).order_by(
+        latest_articles = Article.query.options(
+            selectinload(Article.author)
+        ).filter_by(is_published=True).order_by(
             Article.created_at.desc()
         ).limit(5).all()
         
@@ -444,21 +504,28 @@ def admin_update_homepage_banner():
 
 # Category Management
 @admin_bp.route('/admin/categories', methods=['GET'])
+@query_budget(4)
 @admin_required
 def admin_get_categories():
     """Get all categories"""
     try:
         categories = Category.query.all()
         
+        # Count courses and articles for all categories in two grouped queries
+        course_counts = dict(db.session.query(
+            CourseCategory.category_id,
+            func.count(CourseCategory.course_id)
+        ).group_by(CourseCategory.category_id).all())
+        
+        article_counts = dict(db.session.query(
+            ArticleCategory.category_id,
+            func.count(ArticleCategory.article_id)
+        ).group_by(ArticleCategory.category_id).all())
+        
         categories_list = []
         for category in categories:
-            course_count = db.session.query(func.count(CourseCategory.course_id)).filter(
-                CourseCategory.category_id == category.id
-            ).scalar()
-            
-            article_count = db.session.query(func.count(ArticleCategory.article_id)).filter(
-                ArticleCategory.category_id == category.id
-            ).scalar()
+            course_count = course_counts.get(category.id)
+            article_count = article_counts.get(category.id)
             
             categories_list.append({
                 'id': category.id,
@@ -531,6 +598,7 @@ def admin_update_category(category_id):
             category.description = data['description']
         
         db.session.commit()
+        course_cache.clear()
         
         return jsonify({
             'message': 'Category updated successfully',
@@ -578,6 +646,7 @@ def admin_delete_category(category_id):
 
 # Quiz Management
 @admin_bp.route('/admin/quizzes', methods=['GET'])
+@query_budget(3)
 @admin_required
 def admin_get_quizzes():
     """Get all quizzes (admin view)"""
@@ -585,39 +654,44 @@ def admin_get_quizzes():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
-        quizzes = Quiz.query.paginate(page=page, per_page=per_page, error_out=False)
+        # Paginate (keyset mode when a cursor is sent, page/per_page otherwise)
+        if wants_cursor(request.args):
+            quizzes = keyset_paginate(
+                Quiz.query, [Quiz.id], request.args.get('cursor'), per_page,
+                with_total=wants_total(request.args)
+            )
+            pagination = quizzes.to_dict()
+        else:
+            quizzes = Quiz.query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination = {
+                'page': quizzes.page,
+                'pages': quizzes.pages,
+                'per_page': quizzes.per_page,
+                'total': quizzes.total,
+                'has_next': quizzes.has_next,
+                'has_prev': quizzes.has_prev
+            }
         
         quizzes_list = []
         for quiz in quizzes.items:
-            # Get question count
-            question_count = QuizQuestion.query.filter_by(quiz_id=quiz.id).count()
-            
-            # Get attempt count
-            attempt_count = UserQuizAttempt.query.filter_by(quiz_id=quiz.id).count()
-            
+            # Counts come from the counter row joined into the same SELECT
             quizzes_list.append({
                 'id': quiz.id,
                 'title': quiz.title,
                 'programming_language': quiz.programming_language,
                 'level': quiz.level,
-                'question_count': question_count,
                 'time_limit_minutes': quiz.time_limit_minutes,
                 'created_at': quiz.created_at.isoformat() if quiz.created_at else None,
-                'attempt_count': attempt_count
+                **counter_fields(quiz)
             })
         
         return jsonify({
             'quizzes': quizzes_list,
-            'pagination': {
-                'page': quizzes.page,
-                'pages': quizzes.pages,
-                'per_page': quizzes.per_page,
-                'total': quizzes.total,
-                'has_next': quizzes.has_next,
-                'has_prev': quizzes.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -678,6 +752,7 @@ def admin_update_quiz(quiz_id):
         if 'time_limit_minutes' in data:
             quiz.time_limit_minutes = data['time_limit_minutes']
         
+        bump_quiz_version(quiz_id)
         db.session.commit()
         
         return jsonify({
@@ -698,14 +773,24 @@ def admin_delete_quiz(quiz_id):
     try:
         quiz = Quiz.query.get_or_404(quiz_id)
         
-        # Delete all questions first
+        # Delete all questions (with their test cases and answer hashes) first
+        question_ids = db.session.query(QuizQuestion.id).filter_by(quiz_id=quiz_id)
+        QuizQuestionTestCase.query.filter(
+            QuizQuestionTestCase.question_id.in_(question_ids)
+        ).delete(synchronize_session=False)
+        QuizQuestionAnswerHash.query.filter(
+            QuizQuestionAnswerHash.question_id.in_(question_ids)
+        ).delete(synchronize_session=False)
         QuizQuestion.query.filter_by(quiz_id=quiz_id).delete()
         
-        # Delete all attempts
+        # Delete all attempts (with their snapshots, gradings and best scores)
+        delete_quiz_scores(quiz_id)
         UserQuizAttempt.query.filter_by(quiz_id=quiz_id).delete()
+        QuizCounter.query.filter_by(quiz_id=quiz_id).delete()
         
         # Delete quiz
         db.session.delete(quiz)
+        bump_quiz_version(quiz_id)
         db.session.commit()
         
         return jsonify({
@@ -716,6 +801,7 @@ def admin_delete_quiz(quiz_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/quizzes/<int:quiz_id>/questions', methods=['GET'])
+@query_budget(4)
 @admin_required
 def admin_get_quiz_questions(quiz_id):
     """Get quiz questions (admin view)"""
@@ -724,6 +810,17 @@ def admin_get_quiz_questions(quiz_id):
         
         questions = QuizQuestion.query.filter_by(quiz_id=quiz_id).all()
         
+        # Get test cases of all questions in one query
+        test_cases = {}
+        if questions:
+            for case in QuizQuestionTestCase.query.filter(
+                QuizQuestionTestCase.question_id.in_([question.id for question in questions])
+            ).order_by(QuizQuestionTestCase.order_index, QuizQuestionTestCase.id):
+                test_cases.setdefault(case.question_id, []).append({
+                    'stdin': case.stdin,
+                    'expected_output': case.expected_output
+                })
+        
         questions_list = []
         for question in questions:
             questions_list.append({
@@ -734,7 +831,8 @@ def admin_get_quiz_questions(quiz_id):
                 'correct_answer': question.correct_answer,
                 'options': question.options,
                 'explanation': question.explanation,
-                'difficulty_points': question.difficulty_points
+                'difficulty_points': question.difficulty_points,
+                'test_cases': test_cases.get(question.id, [])
             })
         
         return jsonify({
@@ -773,6 +871,12 @@ def admin_create_quiz_question(quiz_id):
         )
         
         db.session.add(question)
+        db.session.flush()
+        if 'test_cases' in data:
+            _replace_test_cases(question.id, data['test_cases'])
+        store_answer_hash(question, quiz.programming_language)
+        bump_quiz_counters(quiz_id, questions=1)
+        bump_quiz_version(quiz_id)
         db.session.commit()
         
         return jsonify({
@@ -783,6 +887,35 @@ def admin_create_quiz_question(quiz_id):
             }
         }), 201
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/quizzes/<int:quiz_id>/questions/import', methods=['POST'])
+@admin_required
+def admin_import_quiz_questions(quiz_id):
+    """Import quiz questions from a streamed CSV or NDJSON body (admin view)"""
+    try:
+        quiz = Quiz.query.get_or_404(quiz_id)
+        
+        fmt = request.args.get('format') or IMPORT_FORMATS.get(request.mimetype)
+        if fmt not in ('csv', 'ndjson'):
+            return jsonify({'error': 'Send text/csv or application/x-ndjson (or ?format=csv|ndjson)'}), 415
+        
+        # Rows are read from the request stream as they arrive, never buffered whole
+        # Each committed chunk bumps the quiz version (answer keys and payloads of every worker)
+        imported, error_count, errors = import_questions(quiz, read_rows(request.stream, fmt))
+        
+        return jsonify({
+            'message': f'{imported} questions imported',
+            'imported': imported,
+            'failed': error_count,
+            'errors': errors
+        }), 200 if imported or not error_count else 400
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -809,7 +942,12 @@ def admin_update_quiz_question(question_id):
             question.explanation = data['explanation']
         if 'difficulty_points' in data:
             question.difficulty_points = data['difficulty_points']
+        if 'test_cases' in data:
+            _replace_test_cases(question.id, data['test_cases'])
+        if 'correct_answer' in data or 'question_type' in data:
+            store_answer_hash(question, Quiz.query.get(question.quiz_id).programming_language)
         
+        bump_quiz_version(question.quiz_id)
         db.session.commit()
         
         return jsonify({
@@ -820,6 +958,8 @@ def admin_update_quiz_question(question_id):
             }
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -829,8 +969,13 @@ def admin_delete_quiz_question(question_id):
     """Delete quiz question (admin view)"""
     try:
         question = QuizQuestion.query.get_or_404(question_id)
+        quiz_id = question.quiz_id
         
+        QuizQuestionTestCase.query.filter_by(question_id=question_id).delete()
+        QuizQuestionAnswerHash.query.filter_by(question_id=question_id).delete()
         db.session.delete(question)
+        bump_quiz_counters(quiz_id, questions=-1)
+        bump_quiz_version(quiz_id)
         db.session.commit()
         
         return jsonify({
@@ -840,18 +985,40 @@ def admin_delete_quiz_question(question_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _replace_test_cases(question_id, test_cases):
+    """Replace the test cases of a code question with [{'stdin', 'expected_output'}]"""
+    if not isinstance(test_cases, list) or not all(
+        isinstance(case, dict) and isinstance(case.get('expected_output'), str) for case in test_cases
+    ):
+        raise ValueError('test_cases must be a list of {stdin, expected_output}')
+    
+    QuizQuestionTestCase.query.filter_by(question_id=question_id).delete()
+    for index, case in enumerate(test_cases):
+        db.session.add(QuizQuestionTestCase(
+            question_id=question_id,
+            stdin=case.get('stdin') or '',
+            expected_output=case['expected_output'],
+            order_index=index
+        ))
+
 # Game Management
 @admin_bp.route('/admin/games', methods=['GET'])
+@query_budget(3)
 @admin_required
 def admin_get_games():
     """Get all games (admin view)"""
     try:
         games = Game.query.all()
         
+        # Get play counts for all games in one grouped query
+        play_counts = dict(db.session.query(
+            UserGameScore.game_id,
+            func.count(UserGameScore.user_id)
+        ).group_by(UserGameScore.game_id).all())
+        
         games_list = []
         for game in games:
-            # Get play count
-            play_count = UserGameScore.query.filter_by(game_id=game.id).count()
+            play_count = play_counts.get(game.id, 0)
             
             games_list.append({
                 'id': game.id,
@@ -954,6 +1121,7 @@ def admin_delete_game(game_id):
 
 # AI Tools Management
 @admin_bp.route('/admin/ai-tools', methods=['GET'])
+@query_budget(2)
 @admin_required
 def admin_get_ai_tools():
     """Get all AI tools (admin view)"""
@@ -1061,6 +1229,7 @@ def admin_delete_ai_tool(ai_tool_id):
 
 # Article Management
 @admin_bp.route('/admin/articles', methods=['GET'])
+@query_budget(6)
 @admin_required
 def admin_get_articles():
     """Get all articles (admin view)"""
@@ -1068,15 +1237,46 @@ def admin_get_articles():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
-        articles = Article.query.paginate(page=page, per_page=per_page, error_out=False)
+        # Authors and categories are batch-loaded with one IN query each; content is never read
+        articles_query = Article.query.options(
+            defer(Article.content),
+            selectinload(Article.author),
+            selectinload(Article.categories)
+        )
+        
+        # Paginate (keyset mode when a cursor is sent, page/per_page otherwise)
+        if wants_cursor(request.args):
+            articles = keyset_paginate(
+                articles_query, [Article.id], request.args.get('cursor'), per_page,
+                with_total=wants_total(request.args)
+            )
+            pagination = articles.to_dict()
+        else:
+            articles = articles_query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination = {
+                'page': articles.page,
+                'pages': articles.pages,
+                'per_page': articles.per_page,
+                'total': articles.total,
+                'has_next': articles.has_next,
+                'has_prev': articles.has_prev
+            }
+        
+        # Get comment counts for the whole page in one grouped query
+        article_ids = [article.id for article in articles.items]
+        comment_counts = {}
+        if article_ids:
+            comment_counts = dict(db.session.query(
+                Comment.commentable_id,
+                func.count(Comment.id)
+            ).filter(
+                Comment.commentable_type == 'article',
+                Comment.commentable_id.in_(article_ids)
+            ).group_by(Comment.commentable_id).all())
         
         articles_list = []
         for article in articles.items:
-            # Get comment count
-            comment_count = Comment.query.filter_by(
-                commentable_type='article',
-                commentable_id=article.id
-            ).count()
+            comment_count = comment_counts.get(article.id, 0)
             
             articles_list.append({
                 'id': article.id,
@@ -1092,16 +1292,11 @@ def admin_get_articles():
         
         return jsonify({
             'articles': articles_list,
-            'pagination': {
-                'page': articles.page,
-                'pages': articles.pages,
-                'per_page': articles.per_page,
-                'total': articles.total,
-                'has_next': articles.has_next,
-                'has_prev': articles.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1208,16 +1403,24 @@ def admin_delete_article(article_id):
 
 # Forum Management
 @admin_bp.route('/admin/forums', methods=['GET'])
+@query_budget(4)
 @admin_required
 def admin_get_forums():
     """Get all forums (admin view)"""
     try:
-        forums = Forum.query.all()
+        forums = Forum.query.options(selectinload(Forum.category)).all()
+        
+        # Get top-level post counts for all forums in one grouped query
+        post_counts = dict(db.session.query(
+            ForumPost.forum_id,
+            func.count(ForumPost.id)
+        ).filter(
+            ForumPost.parent_post_id.is_(None)
+        ).group_by(ForumPost.forum_id).all())
         
         forums_list = []
         for forum in forums:
-            # Get post count
-            post_count = ForumPost.query.filter_by(forum_id=forum.id, parent_post_id=None).count()
+            post_count = post_counts.get(forum.id, 0)
             
             forums_list.append({
                 'id': forum.id,
@@ -1333,6 +1536,7 @@ def admin_delete_forum(forum_id):
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/admin/forums/<int:forum_id>/posts', methods=['GET'])
+@query_budget(5)
 @admin_required
 def admin_get_forum_posts(forum_id):
     """Get forum posts (admin view)"""
@@ -1340,14 +1544,26 @@ def admin_get_forum_posts(forum_id):
         forum = Forum.query.get_or_404(forum_id)
         
         # Get top-level posts (no parent)
-        posts = ForumPost.query.filter_by(forum_id=forum_id, parent_post_id=None).order_by(
+        posts = ForumPost.query.options(
+            selectinload(ForumPost.user)
+        ).filter_by(forum_id=forum_id, parent_post_id=None).order_by(
             ForumPost.created_at.desc()
         ).all()
         
+        # Get reply counts for all posts in one grouped query
+        post_ids = [post.id for post in posts]
+        reply_counts = {}
+        if post_ids:
+            reply_counts = dict(db.session.query(
+                ForumPost.parent_post_id,
+                func.count(ForumPost.id)
+            ).filter(
+                ForumPost.parent_post_id.in_(post_ids)
+            ).group_by(ForumPost.parent_post_id).all())
+        
         posts_list = []
         for post in posts:
-            # Get reply count
-            reply_count = ForumPost.query.filter_by(parent_post_id=post.id).count()
+            reply_count = reply_counts.get(post.id, 0)
             
             posts_list.append({
                 'id': post.id,
@@ -1393,6 +1609,7 @@ def admin_delete_forum_post(post_id):
 
 # Statistics and Analytics
 @admin_bp.route('/admin/statistics', methods=['GET'])
+@query_budget(22)
 @admin_required
 def admin_get_statistics():
     """Get site statistics (admin view)"""
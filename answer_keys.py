@@ -0,0 +1,190 @@
+import threading
+from collections import OrderedDict
+from src.models.database import Quiz, QuizQuestion, QuizQuestionAnswerHash, QuizQuestionTestCase
+from src.models.content_versions import bump_version, get_version
+from src.models.code_grading import RUNNABLE_QUESTION_TYPES, normalize_output, question_fingerprint, sandbox_enabled
+from src.utils.answer_normalization import NORMALIZER_VERSION, answer_hash
+from src.utils.response_cache import quiz_cache
+from src.utils.sandbox import RUNNERS
+from src.utils.upsert import upsert
+
+# Question types graded by comparing code answers
+CODE_QUESTION_TYPES = ('code_output', 'code_completion', 'debugging')
+
+# Most answer keys kept per process
+ANSWER_KEY_MAX_ENTRIES = 500
+
+class CompiledQuestion:
+    """What grading and feedback need from one question"""
+
+    __slots__ = ('id', 'question_type', 'answer', 'points', 'correct_answer', 'explanation',
+                 'language', 'test_cases', 'fingerprint', 'reference_output')
+
+    def __init__(self, question, language=None, test_cases=(), stored_hash=None):
+        self.id = question.id
+        self.question_type = question.question_type
+        self.language = (language or '').lower()
+        # Code answers compare by canonical hash, precomputed when the question was saved
+        self.answer = stored_hash or normalize_answer(question.question_type, question.correct_answer, self.language)
+        self.points = question.difficulty_points or 0
+        self.correct_answer = question.correct_answer
+        self.explanation = question.explanation
+        self.test_cases = list(test_cases)
+        self.fingerprint = question_fingerprint(self.language, question.correct_answer, self.test_cases)
+        self.reference_output = None
+
+    @property
+    def runnable(self):
+        """Whether answers are graded by running them in the sandbox (never without one)"""
+        return self.question_type in RUNNABLE_QUESTION_TYPES and self.language in RUNNERS and sandbox_enabled()
+
+class AnswerKey:
+    """Compiled answer key of a quiz: question id -> CompiledQuestion, plus the max score"""
+
+    def __init__(self, quiz_id, version, questions, title=None):
+        self.quiz_id = quiz_id
+        self.title = title
+        self.version = version
+        self.questions = {question.id: question for question in questions}
+        self.max_score = sum(question.points for question in questions)
+
+    def grade(self, answers):
+        """Score submitted answers in memory; unknown or foreign question ids are skipped.
+
+        Each question counts once, for the first answer sent for it.
+        Returns (score, results, pending): `results` maps question id to
+        True/False for every answer decided here, `pending` lists
+        (question, answer, canonical hash) of code answers that did not
+        match the reference and must be run in the grading pool.
+        """
+        score = 0
+        results = {}
+        pending = []
+        for answer in answers:
+            if not isinstance(answer, dict):
+                continue
+            question = self.questions.get(_question_id(answer.get('question_id')))
+            user_answer = answer.get('answer')
+            if question is None or user_answer is None or question.id in results:
+                continue
+            normalized = normalize_answer(question.question_type, user_answer, question.language)
+            if normalized == question.answer:
+                results[question.id] = True
+                score += question.points
+            elif question.runnable:
+                results[question.id] = None
+                pending.append((question, str(user_answer), normalized))
+            else:
+                results[question.id] = False
+        return score, results, pending
+
+    def feedback(self):
+        """Correct answers and explanations, keyed by question id"""
+        return {
+            question_id: {
+                'correct_answer': question.correct_answer,
+                'explanation': question.explanation
+            }
+            for question_id, question in self.questions.items()
+        }
+
+def normalize_answer(question_type, value, language=None):
+    """Canonical form an answer is compared in (a hash for code answers)"""
+    if value is None:
+        return None
+    if question_type == 'code_output':
+        return normalize_output(value)
+    if question_type in CODE_QUESTION_TYPES:
+        return answer_hash(language, value)
+    return str(value)
+
+def store_answer_hash(question, language):
+    """Precompute the canonical hash of a question's correct answer (the caller commits)"""
+    if question.question_type not in RUNNABLE_QUESTION_TYPES or question.correct_answer is None:
+        QuizQuestionAnswerHash.query.filter_by(question_id=question.id).delete()
+        return None
+    upsert(QuizQuestionAnswerHash, {
+        'question_id': question.id,
+        'answer_hash': answer_hash(language, question.correct_answer),
+        'language': (language or '').lower(),
+        'normalizer_version': NORMALIZER_VERSION
+    }, ['question_id'])
+
+def _question_id(value):
+    # Clients send ids as numbers or numeric strings
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# ContentVersion scope of quiz content (questions, answers, test cases), keyed by quiz id
+QUIZ_SCOPE = 'quiz'
+
+_keys = OrderedDict()
+_lock = threading.Lock()
+
+def quiz_version(quiz_id):
+    """Persisted content version of a quiz; read it before loading questions"""
+    return get_version(QUIZ_SCOPE, quiz_id)
+
+def bump_quiz_version(quiz_id):
+    """Invalidate the answer key and cached payload of a quiz in every worker.
+
+    Call it in the transaction that changes the quiz content, before the
+    commit: the version is stored with the change. This process also
+    drops its copies right away.
+    """
+    bump_version(QUIZ_SCOPE, quiz_id)
+    with _lock:
+        _keys.pop(quiz_id, None)
+    quiz_cache.bump(quiz_id)
+
+def get_answer_key(quiz_id):
+    """The compiled answer key of a quiz (None if the quiz does not exist).
+
+    Served from memory while the persisted quiz version is unchanged (one
+    query); a miss costs four more (quiz, questions, test cases, answer
+    hashes).
+    """
+    version = quiz_version(quiz_id)
+    with _lock:
+        key = _keys.get(quiz_id)
+        if key is not None and key.version == version:
+            _keys.move_to_end(quiz_id)
+            return key
+
+    quiz = Quiz.query.get(quiz_id)
+    if quiz is None:
+        return None
+    questions = QuizQuestion.query.filter_by(quiz_id=quiz_id).all()
+
+    test_cases = {}
+    stored_hashes = {}
+    language = (quiz.programming_language or '').lower()
+    question_ids = [question.id for question in questions if question.question_type in RUNNABLE_QUESTION_TYPES]
+    if question_ids:
+        for case in QuizQuestionTestCase.query.filter(
+            QuizQuestionTestCase.question_id.in_(question_ids)
+        ).order_by(QuizQuestionTestCase.question_id, QuizQuestionTestCase.order_index, QuizQuestionTestCase.id):
+            test_cases.setdefault(case.question_id, []).append((case.stdin or '', case.expected_output))
+        # Hashes stored under another normalizer or language are recomputed in memory
+        stored_hashes = {
+            row.question_id: row.answer_hash
+            for row in QuizQuestionAnswerHash.query.filter(QuizQuestionAnswerHash.question_id.in_(question_ids))
+            if row.normalizer_version == NORMALIZER_VERSION and row.language == language
+        }
+
+    key = AnswerKey(quiz_id, version, [
+        CompiledQuestion(question, language, test_cases.get(question.id, ()), stored_hashes.get(question.id))
+        for question in questions
+    ], title=quiz.title)
+
+    with _lock:
+        # A newer key stored meanwhile (by a request that saw a later version) is kept
+        current = _keys.get(quiz_id)
+        if current is None or current.version <= version:
+            _keys[quiz_id] = key
+            _keys.move_to_end(quiz_id)
+            while len(_keys) > ANSWER_KEY_MAX_ENTRIES:
+                _keys.popitem(last=False)
+    return key
@@ -0,0 +1,98 @@
+import ast
+import hashlib
+import io
+import re
+import sys
+import tokenize
+
+# Bump when canonical forms change; stored hashes of another version are recomputed
+NORMALIZER_VERSION = f'3-py{sys.version_info[0]}.{sys.version_info[1]}'
+
+# Comment syntax per language family (languages not listed use C-style comments)
+HASH_COMMENT_LANGUAGES = {'python', 'ruby', 'bash', 'shell', 'perl', 'r'}
+DASH_COMMENT_LANGUAGES = {'sql', 'lua', 'haskell'}
+
+# Longer Python answers are not parsed (parse time and memory grow with them); they are compared by tokens
+MAX_PARSED_LENGTH = 20000
+
+# Python tokens that carry no meaning once block structure is kept (blank/continued lines, comments)
+_SKIPPED_PYTHON_TOKENS = {tokenize.NL, tokenize.COMMENT, tokenize.ENCODING, tokenize.ENDMARKER}
+
+# Block structure markers; never produced by _tokens, which splits `<` and `>` off words
+_PYTHON_LAYOUT_TOKENS = {tokenize.NEWLINE: '<newline>', tokenize.INDENT: '<indent>', tokenize.DEDENT: '<dedent>'}
+
+# Multi-character operators are one token each, so `a--b` and `a - -b` stay different
+_OPERATOR = r'>>>=|<<=|>>=|\*\*=|//=|===|!==|>>>|\.\.\.|->|=>|::|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||\*\*|//|[-+*/%&|^]='
+
+_TOKEN_PATTERNS = {
+    'c': re.compile(r'''
+        (?P<comment>//[^\n]*|/\*.*?\*/)
+      | (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`(?:\\.|[^`\\])*`)
+      | (?P<token>\w+|{operator}|[^\w\s])
+    '''.format(operator=_OPERATOR), re.VERBOSE | re.DOTALL),
+    'hash': re.compile(r'''
+        (?P<comment>\#[^\n]*)
+      | (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+      | (?P<token>\w+|{operator}|[^\w\s])
+    '''.format(operator=_OPERATOR), re.VERBOSE),
+    'dash': re.compile(r'''
+        (?P<comment>--[^\n]*)
+      | (?P<string>"(?:\\.|[^"\\])*"|'(?:''|[^'])*')
+      | (?P<token>\w+|{operator}|[^\w\s])
+    '''.format(operator=_OPERATOR), re.VERBOSE),
+}
+
+def canonicalize_code(language, source):
+    """Canonical form of a code answer: equal for programs that differ only in layout.
+
+    Python is parsed and dumped as an AST (formatting, comments, redundant
+    parentheses and quote style disappear). Python that does not parse,
+    nests too deeply or is longer than MAX_PARSED_LENGTH is reduced to its
+    tokens with line ends and indentation kept, since they decide which
+    block a statement belongs to. Other languages are reduced to their
+    tokens without comments.
+    """
+    source = str(source).replace('\r\n', '\n').replace('\r', '\n')
+    language = (language or '').lower()
+    if language != 'python':
+        return 'tokens:' + ' '.join(_tokens(language, source))
+    if len(source) <= MAX_PARSED_LENGTH:
+        try:
+            return 'ast:' + ast.dump(ast.parse(source.strip('\n')), annotate_fields=False, include_attributes=False)
+        except (SyntaxError, ValueError, RecursionError, MemoryError):
+            pass
+    return 'pytokens:' + ' '.join(_python_tokens(source))
+
+def answer_hash(language, source):
+    """SHA-256 of the canonical form; compared instead of the answers themselves"""
+    return hashlib.sha256(canonicalize_code(language, source).encode('utf-8')).hexdigest()
+
+def _tokens(language, source):
+    if language in HASH_COMMENT_LANGUAGES:
+        pattern = _TOKEN_PATTERNS['hash']
+    elif language in DASH_COMMENT_LANGUAGES:
+        pattern = _TOKEN_PATTERNS['dash']
+    else:
+        pattern = _TOKEN_PATTERNS['c']
+    for match in pattern.finditer(source):
+        if match.lastgroup != 'comment':
+            yield match.group()
+
+def _python_tokens(source):
+    """Python tokens without comments, with NEWLINE/INDENT/DEDENT markers (indentation width itself is layout)"""
+    try:
+        return [
+            _PYTHON_LAYOUT_TOKENS.get(token.type, token.string)
+            for token in tokenize.generate_tokens(io.StringIO(source.strip('\n')).readline)
+            if token.type not in _SKIPPED_PYTHON_TOKENS
+        ]
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    # Not even tokenizable (unclosed bracket or string, bad dedent): keep each line's indentation as is
+    tokens = []
+    for line in source.split('\n'):
+        line_tokens = list(_tokens('python', line))
+        if line_tokens:
+            tokens.append(f'<{len(line) - len(line.lstrip())}>')
+            tokens.extend(line_tokens)
+    return tokens
@@ -0,0 +1,37 @@
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from flask import Flask
+from src.models.database import db
+from src.models.attempt_archive import archive_attempts
+
+def create_app():
+    """Create Flask app for archiving old quiz attempts"""
+    app = Flask(__name__)
+
+    # Configure database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL',
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'code_aura_dev.db')}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Initialize database
+    db.init_app(app)
+
+    return app
+
+def main():
+    """Archive quiz attempts older than N days (default 365): archive_quiz_attempts.py [days]"""
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 365
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        moved = archive_attempts(days)
+        print(f"{moved} quiz attempts older than {days} days archived.")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,54 @@
+import hashlib
 from flask import Blueprint, jsonify, request
 from src.models.database import db, Article, Category
+from src.models.article_excerpts import article_excerpt
+from src.models.article_html import article_html
+from src.models.article_search import highlight_snippet, search_articles as search_article_index
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.utils.pagination import keyset_paginate, wants_cursor, wants_total
+from src.utils.query_budget import query_budget
+from src.utils.response_cache import CachedResponse, conditional_json_response
+from sqlalchemy.orm import defer, joinedload, selectinload
 
 article_bp = Blueprint('article', __name__, url_prefix='/api/articles')
 
+def _paginate_articles(query, page, limit):
+    """Paginate an article query by page number, or by cursor when one is sent"""
+    if wants_cursor(request.args):
+        pagination = keyset_paginate(
+            query, [Article.created_at, Article.id], request.args.get('cursor'), limit,
+            descending=True, with_total=wants_total(request.args)
+        )
+        return pagination.items, {
+            'limit': limit,
+            'total': pagination.total,
+            'next_cursor': pagination.next_cursor,
+            'has_next': pagination.has_next
+        }
+    
+    pagination = query.paginate(page=page, per_page=limit, error_out=False)
+    return pagination.items, {
+        'page': page,
+        'limit': limit,
+        'total': pagination.total,
+        'pages': pagination.pages
+    }
+
 @article_bp.route('', methods=['GET'])
+@query_budget(2)
 def get_all_articles():
     """Get all published articles with pagination"""
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 10, type=int)
     
-    # Get articles query
-    query = Article.query.filter_by(is_published=True).order_by(Article.created_at.desc())
+    # Get articles query (content is never read; excerpts come joined)
+    query = Article.query.options(defer(Article.content)).filter_by(is_published=True).order_by(Article.created_at.desc())
     
     # Apply pagination
-    pagination = query.paginate(page=page, per_page=limit, error_out=False)
-    articles = pagination.items
+    try:
+        articles, page_info = _paginate_articles(query, page, limit)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
     # Format response
     result = {
@@ -23,24 +56,26 @@ def get_all_articles():
             {
                 'id': article.id,
                 'title': article.title,
-                'content': article.content[:200] + '...' if len(article.content) > 200 else article.content,
+                'content': article_excerpt(article),
                 'author_id': article.author_id,
                 'created_at': article.created_at.isoformat(),
                 'is_published': article.is_published
             } for article in articles
         ],
-        'page': page,
-        'limit': limit,
-        'total': pagination.total,
-        'pages': pagination.pages
+        **page_info
     }
     
     return jsonify(result)
 
 @article_bp.route('/<int:article_id>', methods=['GET'])
+@query_budget(2)
 def get_article(article_id):
-    """Get a specific article by ID"""
-    article = Article.query.get_or_404(article_id)
+    """Get a specific article by ID (with its pre-rendered HTML; conditional GET)"""
+    article = Article.query.options(
+        joinedload(Article.author),
+        joinedload(Article.rendering),
+        selectinload(Article.categories)
+    ).get_or_404(article_id)
     
     # Check if article is published or user is the author
     if not article.is_published:
@@ -54,21 +89,31 @@ def get_article(article_id):
             'name': category.name
         })
     
+    # Rendered and sanitized when the article was saved
+    content_html, toc = article_html(article)
+    
     # Format response
     result = {
         'id': article.id,
         'title': article.title,
         'content': article.content,
+        'content_html': content_html,
+        'toc': toc,
         'author_id': article.author_id,
         'author_name': article.author.username if article.author else 'Unknown',
         'created_at': article.created_at.isoformat(),
+        'updated_at': article.updated_at.isoformat() if article.updated_at else None,
         'is_published': article.is_published,
         'categories': categories
     }
     
-    return jsonify(result)
+    # Unchanged articles are answered with a 304 by ETag or Last-Modified
+    body = jsonify(result).get_data()
+    entry = CachedResponse(body, hashlib.sha256(body).hexdigest())
+    return conditional_json_response(entry, last_modified=article.updated_at or article.created_at)
 
 @article_bp.route('/category/<int:category_id>', methods=['GET'])
+@query_budget(3)
 def get_articles_by_category(category_id):
     """Get articles by category"""
     page = request.args.get('page', 1, type=int)
@@ -78,11 +123,13 @@ def get_articles_by_category(category_id):
     category = Category.query.get_or_404(category_id)
     
     # Get articles for this category
-    articles = category.articles.filter_by(is_published=True).order_by(Article.created_at.desc())
+    articles = category.articles.options(defer(Article.content)).filter_by(is_published=True).order_by(Article.created_at.desc())
     
     # Apply pagination
-    pagination = articles.paginate(page=page, per_page=limit, error_out=False)
-    articles = pagination.items
+    try:
+        articles, page_info = _paginate_articles(articles, page, limit)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
     # Format response
     result = {
@@ -95,40 +142,40 @@ def get_articles_by_category(category_id):
             {
                 'id': article.id,
                 'title': article.title,
-                'content': article.content[:200] + '...' if len(article.content) > 200 else article.content,
+                'content': article_excerpt(article),
                 'author_id': article.author_id,
                 'created_at': article.created_at.isoformat(),
                 'is_published': article.is_published
             } for article in articles
         ],
-        'page': page,
-        'limit': limit,
-        'total': pagination.total,
-        'pages': pagination.pages
+        **page_info
     }
     
     return jsonify(result)
 
 @article_bp.route('/search', methods=['GET'])
+@query_budget(2)
 def search_articles():
-    """Search articles by query"""
-    query = request.args.get('q', '')
+    """Search published articles (ranked, with highlighted snippets)"""
+    query = request.args.get('q', '').strip()
     page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 10, type=int)
+    limit = min(request.args.get('limit', 10, type=int), 50)
     
     if not query:
         return jsonify({'message': 'Search query is required'}), 400
+    if page < 1 or limit < 1:
+        return jsonify({'message': 'page and limit must be positive'}), 400
     
-    # Search articles
-    search_query = f"%{query}%"
-    articles_query = Article.query.filter(
-        Article.is_published == True,
-        (Article.title.ilike(search_query) | Article.content.ilike(search_query))
-    ).order_by(Article.created_at.desc())
+    # Ranked ids and the match count come from the search index in one query
+    article_ids, total = search_article_index(query, page, limit)
     
-    # Apply pagination
-    pagination = articles_query.paginate(page=page, per_page=limit, error_out=False)
-    articles = pagination.items
+    # Content is read for the page's rows only, to cut the highlighted snippets
+    articles = {}
+    if article_ids:
+        articles = {article.id: article for article in Article.query.filter(
+            Article.id.in_(article_ids),
+            Article.is_published == True
+        ).all()}
     
     # Format response
     result = {
@@ -136,16 +183,17 @@ def search_articles():
             {
                 'id': article.id,
                 'title': article.title,
-                'content': article.content[:200] + '...' if len(article.content) > 200 else article.content,
+                'content': article_excerpt(article),
+                'snippet': highlight_snippet(article.content, query),
                 'author_id': article.author_id,
                 'created_at': article.created_at.isoformat(),
                 'is_published': article.is_published
-            } for article in articles
+            } for article in (articles.get(article_id) for article_id in article_ids) if article
         ],
         'page': page,
         'limit': limit,
-        'total': pagination.total,
-        'pages': pagination.pages,
+        'total': total,
+        'pages': (total + limit - 1) // limit,
         'query': query
     }
     
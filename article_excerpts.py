@@ -0,0 +1,52 @@
+from sqlalchemy import event, inspect
+from src.models.database import db, Article, ArticleExcerpt
+
+EXCERPT_LENGTH = 200
+
+def make_excerpt(content):
+    """The listing preview of an article's content"""
+    if not content:
+        return ''
+    return content[:EXCERPT_LENGTH] + '...' if len(content) > EXCERPT_LENGTH else content
+
+def article_excerpt(article):
+    """Stored excerpt of an article (content is only read for rows not backfilled yet)"""
+    entry = article.excerpt_entry
+    if entry is not None:
+        return entry.excerpt
+    return make_excerpt(article.content)
+
+def backfill_article_excerpts(batch_size=200):
+    """Store excerpts of articles saved before excerpts existed; returns how many were added"""
+    added = 0
+    while True:
+        rows = db.session.query(Article.id, Article.content).outerjoin(
+            ArticleExcerpt, ArticleExcerpt.article_id == Article.id
+        ).filter(ArticleExcerpt.article_id.is_(None)).order_by(Article.id).limit(batch_size).all()
+
+        if not rows:
+            return added
+
+        db.session.execute(ArticleExcerpt.__table__.insert(), [
+            {'article_id': article_id, 'excerpt': make_excerpt(content)} for article_id, content in rows
+        ])
+        db.session.commit()
+        added += len(rows)
+
+def _write_excerpt(connection, article):
+    table = ArticleExcerpt.__table__
+    excerpt = make_excerpt(article.content)
+    updated = connection.execute(table.update().where(table.c.article_id == article.id).values(excerpt=excerpt))
+    if not updated.rowcount:
+        connection.execute(table.insert().values(article_id=article.id, excerpt=excerpt))
+
+# Saves from any code path (admin create/update, seed scripts) refresh the
+# excerpt within their own flush, on the flushing connection
+@event.listens_for(Article, 'after_insert')
+def _store_excerpt(mapper, connection, article):
+    _write_excerpt(connection, article)
+
+@event.listens_for(Article, 'after_update')
+def _refresh_excerpt(mapper, connection, article):
+    if inspect(article).attrs.content.history.has_changes():
+        _write_excerpt(connection, article)
@@ -0,0 +1,58 @@
+from datetime import datetime
+from sqlalchemy import event, inspect, or_
+from src.models.database import db, Article, ArticleRendering
+from src.utils.article_render import RENDERER_VERSION, render_markdown
+
+def article_html(article):
+    """(content_html, toc) of an article; rendered on the fly if missing or stale (nothing is written)"""
+    rendering = article.rendering
+    if rendering is not None and rendering.renderer_version == RENDERER_VERSION:
+        return rendering.content_html, rendering.toc or []
+    return render_markdown(article.content)
+
+def stale_article_ids(force=False):
+    """Ids of articles without a rendering of the current renderer version (all ids with `force`)"""
+    query = db.session.query(Article.id)
+    if not force:
+        query = query.outerjoin(ArticleRendering, ArticleRendering.article_id == Article.id).filter(or_(
+            ArticleRendering.article_id.is_(None),
+            ArticleRendering.renderer_version != RENDERER_VERSION
+        ))
+    return [article_id for (article_id,) in query.order_by(Article.id)]
+
+def store_renderings(rendered):
+    """Write [(article_id, content_html, toc)] rendered elsewhere, e.g. in a process pool (the caller commits)"""
+    table = ArticleRendering.__table__
+    ids = [article_id for article_id, _, _ in rendered]
+    db.session.execute(table.delete().where(table.c.article_id.in_(ids)))
+    db.session.execute(table.insert(), [{
+        'article_id': article_id,
+        'content_html': content_html,
+        'toc': toc,
+        'renderer_version': RENDERER_VERSION,
+        'rendered_at': datetime.utcnow()
+    } for article_id, content_html, toc in rendered])
+
+def _write_rendering(connection, article):
+    table = ArticleRendering.__table__
+    content_html, toc = render_markdown(article.content)
+    values = {
+        'content_html': content_html,
+        'toc': toc,
+        'renderer_version': RENDERER_VERSION,
+        'rendered_at': datetime.utcnow()
+    }
+    updated = connection.execute(table.update().where(table.c.article_id == article.id).values(**values))
+    if not updated.rowcount:
+        connection.execute(table.insert().values(article_id=article.id, **values))
+
+# Saves from any code path (admin create/update, seed scripts) render the
+# content once, within their own flush
+@event.listens_for(Article, 'after_insert')
+def _render_new_article(mapper, connection, article):
+    _write_rendering(connection, article)
+
+@event.listens_for(Article, 'after_update')
+def _render_changed_article(mapper, connection, article):
+    if inspect(article).attrs.content.history.has_changes():
+        _write_rendering(connection, article)
@@ -0,0 +1,192 @@
+import html
+import re
+
+# Bump when the output changes; render_articles.py re-renders older renderings
+RENDERER_VERSION = 2
+
+FENCE = re.compile(r'^(```|~~~)\s*([\w+-]*)\s*$')
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RULE = re.compile(r'^(\*\s*){3,}$|^(-\s*){3,}$|^(_\s*){3,}$')
+QUOTE = re.compile(r'^>\s?')
+LIST_ITEM = re.compile(r'^([-*+]|\d+[.)])\s+(.*)$')
+
+CODE_SPAN = re.compile(r'`([^`\n]+)`')
+IMAGE = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)\)')
+LINK = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+STRONG = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|(?<!\w)__(?=\S)(.+?)(?<=\S)__(?!\w)')
+EMPHASIS = re.compile(r'\*(?=\S)(.+?)(?<=\S)\*|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)')
+PLACEHOLDER = re.compile('\x00(\\d+)\x00')
+
+# Link targets that are safe to emit (no javascript:, data: ...)
+SAFE_URL = re.compile(r'^(https?://|mailto:|/|#)', re.IGNORECASE)
+SAFE_IMAGE_URL = re.compile(r'^(https?://|/)', re.IGNORECASE)
+
+def render_markdown(source):
+    """Render article Markdown to sanitized HTML; returns (html, table of contents).
+
+    Raw HTML in the source is escaped, never passed through, and only
+    http(s), mailto, relative and fragment URLs become links, so the
+    output is safe to insert as-is. Headings get stable ids, listed in
+    the table of contents as {'level', 'id', 'title'}.
+    """
+    lines = str(source or '').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    toc = []
+    body = _render_blocks(lines, toc, set())
+    return body, toc
+
+def _render_blocks(lines, toc, used_ids):
+    out = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if not stripped:
+            i += 1
+            continue
+
+        fence = FENCE.match(stripped)
+        if fence:
+            code = []
+            i += 1
+            while i < len(lines) and lines[i].strip() != fence.group(1):
+                code.append(lines[i])
+                i += 1
+            i += 1
+            language = f' class="language-{fence.group(2)}"' if fence.group(2) else ''
+            out.append(f'<pre><code{language}>{html.escape(chr(10).join(code))}</code></pre>')
+            continue
+
+        heading = HEADING.match(stripped)
+        if heading:
+            level = len(heading.group(1))
+            title = heading.group(2)
+            anchor = _heading_id(title, used_ids)
+            toc.append({'level': level, 'id': anchor, 'title': _plain_text(title)})
+            out.append(f'<h{level} id="{anchor}">{_render_inline(title)}</h{level}>')
+            i += 1
+            continue
+
+        if RULE.match(stripped):
+            out.append('<hr>')
+            i += 1
+            continue
+
+        if QUOTE.match(stripped):
+            quoted = []
+            while i < len(lines) and QUOTE.match(lines[i].strip()):
+                quoted.append(QUOTE.sub('', lines[i].strip(), count=1))
+                i += 1
+            out.append(f'<blockquote>{_render_blocks(quoted, toc, used_ids)}</blockquote>')
+            continue
+
+        if LIST_ITEM.match(stripped):
+            i = _render_list(lines, i, out, toc, used_ids)
+            continue
+
+        paragraph = []
+        while i < len(lines) and lines[i].strip() and not _starts_block(lines[i].strip()):
+            paragraph.append(lines[i].strip())
+            i += 1
+        out.append(f'<p>{_render_inline(chr(10).join(paragraph))}</p>')
+
+    return '\n'.join(out)
+
+def _render_list(lines, i, out, toc, used_ids):
+    indent = len(lines[i]) - len(lines[i].lstrip())
+    ordered = LIST_ITEM.match(lines[i].strip()).group(1)[0].isdigit()
+    items = []
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        item = LIST_ITEM.match(stripped)
+        line_indent = len(line) - len(line.lstrip())
+        if not item or line_indent != indent or item.group(1)[0].isdigit() != ordered:
+            break
+
+        # Lines indented under the item (nested lists, continuations) belong to it
+        nested = []
+        i += 1
+        while i < len(lines) and (not lines[i].strip() or len(lines[i]) - len(lines[i].lstrip()) > indent):
+            if not lines[i].strip() and (i + 1 >= len(lines) or len(lines[i + 1]) - len(lines[i + 1].lstrip()) <= indent):
+                break
+            nested.append(lines[i])
+            i += 1
+
+        content = _render_inline(item.group(2))
+        if nested:
+            content += '\n' + _render_blocks(_dedent(nested), toc, used_ids)
+        items.append(f'<li>{content}</li>')
+
+    tag = 'ol' if ordered else 'ul'
+    out.append(f'<{tag}>\n' + '\n'.join(items) + f'\n</{tag}>')
+    return i
+
+def _starts_block(stripped):
+    return bool(FENCE.match(stripped) or HEADING.match(stripped) or RULE.match(stripped)
+                or QUOTE.match(stripped) or LIST_ITEM.match(stripped))
+
+def _dedent(lines):
+    width = min(len(line) - len(line.lstrip()) for line in lines if line.strip())
+    return [line[width:] for line in lines]
+
+def _render_inline(text):
+    # Code spans, images and links are cut out into placeholders first, so
+    # nothing inside them (nor their URLs) is formatted. NUL never belongs
+    # in article text and is dropped, so placeholders cannot be forged.
+    pieces = []
+
+    def keep(rendered, plain):
+        pieces.append((rendered, plain))
+        return f'\x00{len(pieces) - 1}\x00'
+
+    def restore(text, plain=False):
+        return PLACEHOLDER.sub(lambda match: restore(pieces[int(match.group(1))][plain], plain), text)
+
+    def keep_code(match):
+        code = html.escape(match.group(1))
+        return keep(f'<code>{code}</code>', code)
+
+    def keep_image(match):
+        # Alt text is an attribute: code spans in it stay plain text
+        return keep(_image(restore(match.group(1), plain=True), match.group(2)), match.group(1))
+
+    def keep_link(match):
+        return keep(_link(_format(match.group(1)), match.group(2)), match.group(1))
+
+    text = html.escape(CODE_SPAN.sub(keep_code, text.replace('\x00', '')))
+    text = IMAGE.sub(keep_image, text)
+    text = LINK.sub(keep_link, text)
+    return restore(_format(text))
+
+def _format(text):
+    text = STRONG.sub(lambda match: f'<strong>{match.group(1) or match.group(2)}</strong>', text)
+    return EMPHASIS.sub(lambda match: f'<em>{match.group(1) or match.group(2)}</em>', text)
+
+def _link(label, url):
+    url = html.unescape(url)
+    if not SAFE_URL.match(url):
+        return label
+    external = ' rel="nofollow noopener" target="_blank"' if url.lower().startswith(('http://', 'https://')) else ''
+    return f'<a href="{html.escape(url)}"{external}>{label}</a>'
+
+def _image(alt, url):
+    url = html.unescape(url)
+    if not SAFE_IMAGE_URL.match(url):
+        return alt
+    return f'<img src="{html.escape(url)}" alt="{alt}" loading="lazy">'
+
+def _plain_text(text):
+    return re.sub(r'[*_`]', '', LINK.sub(lambda match: match.group(1), text)).strip()
+
+def _heading_id(title, used_ids):
+    # Unicode word characters are kept so Arabic headings get readable anchors
+    base = re.sub(r'[^\w\s-]', '', _plain_text(title).lower())
+    base = re.sub(r'[\s_]+', '-', base).strip('-') or 'section'
+    anchor = base
+    suffix = 2
+    while anchor in used_ids:
+        anchor = f'{base}-{suffix}'
+        suffix += 1
+    used_ids.add(anchor)
+    return anchor
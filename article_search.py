@@ -0,0 +1,199 @@
+import html
+import re
+from sqlalchemy import event, func, or_, select, text
+from src.models.database import db, Article
+from src.models.course_search import ARABIC_DIACRITICS, normalize_arabic, search_terms
+
+# bm25() weights, in column order of the FTS5 table
+SQLITE_COLUMN_WEIGHTS = (10.0, 1.0)
+
+# Characters a normalized letter may stand for in the original text
+LETTER_VARIANTS = {
+    'ا': 'اأإآٱ',
+    'ي': 'يى',
+    'ه': 'هة',
+}
+
+SNIPPET_WORDS = 30
+
+# Search backend picked by init_article_search(): 'fts5', 'tsvector' or None (LIKE scan)
+_backend = None
+
+def init_article_search(app):
+    """Create the article search index for the configured database and fill it if it is out of date"""
+    global _backend
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'sqlite':
+                db.session.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS article_search USING fts5("
+                    "title, content, tokenize = 'unicode61')"
+                ))
+                _backend = 'fts5'
+            elif dialect == 'postgresql':
+                db.session.execute(text(
+                    "CREATE TABLE IF NOT EXISTS article_search_documents ("
+                    "article_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+                ))
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_article_search_documents_document "
+                    "ON article_search_documents USING GIN (document)"
+                ))
+                _backend = 'tsvector'
+            db.session.commit()
+        except Exception as e:
+            # e.g. SQLite built without FTS5: search falls back to a LIKE scan
+            db.session.rollback()
+            _backend = None
+            app.logger.warning('Article search index unavailable: %s', e)
+            return
+
+        if _backend and _indexed_count() != Article.query.filter_by(is_published=True).count():
+            rebuild_article_search()
+
+def rebuild_article_search():
+    """Re-index every published article (one read, one write per article)"""
+    if not _backend:
+        return 0
+
+    connection = db.session.connection()
+    connection.execute(text(_delete_all_sql()))
+    articles = db.session.query(Article.id, Article.title, Article.content).filter(Article.is_published == True).all()
+    for article_id, title, content in articles:
+        _write_document(connection, article_id, title, content)
+    db.session.commit()
+    return len(articles)
+
+def search_articles(query, page=1, per_page=10):
+    """Ranked ids of published articles matching `query` and the total match count.
+
+    FTS5 ranks with BM25 (title weighs most); the PostgreSQL index ranks
+    with ts_rank over weighted tsvectors. Only published articles are
+    indexed.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], 0
+    offset = (page - 1) * per_page
+
+    if _backend == 'fts5':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in SQLITE_COLUMN_WEIGHTS)
+        rows = db.session.execute(text(
+            # bm25() cannot share a SELECT with a window function, hence the subquery
+            f"SELECT rowid, count(*) OVER () FROM ("
+            f"SELECT rowid, bm25(article_search, {weights}) AS score FROM article_search WHERE article_search MATCH :match"
+            f") ORDER BY score, rowid LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'limit': per_page, 'offset': offset}).fetchall()
+    elif _backend == 'tsvector':
+        rows = db.session.execute(text(
+            "SELECT article_id, count(*) OVER () FROM article_search_documents "
+            "WHERE document @@ to_tsquery('simple', :match) "
+            "ORDER BY ts_rank(document, to_tsquery('simple', :match)) DESC, article_id "
+            "LIMIT :limit OFFSET :offset"
+        ), {'match': ' & '.join(f'{term}:*' for term in terms), 'limit': per_page, 'offset': offset}).fetchall()
+    else:
+        pattern = f"%{query}%"
+        rows = db.session.query(Article.id, func.count().over()).filter(
+            Article.is_published == True,
+            or_(Article.title.ilike(pattern), Article.content.ilike(pattern))
+        ).order_by(Article.created_at.desc(), Article.id.desc()).limit(per_page).offset(offset).all()
+
+    total = rows[0][1] if rows else 0
+    return [row[0] for row in rows], total
+
+def highlight_snippet(content, query, words=SNIPPET_WORDS):
+    """HTML-escaped passage of `content` around the first match, matches wrapped in <mark>.
+
+    Terms are matched against the original text, so diacritics and
+    alef/ya/ta-marbuta forms the index folded away still highlight.
+    """
+    if not content:
+        return ''
+    pattern = _highlight_pattern(search_terms(query))
+    match = pattern.search(content) if pattern else None
+
+    # Cut a window of whole words around the first match
+    start = 0
+    if match:
+        start = max(content.rfind(' ', 0, max(match.start() - words * 3, 0)), 0)
+    tokens = content[start:].split()
+    passage = ' '.join(tokens[:words])
+    prefix = '...' if start else ''
+    suffix = '...' if len(tokens) > words else ''
+
+    if not pattern:
+        return prefix + html.escape(passage) + suffix
+    parts = []
+    last = 0
+    for found in pattern.finditer(passage):
+        parts.append(html.escape(passage[last:found.start()]))
+        parts.append(f'<mark>{html.escape(found.group())}</mark>')
+        last = found.end()
+    parts.append(html.escape(passage[last:]))
+    return prefix + ''.join(parts) + suffix
+
+def _highlight_pattern(terms):
+    if not terms:
+        return None
+    diacritics = ARABIC_DIACRITICS.pattern + '*'
+    alternatives = []
+    for term in sorted(set(terms), key=len, reverse=True):
+        letters = [f'[{re.escape(LETTER_VARIANTS[char])}]' if char in LETTER_VARIANTS else re.escape(char) for char in term]
+        # Prefix match, like the index: the rest of the word is highlighted too
+        alternatives.append(diacritics.join(letters) + r'\w*')
+    return re.compile('|'.join(alternatives), re.IGNORECASE)
+
+def _indexed_count():
+    table = 'article_search' if _backend == 'fts5' else 'article_search_documents'
+    return db.session.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+
+def _delete_all_sql():
+    return "DELETE FROM article_search" if _backend == 'fts5' else "DELETE FROM article_search_documents"
+
+def _write_document(connection, article_id, title, content):
+    params = {
+        'article_id': article_id,
+        'title': normalize_arabic(title),
+        'content': normalize_arabic(content)
+    }
+    if _backend == 'fts5':
+        connection.execute(text("DELETE FROM article_search WHERE rowid = :article_id"), params)
+        connection.execute(text(
+            "INSERT INTO article_search (rowid, title, content) VALUES (:article_id, :title, :content)"
+        ), params)
+    elif _backend == 'tsvector':
+        connection.execute(text(
+            "INSERT INTO article_search_documents (article_id, document) VALUES (:article_id, "
+            "setweight(to_tsvector('simple', :title), 'A') || "
+            "setweight(to_tsvector('simple', :content), 'D')) "
+            "ON CONFLICT (article_id) DO UPDATE SET document = excluded.document"
+        ), params)
+
+def _remove_article(connection, article_id):
+    if _backend == 'fts5':
+        connection.execute(text("DELETE FROM article_search WHERE rowid = :article_id"), {'article_id': article_id})
+    elif _backend == 'tsvector':
+        connection.execute(text("DELETE FROM article_search_documents WHERE article_id = :article_id"), {'article_id': article_id})
+
+# Admin create/update/delete (and any other writer) keep the index current
+# within their own flush, on the flushing connection
+@event.listens_for(Article, 'after_insert')
+@event.listens_for(Article, 'after_update')
+def _index_article(mapper, connection, article):
+    if not _backend:
+        return
+    row = connection.execute(
+        select(Article.title, Article.content, Article.is_published).where(Article.id == article.id)
+    ).first()
+    if row is None or not row.is_published:
+        _remove_article(connection, article.id)
+    else:
+        _write_document(connection, article.id, row.title, row.content)
+
+@event.listens_for(Article, 'after_delete')
+def _unindex_article(mapper, connection, article):
+    if _backend:
+        _remove_article(connection, article.id)
@@ -0,0 +1,235 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from src.models.database import db, QuizAttemptGrading, UserQuizAttempt
+from src.models.answer_keys import get_answer_key
+from src.models.code_grading import submit_code_answer
+from src.models.quiz_attempts import mark_attempt_graded
+from src.utils.sandbox import GradingQueueFull
+
+# Attempts graded by this process right now (guards against double submission)
+_in_flight = set()
+_lock = threading.Lock()
+
+# Identifies this process in QuizAttemptGrading.claimed_by
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+# A claim not refreshed for this long belongs to a dead or stuck worker and may be taken over
+GRADING_CLAIM_SECONDS = 120
+
+class _GradingJob:
+    """Results of one attempt while its code answers run in the grading pool"""
+
+    def __init__(self, attempt_id, score, results, pending):
+        self.attempt_id = attempt_id
+        self.score = score
+        self.results = dict(results)
+        self.remaining = len(pending)
+        self.lock = threading.Lock()
+
+def start_attempt_grading(attempt, results):
+    """Add the pending grading row of a new attempt (the caller commits)"""
+    grading = QuizAttemptGrading(
+        attempt_id=attempt.id,
+        status='grading',
+        total_questions=len(results),
+        graded_questions=sum(1 for result in results.values() if result is not None),
+        question_results={str(question_id): result for question_id, result in results.items()},
+        # Claimed by this process from the start, so no sweeper launches it too
+        claimed_by=WORKER_ID,
+        claimed_at=datetime.utcnow()
+    )
+    db.session.add(grading)
+    return grading
+
+def claim_grading(attempt_id, stale_seconds=GRADING_CLAIM_SECONDS):
+    """Atomically take an unfinished attempt that nobody holds a live claim on (commits).
+
+    Returns True when this process now owns the attempt; every process
+    runs the sweeper, and only the one whose UPDATE matched grades it.
+    """
+    now = datetime.utcnow()
+    claimed = QuizAttemptGrading.query.filter(
+        QuizAttemptGrading.attempt_id == attempt_id,
+        QuizAttemptGrading.status.in_(('pending', 'grading')),
+        or_(
+            QuizAttemptGrading.claimed_at.is_(None),
+            QuizAttemptGrading.claimed_at < now - timedelta(seconds=stale_seconds)
+        )
+    ).update({
+        'status': 'grading',
+        'claimed_by': WORKER_ID,
+        'claimed_at': now,
+        'updated_at': now
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def release_grading(attempt_id):
+    """Give up this process's claim so the next sweep retries the attempt (commits)"""
+    QuizAttemptGrading.query.filter_by(attempt_id=attempt_id, claimed_by=WORKER_ID).update({
+        'status': 'pending',
+        'claimed_by': None,
+        'claimed_at': None
+    }, synchronize_session=False)
+    db.session.commit()
+
+def launch_grading(app, attempt_id, score, results, pending):
+    """Submit the pending code answers of a committed attempt to the grading pool.
+
+    The caller must hold the attempt's claim (see claim_grading). Progress
+    is written to its QuizAttemptGrading row as each answer finishes,
+    refreshing the claim. If the pool is full the claim is released and
+    the sweeper started by init_async_grading() retries the attempt.
+    """
+    with _lock:
+        if attempt_id in _in_flight:
+            return False
+        _in_flight.add(attempt_id)
+
+    job = _GradingJob(attempt_id, score, results, pending)
+    try:
+        futures = [(question, submit_code_answer(question, answer, digest)) for question, answer, digest in pending]
+    except GradingQueueFull:
+        with _lock:
+            _in_flight.discard(attempt_id)
+        with app.app_context():
+            release_grading(attempt_id)
+        return False
+
+    for question, future in futures:
+        future.add_done_callback(
+            lambda future, question=question: _record_result(app, job, question, future)
+        )
+    return True
+
+def _record_result(app, job, question, future):
+    try:
+        passed = bool(future.result())
+        error = None
+    except Exception as e:
+        passed = False
+        error = str(e)
+
+    with job.lock:
+        job.results[question.id] = passed
+        if passed:
+            job.score += question.points
+        job.remaining -= 1
+        finished = job.remaining == 0
+        snapshot = {str(question_id): result for question_id, result in job.results.items()}
+        score = job.score
+
+    with app.app_context():
+        try:
+            grading = QuizAttemptGrading.query.filter_by(attempt_id=job.attempt_id).with_for_update().first()
+            if grading is None or grading.claimed_by != WORKER_ID or grading.status not in ('pending', 'grading'):
+                # Taken over after our claim went stale (or already finished): the owner records it
+                db.session.rollback()
+                return
+            grading.question_results = snapshot
+            grading.graded_questions = sum(1 for result in snapshot.values() if result is not None)
+            grading.status = 'graded' if finished else 'grading'
+            grading.claimed_at = datetime.utcnow()
+            if error:
+                grading.error = error
+            if finished:
+                attempt = UserQuizAttempt.query.get(job.attempt_id)
+                if attempt is not None:
+                    attempt.score = score
+                    mark_attempt_graded(attempt)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning('Recording grading of attempt %s failed: %s', job.attempt_id, e)
+        finally:
+            if finished:
+                with _lock:
+                    _in_flight.discard(job.attempt_id)
+
+def resume_pending_gradings(app, stale_seconds=GRADING_CLAIM_SECONDS):
+    """Re-submit unfinished attempts nobody holds a live claim on (full queue, restart); returns how many were launched"""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    launched = 0
+    with app.app_context():
+        attempt_ids = [attempt_id for (attempt_id,) in db.session.query(QuizAttemptGrading.attempt_id).filter(
+            QuizAttemptGrading.status.in_(('pending', 'grading')),
+            or_(QuizAttemptGrading.claimed_at.is_(None), QuizAttemptGrading.claimed_at < cutoff)
+        ).limit(100).all()]
+
+        for attempt_id in attempt_ids:
+            with _lock:
+                if attempt_id in _in_flight:
+                    continue
+            # Every worker sweeps; only the one whose claim lands goes on
+            if not claim_grading(attempt_id, stale_seconds):
+                continue
+            grading = QuizAttemptGrading.query.get(attempt_id)
+            attempt = UserQuizAttempt.query.get(attempt_id)
+            answer_key = get_answer_key(attempt.quiz_id) if attempt else None
+            if answer_key is None:
+                grading.status = 'failed'
+                grading.error = 'Quiz no longer exists'
+                db.session.commit()
+                continue
+
+            # Grade from scratch: in-memory answers are cheap, code runs hit the result cache
+            score, results, pending = answer_key.grade(attempt.answers_submitted or [])
+            if not pending:
+                attempt.score = score
+                mark_attempt_graded(attempt)
+                grading.question_results = {str(question_id): result for question_id, result in results.items()}
+                grading.graded_questions = len(results)
+                grading.status = 'graded'
+                db.session.commit()
+                continue
+            if launch_grading(app, attempt.id, score, results, pending):
+                launched += 1
+    return launched
+
+def init_async_grading(app):
+    """Re-queue unfinished attempts every GRADING_SWEEP_SECONDS in a background thread"""
+    interval = app.config.setdefault('GRADING_SWEEP_SECONDS', 15)
+    stale_seconds = app.config.setdefault('GRADING_CLAIM_SECONDS', GRADING_CLAIM_SECONDS)
+    if app.testing or not interval:
+        return
+
+    def sweep_forever():
+        while True:
+            try:
+                resume_pending_gradings(app, stale_seconds=stale_seconds)
+            except Exception as e:
+                app.logger.warning('Grading sweep failed: %s', e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=sweep_forever, name='grading-sweeper', daemon=True)
+    thread.start()
+
+def attempt_status_payload(attempt, grading, answer_key=None):
+    """JSON body of GET /api/quizzes/attempts/<id> and its event stream"""
+    if grading is None:
+        # Graded synchronously at submission
+        status, results, graded, total = 'graded', {}, None, None
+    else:
+        status = grading.status
+        results = grading.question_results or {}
+        graded = grading.graded_questions
+        total = grading.total_questions
+
+    payload = {
+        'attempt_id': attempt.id,
+        'quiz_id': attempt.quiz_id,
+        'status': status,
+        'score': attempt.score if status == 'graded' else None,
+        'graded_questions': graded,
+        'total_questions': total,
+        'question_results': results,
+        'attempt_date': attempt.attempt_date.isoformat() if attempt.attempt_date else None
+    }
+    if status == 'graded' and answer_key is not None:
+        payload['total_possible'] = answer_key.max_score
+        payload['correct_answers'] = answer_key.feedback()
+    return payload
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from src.models.database import db, QuizAttemptArchive, QuizAttemptGrading, QuizAttemptRollup, QuizAttemptSnapshot, UserQuizAttempt
+from src.utils.upsert import upsert
+from sqlalchemy import case, or_
+
+ARCHIVE_BATCH_SIZE = 500
+
+def archive_attempts(older_than_days, batch_size=ARCHIVE_BATCH_SIZE, limit=None):
+    """Move attempts older than `older_than_days` to quiz_attempt_archive; returns how many moved.
+
+    Each batch is rolled up into quiz_attempt_rollups, copied to the archive
+    (answers compressed) and deleted from user_quiz_attempts with its
+    snapshot and grading row, in one transaction. Attempts still being
+    graded are left alone. Best scores and counters already include the
+    archived attempts and are not touched.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        rows = db.session.query(UserQuizAttempt, QuizAttemptSnapshot).outerjoin(
+            QuizAttemptSnapshot, QuizAttemptSnapshot.attempt_id == UserQuizAttempt.id
+        ).outerjoin(
+            QuizAttemptGrading, QuizAttemptGrading.attempt_id == UserQuizAttempt.id
+        ).filter(
+            UserQuizAttempt.attempt_date < cutoff,
+            or_(QuizAttemptGrading.attempt_id.is_(None), QuizAttemptGrading.status.in_(('graded', 'failed')))
+        ).order_by(UserQuizAttempt.attempt_date, UserQuizAttempt.id).limit(size).all()
+
+        if not rows:
+            break
+
+        _archive_batch(rows)
+        db.session.commit()
+        moved += len(rows)
+    return moved
+
+def _archive_batch(rows):
+    rollups = {}
+    for attempt, snapshot in rows:
+        db.session.add(QuizAttemptArchive(
+            attempt_id=attempt.id,
+            user_id=attempt.user_id,
+            quiz_id=attempt.quiz_id,
+            quiz_title=snapshot.quiz_title if snapshot else None,
+            score=attempt.score or 0,
+            total_possible=snapshot.total_possible if snapshot else 0,
+            attempt_date=attempt.attempt_date,
+            answers=compress_answers(attempt.answers_submitted)
+        ))
+
+        # Rows come oldest first, so the first best score seen is the earliest one
+        score = attempt.score or 0
+        rollup = rollups.setdefault((attempt.user_id, attempt.quiz_id), {
+            'user_id': attempt.user_id,
+            'quiz_id': attempt.quiz_id,
+            'attempts': 0,
+            'score_total': 0,
+            'best_score': score,
+            'best_achieved_at': attempt.attempt_date,
+            'first_attempt_at': attempt.attempt_date
+        })
+        rollup['attempts'] += 1
+        rollup['score_total'] += score
+        rollup['last_attempt_at'] = attempt.attempt_date
+        if score > rollup['best_score']:
+            rollup['best_score'] = score
+            rollup['best_achieved_at'] = attempt.attempt_date
+
+    for values in rollups.values():
+        upsert(QuizAttemptRollup, values, ['user_id', 'quiz_id'], update_columns=['last_attempt_at'], update_expressions={
+            'attempts': lambda current, new: current.attempts + new.attempts,
+            'score_total': lambda current, new: current.score_total + new.score_total,
+            'best_score': lambda current, new: case(
+                (new.best_score > current.best_score, new.best_score), else_=current.best_score
+            ),
+            'best_achieved_at': lambda current, new: case(
+                (new.best_score > current.best_score, new.best_achieved_at), else_=current.best_achieved_at
+            )
+        })
+
+    attempt_ids = [attempt.id for attempt, _ in rows]
+    QuizAttemptGrading.query.filter(QuizAttemptGrading.attempt_id.in_(attempt_ids)).delete(synchronize_session=False)
+    QuizAttemptSnapshot.query.filter(QuizAttemptSnapshot.attempt_id.in_(attempt_ids)).delete(synchronize_session=False)
+    UserQuizAttempt.query.filter(UserQuizAttempt.id.in_(attempt_ids)).delete(synchronize_session=False)
+
+def compress_answers(answers):
+    if answers is None:
+        return None
+    return zlib.compress(json.dumps(answers, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def decompress_answers(data):
+    if data is None:
+        return None
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+def archive_payload(row, with_answers=False):
+    payload = {
+        'id': row.attempt_id,
+        'quiz_id': row.quiz_id,
+        'quiz_title': row.quiz_title,
+        'score': row.score,
+        'total_possible': row.total_possible,
+        'status': 'archived',
+        'attempt_date': row.attempt_date.isoformat() if row.attempt_date else None
+    }
+    if with_answers:
+        payload['answers_submitted'] = decompress_answers(row.answers)
+    return payload
+
+def delete_quiz_archive(quiz_id):
+    """Remove a quiz's archived attempts and rollups (the caller commits)"""
+    QuizAttemptArchive.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    QuizAttemptRollup.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+
+def delete_user_archive(user_id):
+    """Remove a user's archived attempts and rollups (the caller commits)"""
+    QuizAttemptArchive.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    QuizAttemptRollup.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+def init_attempt_archival(app):
+    """Archive attempts older than QUIZ_ATTEMPT_RETENTION_DAYS every QUIZ_ATTEMPT_ARCHIVE_SECONDS"""
+    retention_days = app.config.setdefault('QUIZ_ATTEMPT_RETENTION_DAYS', 365)
+    interval = app.config.setdefault('QUIZ_ATTEMPT_ARCHIVE_SECONDS', 24 * 3600)
+    if app.testing or not interval or not retention_days:
+        return
+
+    def archive_forever():
+        while True:
+            with app.app_context():
+                try:
+                    moved = archive_attempts(retention_days)
+                    if moved:
+                        app.logger.info('Archived %d quiz attempts', moved)
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning('Quiz attempt archival failed: %s', e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=archive_forever, name='attempt-archival', daemon=True)
+    thread.start()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from flask import Flask
+from src.models.database import db
+from src.models.article_excerpts import backfill_article_excerpts
+
+def create_app():
+    """Create Flask app for backfilling article excerpts"""
+    app = Flask(__name__)
+
+    # Configure database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL',
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'code_aura_dev.db')}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Initialize database
+    db.init_app(app)
+
+    return app
+
+def main():
+    """Store listing excerpts of articles saved before excerpts existed"""
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        added = backfill_article_excerpts()
+        print(f"{added} article excerpts added.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from flask import Flask
+from src.models.database import db
+from src.models.quiz_attempts import backfill_attempt_snapshots, rebuild_best_scores
+
+def create_app():
+    """Create Flask app for backfilling quiz attempt snapshots"""
+    app = Flask(__name__)
+
+    # Configure database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL',
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'code_aura_dev.db')}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Initialize database
+    db.init_app(app)
+
+    return app
+
+def main():
+    """Snapshot quiz attempts made before attempt snapshots existed, then rebuild best scores"""
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        added = backfill_attempt_snapshots()
+        print(f"{added} quiz attempt snapshots added.")
+
+        best_scores, totals = rebuild_best_scores()
+        print(f"{best_scores} quiz best scores and {totals} user totals rebuilt.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.utils.answer_normalization import answer_hash
+
+SUBMISSIONS = 20000
+
+REFERENCES = {
+    'python': '''def fizzbuzz(n):
+    for i in range(1, n + 1):
+        if i % 15 == 0:
+            print("FizzBuzz")
+        elif i % 3 == 0:
+            print("Fizz")
+        elif i % 5 == 0:
+            print("Buzz")
+        else:
+            print(i)
+
+fizzbuzz(int(input()))
+''',
+    'javascript': '''function fizzbuzz(n) {
+    for (let i = 1; i <= n; i++) {
+        if (i % 15 === 0) console.log("FizzBuzz");
+        else if (i % 3 === 0) console.log("Fizz");
+        else if (i % 5 === 0) console.log("Buzz");
+        else console.log(i);
+    }
+}
+fizzbuzz(15);
+''',
+    'sql': '''SELECT name, COUNT(*) AS total
+FROM orders
+WHERE status = 'paid'
+GROUP BY name
+ORDER BY total DESC;
+''',
+}
+
+COMMENTS = {'python': '# {}', 'javascript': '// {}', 'sql': '-- {}'}
+
+def make_variant(language, source, rng):
+    """A submission equal to `source` up to layout and comments (Python may also change quotes)"""
+    lines = []
+    for line in source.split('\n'):
+        if language == 'python':
+            if rng.random() < 0.3:
+                line = line.replace('"', "'")
+        else:
+            if rng.random() < 0.3:
+                line = ' '.join(line.split())
+        if line.strip() and rng.random() < 0.2:
+            line += '  ' + COMMENTS[language].format('note')
+        lines.append(line)
+        if rng.random() < 0.1:
+            lines.append('')
+    return '\r\n'.join(lines) if rng.random() < 0.2 else '\n'.join(lines)
+
+def benchmark(language, reference, count, rng):
+    """Hash `count` generated variants; every one must match the reference hash"""
+    expected = answer_hash(language, reference)
+    submissions = [make_variant(language, reference, rng) for _ in range(count)]
+
+    started = time.perf_counter()
+    matched = sum(1 for submission in submissions if answer_hash(language, submission) == expected)
+    elapsed = time.perf_counter() - started
+
+    ok = matched == count
+    print(f"{language:<12} {count} submissions in {elapsed:.2f}s "
+          f"({count / elapsed:,.0f}/s, {elapsed / count * 1e6:.0f}us each), "
+          f"matched {matched}: {'OK' if ok else 'FAILED'}")
+    return ok
+
+def main():
+    """Time canonicalization of large batches of submissions: benchmark_answer_normalization.py [count]"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else SUBMISSIONS
+    rng = random.Random(42)
+
+    results = [benchmark(language, reference, count, rng) for language, reference in REFERENCES.items()]
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
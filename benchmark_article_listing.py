@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from flask import Flask
+from src.models.database import db, Article
+from src.models.article_excerpts import article_excerpt, backfill_article_excerpts
+from sqlalchemy import event
+from sqlalchemy.orm import defer
+
+ARTICLES = 500
+CONTENT_BYTES = 200 * 1024
+PAGE_SIZE = 50
+ROUNDS = 20
+
+def create_app():
+    """Create Flask app for the article listing benchmark (scratch database)"""
+    app = Flask(__name__)
+
+    # Never run against the real database: rows are written and wiped
+    scratch = os.path.join(tempfile.mkdtemp(), 'article_listing.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('ARTICLE_BENCHMARK_DATABASE_URL', f"sqlite:///{scratch}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Initialize database
+    db.init_app(app)
+
+    return app
+
+def seed_articles():
+    """Fill the scratch database with large articles and their excerpts"""
+    paragraph = 'الذكاء الاصطناعي يغير طريقة كتابتنا للبرمجيات. Python, JavaScript and SQL examples follow.\n\n'
+    content = paragraph * (CONTENT_BYTES // len(paragraph.encode('utf-8')) + 1)
+    for index in range(ARTICLES):
+        db.session.add(Article(title=f'Article {index}', content=content, author_id=1, is_published=True))
+        if index % 50 == 49:
+            db.session.commit()
+    db.session.commit()
+    backfill_article_excerpts()
+
+def time_listing(label, options):
+    """Load and format listing pages like GET /api/articles; returns seconds per page"""
+    fetched = []
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        fetched.append(statement)
+
+    event.listen(db.engine, 'after_cursor_execute', count_query)
+    started = time.perf_counter()
+    for round_index in range(ROUNDS):
+        # A fresh session each round, as every request has
+        db.session.remove()
+        articles = Article.query.options(*options).filter_by(is_published=True).order_by(
+            Article.created_at.desc()
+        ).offset((round_index * PAGE_SIZE) % ARTICLES).limit(PAGE_SIZE).all()
+        page = [{'id': article.id, 'title': article.title, 'content': article_excerpt(article)} for article in articles]
+        assert len(page) == PAGE_SIZE
+    elapsed = (time.perf_counter() - started) / ROUNDS
+    event.remove(db.engine, 'after_cursor_execute', count_query)
+
+    print(f"{label:<22} {elapsed * 1000:8.1f} ms per page of {PAGE_SIZE} "
+          f"({len(fetched) / ROUNDS:.0f} queries per page)")
+    return elapsed
+
+def main():
+    """Compare article listings reading full content with listings reading stored excerpts"""
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        seed_articles()
+        print(f"{ARTICLES} articles of ~{CONTENT_BYTES // 1024} KB each.")
+
+        full = time_listing('Full content loaded', [])
+        deferred = time_listing('Content deferred', [defer(Article.content)])
+        print(f"Deferred listing is {full / deferred:.1f}x faster.")
+
+if __name__ == "__main__":
+    main()
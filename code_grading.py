@@ -0,0 +1,104 @@
+import hashlib
+import json
+import threading
+from src.utils.sandbox import GradingPool, SandboxLimits, detect_sandbox, run_code
+
+# Question types whose answers are programs that can be run
+RUNNABLE_QUESTION_TYPES = ('code_completion', 'debugging')
+
+_pool = None
+_limits = SandboxLimits()
+# OS-level sandbox in use; None until init_grading_pool() finds one (code is then never run)
+_sandbox = None
+_lock = threading.Lock()
+
+def normalize_output(value):
+    """Program output as compared: unified newlines, no trailing spaces or blank lines"""
+    lines = str(value).replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+def question_fingerprint(language, reference, test_cases):
+    """Identifies what a code answer is graded against; changes when any of it changes"""
+    payload = json.dumps([language, reference, test_cases], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def init_grading_pool(app):
+    """Configure the sandboxed grading pool from GRADING_* settings.
+
+    GRADING_SANDBOX picks the OS-level sandbox ('auto' takes the first
+    installed one). Without one code answers are not run at all: they
+    are graded by comparing canonical hashes only. 'none' runs them
+    unisolated and is meant for local development.
+    """
+    global _pool, _limits, _sandbox
+
+    workers = app.config.setdefault('GRADING_WORKERS', 2)
+    queue_size = app.config.setdefault('GRADING_QUEUE_SIZE', 64)
+    _limits = SandboxLimits(
+        cpu_seconds=app.config.setdefault('GRADING_CPU_SECONDS', 2),
+        memory_bytes=app.config.setdefault('GRADING_MEMORY_BYTES', 256 * 1024 * 1024),
+        wall_seconds=app.config.setdefault('GRADING_WALL_SECONDS', 5)
+    )
+    sandbox = app.config.setdefault('GRADING_SANDBOX', 'auto')
+    if sandbox == 'auto':
+        sandbox = detect_sandbox()
+    _sandbox = _probe_sandbox(app, sandbox) if sandbox else None
+    if _sandbox is None:
+        app.logger.warning('No working OS-level sandbox (nsjail or bwrap): code answers will not be run')
+    elif _sandbox == 'none':
+        app.logger.warning('GRADING_SANDBOX is none: code answers run WITHOUT isolation')
+    with _lock:
+        _pool = GradingPool(workers=workers, queue_size=queue_size)
+
+def _probe_sandbox(app, sandbox):
+    # Fail closed: a sandbox that cannot run a trivial program is not used
+    try:
+        result = run_code('python', 'print(1)', '', _limits, sandbox)
+    except Exception as e:
+        result = None
+        app.logger.warning('Sandbox %s failed to start: %s', sandbox, e)
+    return sandbox if result is not None and result.ok and result.stdout.strip() == '1' else None
+
+def sandbox_enabled():
+    """Whether code answers can be run (an OS-level sandbox is configured and works)"""
+    return _sandbox is not None
+
+def get_grading_pool():
+    global _pool
+
+    with _lock:
+        if _pool is None:
+            _pool = GradingPool()
+        return _pool
+
+def submit_code_answer(question, answer, answer_hash):
+    """Queue a sandboxed grading of `answer`; returns a Future of True/False.
+
+    Results are cached under the answer's canonical hash, so submissions
+    that differ only in layout or comments share one run. Raises
+    GradingQueueFull when the pool cannot take more work.
+    """
+    pool = get_grading_pool()
+    key = pool.cache_key(question.fingerprint, answer_hash)
+    return pool.submit(key, grade_code_answer, question, answer)
+
+def grade_code_answer(question, answer):
+    """Run an answer against the question's test cases; every case must match"""
+    test_cases = question.test_cases or _reference_cases(question)
+    if not test_cases:
+        return False
+
+    for stdin, expected_output in test_cases:
+        result = run_code(question.language, answer, stdin, _limits, _sandbox)
+        if not result.ok or normalize_output(result.stdout) != normalize_output(expected_output):
+            return False
+    return True
+
+def _reference_cases(question):
+    # Without explicit cases the reference solution's output (no input) is the test
+    if question.reference_output is None:
+        result = run_code(question.language, question.correct_answer or '', '', _limits, _sandbox)
+        question.reference_output = result.stdout if result.ok else ''
+    if not question.reference_output:
+        return []
+    return [('', question.reference_output)]
@@ -0,0 +1,40 @@
+from datetime import datetime
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from src.models.database import db, ContentVersion
+from src.utils.upsert import ON_CONFLICT_INSERTS
+
+def get_version(scope, key=0):
+    """Persisted version of (scope, key); 0 until it is first bumped"""
+    return db.session.query(ContentVersion.version).filter_by(scope=scope, key=key).scalar() or 0
+
+def bump_version(scope, key=0, connection=None):
+    """Increment the version of (scope, key) in the current transaction.
+
+    Pass `connection` from mapper events (inside a flush); otherwise the
+    session's connection is used and the caller commits. Processes caching
+    data derived from (scope, key) compare their copy against get_version().
+    """
+    connection = connection if connection is not None else db.session.connection()
+    table = ContentVersion.__table__
+    now = datetime.utcnow()
+
+    insert = ON_CONFLICT_INSERTS.get(connection.dialect.name)
+    if insert is not None:
+        stmt = insert(table).values(scope=scope, key=key, version=1, updated_at=now)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['scope', 'key'],
+            set_={'version': table.c.version + 1, 'updated_at': now}
+        ))
+        return
+
+    # UPDATE first, then INSERT in a savepoint; a concurrent first bump makes us update again
+    matches = and_(table.c.scope == scope, table.c.key == key)
+    increment = table.update().where(matches).values(version=table.c.version + 1, updated_at=now)
+    if connection.execute(increment).rowcount:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(table.insert().values(scope=scope, key=key, version=1, updated_at=now))
+    except IntegrityError:
+        connection.execute(increment)
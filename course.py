@@ -1,11 +1,54 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.database import db, Course, Category, CourseRating, UserCourseProgress
-from sqlalchemy import func
+from src.models.database import db, Course, CourseSection, CourseLesson, Category, CourseRating
+from src.models.course_facets import facet_filters, get_course_facets
+from src.models.course_search import search_courses
+from src.models.featured_ranking import get_featured_ranking, schedule_featured_refresh
+from src.models.lesson_progress import get_course_progress as get_user_course_progress, progress_payload
+from src.models.lesson_progress import invalidate_lesson_order, replace_completed_lessons, set_current_lesson, set_lesson_completed
+from src.models.lesson_progress import PROGRESS_BATCH_LIMIT, apply_progress_batch
+from src.models.rating_summary import apply_rating_change, get_rating_summaries, get_rating_summary, summary_fields
+from src.utils.pagination import keyset_paginate, wants_cursor, wants_total
+from src.utils.query_budget import query_budget
+from src.utils.upsert import upsert
+from src.utils.response_cache import course_cache, lesson_cache, accepts_gzip, gzip_body, conditional_json_response
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import joinedload, selectinload
 
 course_bp = Blueprint('course', __name__)
 
+# Lessons rarely change; shared caches may keep them this many seconds
+LESSON_MAX_AGE = 300
+
+# Section and lesson writes (from any code path) invalidate cached course payloads
+@event.listens_for(CourseSection, 'after_insert')
+@event.listens_for(CourseSection, 'after_update')
+@event.listens_for(CourseSection, 'after_delete')
+def _invalidate_course_for_section(mapper, connection, section):
+    course_cache.bump(section.course_id)
+    invalidate_lesson_order(_changed_values(section, 'course_id'), connection)
+
+@event.listens_for(CourseLesson, 'after_insert')
+@event.listens_for(CourseLesson, 'after_update')
+@event.listens_for(CourseLesson, 'after_delete')
+def _invalidate_course_for_lesson(mapper, connection, lesson):
+    lesson_cache.bump(lesson.id)
+    # Courses of the lesson's section, before and after a move (a deleted section has none left)
+    section_ids = _changed_values(lesson, 'section_id')
+    course_ids = [course_id for (course_id,) in connection.execute(
+        select(CourseSection.course_id).where(CourseSection.id.in_(section_ids))
+    )] if section_ids else []
+    invalidate_lesson_order(set(course_ids), connection)
+    for course_id in set(course_ids):
+        course_cache.bump(course_id)
+
+def _changed_values(target, attribute):
+    # Current value plus the one replaced in this flush, if any
+    history = inspect(target).attrs[attribute].history
+    return {value for value in [getattr(target, attribute), *history.deleted] if value is not None}
+
 @course_bp.route('/courses', methods=['GET'])
+@query_budget(5)
 def get_courses():
     """Get all courses with filters"""
     try:
@@ -17,8 +60,8 @@ def get_courses():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
-        # Build query
-        query = Course.query
+        # Build query (categories are batch-loaded with a single IN query)
+        query = Course.query.options(selectinload(Course.categories))
         
         if language:
             query = query.filter(Course.language == language)
@@ -29,20 +72,29 @@ def get_courses():
         if category_id:
             query = query.join(Course.categories).filter(Category.id == category_id)
         
-        # Paginate
-        courses = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Paginate (keyset mode when a cursor is sent, page/per_page otherwise)
+        if wants_cursor(request.args):
+            courses = keyset_paginate(
+                query, [Course.id], request.args.get('cursor'), per_page,
+                with_total=wants_total(request.args)
+            )
+            pagination = courses.to_dict()
+        else:
+            courses = query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination = {
+                'page': courses.page,
+                'pages': courses.pages,
+                'per_page': courses.per_page,
+                'total': courses.total,
+                'has_next': courses.has_next,
+                'has_prev': courses.has_prev
+            }
+        
+        # Get rating summaries for the whole page in one query
+        summaries = get_rating_summaries([course.id for course in courses.items])
         
-        # Get average ratings for each course
         course_list = []
         for course in courses.items:
-            avg_rating = db.session.query(func.avg(CourseRating.rating)).filter(
-                CourseRating.course_id == course.id
-            ).scalar()
-            
-            rating_count = db.session.query(func.count(CourseRating.id)).filter(
-                CourseRating.course_id == course.id
-            ).scalar()
-            
             course_list.append({
                 'id': course.id,
                 'title': course.title,
@@ -56,42 +108,122 @@ def get_courses():
                 'instructor_name': course.instructor_name,
                 'created_at': course.created_at.isoformat() if course.created_at else None,
                 'categories': [{'id': cat.id, 'name': cat.name} for cat in course.categories],
-                'average_rating': round(float(avg_rating), 1) if avg_rating else 0,
-                'rating_count': rating_count or 0
+                **summary_fields(summaries.get(course.id))
+            })
+        
+        response = {
+            'courses': course_list,
+            'pagination': pagination
+        }
+        
+        # Facet counts come from the in-memory index (one version check)
+        if request.args.get('facets') in ('1', 'true'):
+            response['facets'] = get_course_facets().counts(facet_filters(request.args))
+        
+        return jsonify(response), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/courses/search', methods=['GET'])
+@query_budget(4)
+def search_course_catalog():
+    """Search courses by title, description, instructor and lesson titles"""
+    try:
+        query = request.args.get('q', '').strip()
+        page = int(request.args.get('page', 1))
+        per_page = min(int(request.args.get('per_page', 20)), 50)
+        
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        if page < 1 or per_page < 1:
+            return jsonify({'error': 'page and per_page must be positive'}), 400
+        
+        # Ranked ids and the match count come from the search index in one query
+        course_ids, total = search_courses(query, page, per_page)
+        
+        courses = {}
+        if course_ids:
+            courses = {course.id: course for course in Course.query.options(
+                selectinload(Course.categories)
+            ).filter(Course.id.in_(course_ids)).all()}
+        summaries = get_rating_summaries(list(courses))
+        
+        course_list = []
+        for course_id in course_ids:
+            course = courses.get(course_id)
+            if not course:
+                continue
+            course_list.append({
+                'id': course.id,
+                'title': course.title,
+                'description': course.description,
+                'youtube_video_id': course.youtube_video_id,
+                'language': course.language,
+                'level': course.level,
+                'programming_language': course.programming_language,
+                'instructor_name': course.instructor_name,
+                'categories': [{'id': cat.id, 'name': cat.name} for cat in course.categories],
+                **summary_fields(summaries.get(course.id))
             })
         
         return jsonify({
             'courses': course_list,
+            'query': query,
             'pagination': {
-                'page': courses.page,
-                'pages': courses.pages,
-                'per_page': courses.per_page,
-                'total': courses.total,
-                'has_next': courses.has_next,
-                'has_prev': courses.has_prev
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'has_next': page * per_page < total,
+                'has_prev': page > 1
             }
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @course_bp.route('/courses/<int:course_id>', methods=['GET'])
+@query_budget(6)
 def get_course(course_id):
-    """Get single course details"""
+    """Get single course details (?view=outline omits lesson content)"""
     try:
-        course = Course.query.get_or_404(course_id)
+        view = 'outline' if request.args.get('view') == 'outline' else None
+        
+        # Serve the rendered payload while the course is unchanged
+        cached = course_cache.get(course_id, variant=view)
+        if cached:
+            return conditional_json_response(cached)
+        
+        version = course_cache.version(course_id)
+        
+        if view == 'outline':
+            # Only ids and titles of sections and lessons; text columns are never read
+            course = Course.query.options(
+                selectinload(Course.categories),
+                selectinload(Course.sections).load_only(
+                    CourseSection.id, CourseSection.course_id, CourseSection.title, CourseSection.order_index
+                ).selectinload(CourseSection.lessons).load_only(
+                    CourseLesson.id, CourseLesson.section_id, CourseLesson.title, CourseLesson.order_index
+                )
+            ).get_or_404(course_id)
+        else:
+            course = Course.query.options(
+                selectinload(Course.categories),
+                selectinload(Course.sections).selectinload(CourseSection.lessons)
+            ).get_or_404(course_id)
         
         # Get average rating
-        avg_rating = db.session.query(func.avg(CourseRating.rating)).filter(
-            CourseRating.course_id == course.id
-        ).scalar()
-        
-        rating_count = db.session.query(func.count(CourseRating.id)).filter(
-            CourseRating.course_id == course.id
-        ).scalar()
+        summary = get_rating_summary(course.id)
         
         # Get recent ratings with user info
-        recent_ratings = db.session.query(CourseRating).filter(
+        recent_ratings = db.session.query(CourseRating).options(
+            joinedload(CourseRating.user)
+        ).filter(
             CourseRating.course_id == course.id
         ).order_by(CourseRating.created_at.desc()).limit(5).all()
         
@@ -109,7 +241,32 @@ def get_course(course_id):
                 }
             })
         
-        return jsonify({
+        if view == 'outline':
+            sections = [{
+                'id': section.id,
+                'title': section.title,
+                'order_index': section.order_index,
+                'lessons': [{
+                    'id': lesson.id,
+                    'title': lesson.title,
+                    'order_index': lesson.order_index
+                } for lesson in section.lessons]
+            } for section in course.sections]
+        else:
+            sections = [{
+                'id': section.id,
+                'title': section.title,
+                'order_index': section.order_index,
+                'lessons': [{
+                    'id': lesson.id,
+                    'title': lesson.title,
+                    'content_text': lesson.content_text,
+                    'video_url': lesson.video_url,
+                    'order_index': lesson.order_index
+                } for lesson in section.lessons]
+            } for section in course.sections]
+        
+        payload = jsonify({
             'id': course.id,
             'title': course.title,
             'description': course.description,
@@ -122,22 +279,54 @@ def get_course(course_id):
             'instructor_name': course.instructor_name,
             'created_at': course.created_at.isoformat() if course.created_at else None,
             'categories': [{'id': cat.id, 'name': cat.name} for cat in course.categories],
-            'sections': [{
-                'id': section.id,
-                'title': section.title,
-                'order_index': section.order_index,
-                'lessons': [{
-                    'id': lesson.id,
-                    'title': lesson.title,
-                    'content_text': lesson.content_text,
-                    'video_url': lesson.video_url,
-                    'order_index': lesson.order_index
-                } for lesson in section.lessons]
-            } for section in course.sections],
-            'average_rating': round(float(avg_rating), 1) if avg_rating else 0,
-            'rating_count': rating_count or 0,
+            'sections': sections,
+            **summary_fields(summary),
             'recent_ratings': ratings_list
-        }), 200
+        }).get_data()
+        
+        cached = course_cache.set(course_id, payload, version, variant=view)
+        return conditional_json_response(cached)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/lessons/<int:lesson_id>', methods=['GET'])
+@query_budget(1)
+def get_lesson(lesson_id):
+    """Get a single lesson with its content"""
+    try:
+        encoding = 'gzip' if accepts_gzip() else None
+        
+        # Serve the rendered (and compressed) payload while the lesson is unchanged
+        cached = lesson_cache.get(lesson_id, variant=encoding)
+        if cached:
+            return conditional_json_response(cached, max_age=LESSON_MAX_AGE)
+        
+        version = lesson_cache.version(lesson_id)
+        
+        result = db.session.query(CourseLesson, CourseSection.course_id).join(
+            CourseSection, CourseLesson.section_id == CourseSection.id
+        ).filter(CourseLesson.id == lesson_id).first()
+        
+        if not result:
+            return jsonify({'error': 'Lesson not found'}), 404
+        
+        lesson, course_id = result
+        payload = jsonify({
+            'id': lesson.id,
+            'course_id': course_id,
+            'section_id': lesson.section_id,
+            'title': lesson.title,
+            'content_text': lesson.content_text,
+            'video_url': lesson.video_url,
+            'order_index': lesson.order_index
+        }).get_data()
+        
+        if encoding:
+            payload = gzip_body(payload)
+        
+        cached = lesson_cache.set(lesson_id, payload, version, variant=encoding, encoding=encoding)
+        return conditional_json_response(cached, max_age=LESSON_MAX_AGE)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -156,27 +345,30 @@ def rate_course(course_id):
         # Check if course exists
         course = Course.query.get_or_404(course_id)
         
-        # Check if user already rated this course
-        existing_rating = CourseRating.query.filter_by(
-            user_id=user_id, 
-            course_id=course_id
-        ).first()
-        
-        if existing_rating:
-            # Update existing rating
+        # Insert the rating in one statement; the unique (user, course) key
+        # turns a concurrent duplicate into a no-op instead of a second row
+        inserted = upsert(CourseRating, {
+            'user_id': user_id,
+            'course_id': course_id,
+            'rating': data['rating'],
+            'review_text': data.get('review_text')
+        }, ['user_id', 'course_id'], update_columns=[])
+        
+        if inserted:
+            apply_rating_change(course_id, None, data['rating'])
+        else:
+            # Update existing rating (locked so the summary delta stays exact)
+            existing_rating = CourseRating.query.filter_by(
+                user_id=user_id, 
+                course_id=course_id
+            ).with_for_update().first()
+            apply_rating_change(course_id, existing_rating.rating, data['rating'])
             existing_rating.rating = data['rating']
             existing_rating.review_text = data.get('review_text')
-        else:
-            # Create new rating
-            rating = CourseRating(
-                user_id=user_id,
-                course_id=course_id,
-                rating=data['rating'],
-                review_text=data.get('review_text')
-            )
-            db.session.add(rating)
         
         db.session.commit()
+        course_cache.bump(course_id)
+        schedule_featured_refresh()
         
         return jsonify({'message': 'Course rated successfully'}), 200
         
@@ -184,31 +376,16 @@ def rate_course(course_id):
         return jsonify({'error': str(e)}), 500
 
 @course_bp.route('/courses/<int:course_id>/progress', methods=['GET'])
+@query_budget(4)
 @jwt_required()
 def get_course_progress(course_id):
     """Get user's progress in a course"""
     try:
         user_id = get_jwt_identity()
         
-        progress = UserCourseProgress.query.filter_by(
-            user_id=user_id,
-            course_id=course_id
-        ).first()
+        progress, completed_lessons, lesson_total = get_user_course_progress(user_id, course_id)
         
-        if not progress:
-            return jsonify({
-                'status': 'not_started',
-                'completed_lessons': [],
-                'started_at': None,
-                'completed_at': None
-            }), 200
-        
-        return jsonify({
-            'status': progress.status,
-            'completed_lessons': progress.completed_lessons or [],
-            'started_at': progress.started_at.isoformat() if progress.started_at else None,
-            'completed_at': progress.completed_at.isoformat() if progress.completed_at else None
-        }), 200
+        return jsonify(progress_payload(progress, completed_lessons, lesson_total)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -216,7 +393,7 @@ def get_course_progress(course_id):
 @course_bp.route('/courses/<int:course_id>/progress', methods=['POST'])
 @jwt_required()
 def update_course_progress(course_id):
-    """Update user's progress in a course"""
+    """Update user's progress in a course (status is computed by the server)"""
     try:
         user_id = get_jwt_identity()
         data = request.json
@@ -224,66 +401,83 @@ def update_course_progress(course_id):
         # Check if course exists
         course = Course.query.get_or_404(course_id)
         
-        # Get or create progress record
-        progress = UserCourseProgress.query.filter_by(
-            user_id=user_id,
-            course_id=course_id
-        ).first()
-        
-        if not progress:
-            progress = UserCourseProgress(
-                user_id=user_id,
-                course_id=course_id,
-                completed_lessons=[]
-            )
-            db.session.add(progress)
-        
         # Update progress
         if 'lesson_id' in data:
-            progress.lesson_id = data['lesson_id']
+            set_current_lesson(user_id, course_id, data['lesson_id'])
         
         if 'completed_lessons' in data:
-            progress.completed_lessons = data['completed_lessons']
-        
-        if 'status' in data:
-            progress.status = data['status']
-            if data['status'] == 'completed':
-                progress.completed_at = db.func.now()
+            replace_completed_lessons(user_id, course_id, data['completed_lessons'])
         
         db.session.commit()
         
         return jsonify({'message': 'Progress updated successfully'}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/courses/<int:course_id>/lessons/<int:lesson_id>/progress', methods=['PATCH'])
+@jwt_required()
+def update_lesson_progress(course_id, lesson_id):
+    """Mark a single lesson complete or incomplete"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.json or {}
+        
+        completed = data.get('completed', True)
+        if not isinstance(completed, bool):
+            return jsonify({'error': 'completed must be true or false'}), 400
+        
+        progress, completion = set_lesson_completed(user_id, course_id, lesson_id, completed)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Progress updated successfully',
+            'status': progress.status,
+            'completed_count': completion.completed_count,
+            'lesson_total': completion.lesson_total,
+            'percent_complete': round(100.0 * completion.completed_count / completion.lesson_total, 1) if completion.lesson_total else 0,
+            'completed_at': progress.completed_at.isoformat() if progress.completed_at else None
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@course_bp.route('/progress/batch', methods=['POST'])
+@jwt_required()
+def sync_progress_batch():
+    """Apply queued progress events (possibly across courses) in one transaction"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.json or {}
+        
+        events = data.get('events')
+        if not isinstance(events, list):
+            return jsonify({'error': 'events must be a list'}), 400
+        if len(events) > PROGRESS_BATCH_LIMIT:
+            return jsonify({'error': f'At most {PROGRESS_BATCH_LIMIT} events per batch'}), 413
+        
+        results, courses = apply_progress_batch(user_id, events)
+        db.session.commit()
+        
+        return jsonify({
+            'results': results,
+            'courses': {str(course_id): summary for course_id, summary in courses.items()}
+        }), 200
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @course_bp.route('/courses/featured', methods=['GET'])
+@query_budget(1)
 def get_featured_courses():
     """Get featured courses (highest rated)"""
     try:
-        # Get courses with highest average ratings
-        featured_courses = db.session.query(
-            Course,
-            func.avg(CourseRating.rating).label('avg_rating'),
-            func.count(CourseRating.id).label('rating_count')
-        ).outerjoin(CourseRating).group_by(Course.id).having(
-            func.count(CourseRating.id) >= 5  # At least 5 ratings
-        ).order_by(func.avg(CourseRating.rating).desc()).limit(6).all()
-        
-        course_list = []
-        for course, avg_rating, rating_count in featured_courses:
-            course_list.append({
-                'id': course.id,
-                'title': course.title,
-                'description': course.description,
-                'youtube_video_id': course.youtube_video_id,
-                'language': course.language,
-                'level': course.level,
-                'programming_language': course.programming_language,
-                'instructor_name': course.instructor_name,
-                'average_rating': round(float(avg_rating), 1) if avg_rating else 0,
-                'rating_count': rating_count or 0
-            })
+        # Precomputed Bayesian ranking, held in memory
+        course_list = get_featured_ranking(limit=6)
         
         return jsonify({'featured_courses': course_list}), 200
         
@@ -0,0 +1,110 @@
+import threading
+from sqlalchemy import event
+from src.models.database import db, Course, CourseCategory
+from src.models.content_versions import bump_version, get_version
+
+# Filter dimensions of GET /api/courses, in response order
+FACET_FIELDS = ('language', 'level', 'programming_language', 'category_id')
+
+# ContentVersion scope bumped by every course write (key 0)
+CATALOG_SCOPE = 'course_catalog'
+
+class CourseFacetIndex:
+    """In-memory postings (facet value -> course ids) for the course catalog.
+
+    Built from two queries (courses and course_categories) and answered
+    without touching the database afterwards. Each process holds its own
+    copy, stamped with the catalog version it was built from; a course
+    write in any process bumps that version and the others rebuild.
+    """
+
+    def __init__(self, postings, course_ids, version=0):
+        self.postings = postings
+        self.course_ids = course_ids
+        self.version = version
+
+    @classmethod
+    def build(cls):
+        # Read before the rows: a write landing in between triggers another rebuild
+        version = get_version(CATALOG_SCOPE)
+        postings = {field: {} for field in FACET_FIELDS}
+        course_ids = set()
+
+        rows = db.session.query(
+            Course.id, Course.language, Course.level, Course.programming_language
+        ).all()
+        for course_id, language, level, programming_language in rows:
+            course_ids.add(course_id)
+            for field, value in (('language', language), ('level', level), ('programming_language', programming_language)):
+                if value is not None:
+                    postings[field].setdefault(value, set()).add(course_id)
+
+        for course_id, category_id in db.session.query(CourseCategory.course_id, CourseCategory.category_id).all():
+            postings['category_id'].setdefault(category_id, set()).add(course_id)
+
+        return cls(postings, course_ids, version)
+
+    def matching(self, filters, skip=None):
+        """Course ids matching every active filter except `skip`"""
+        matched = self.course_ids
+        for field, value in filters.items():
+            if field == skip or value is None:
+                continue
+            matched = matched & self.postings[field].get(value, set())
+        return matched
+
+    def counts(self, filters):
+        """Count per value of every facet, given the other active filters.
+
+        Counting a dimension ignores its own filter, so the sidebar still
+        shows how many courses each alternative value would return.
+        """
+        result = {}
+        for field in FACET_FIELDS:
+            candidates = self.matching(filters, skip=field)
+            result[field] = {
+                str(value): count
+                for value, count in sorted(
+                    ((value, len(ids & candidates)) for value, ids in self.postings[field].items()),
+                    key=lambda item: (-item[1], str(item[0]))
+                )
+                if count
+            }
+        return result
+
+_index = None
+_lock = threading.Lock()
+
+def get_course_facets():
+    """The current facet index, built on first use and rebuilt when the catalog version moved (one query)"""
+    index = _index
+    if index is None or index.version != get_version(CATALOG_SCOPE):
+        index = refresh_course_facets()
+    return index
+
+def refresh_course_facets():
+    """Rebuild the facet index of this process"""
+    global _index
+
+    index = CourseFacetIndex.build()
+    with _lock:
+        _index = index
+    return index
+
+def facet_filters(args):
+    """Active catalog filters from request args, typed like the index keys.
+
+    Raises ValueError for a non-integer category_id.
+    """
+    filters = {field: args.get(field) or None for field in FACET_FIELDS}
+    if filters['category_id'] is not None:
+        filters['category_id'] = int(filters['category_id'])
+    return filters
+
+# Course writes from any code path (and any worker) move the catalog version
+# within their own flush; category changes go with the course's updated_at
+@event.listens_for(Course, 'after_insert')
+@event.listens_for(Course, 'after_update')
+@event.listens_for(Course, 'after_delete')
+def _bump_catalog_version(mapper, connection, course):
+    bump_version(CATALOG_SCOPE, connection=connection)
@@ -0,0 +1,197 @@
+import re
+from sqlalchemy import event, func, or_, select, text
+from src.models.database import db, Course, CourseSection, CourseLesson
+
+# Harakat, superscript alef and tatweel
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+
+ARABIC_LETTER_FORMS = str.maketrans({
+    'أ': 'ا',  # alef with hamza above -> alef
+    'إ': 'ا',  # alef with hamza below -> alef
+    'آ': 'ا',  # alef with madda -> alef
+    'ٱ': 'ا',  # alef wasla -> alef
+    'ى': 'ي',  # alef maksura -> ya
+    'ة': 'ه',  # ta marbuta -> ha
+})
+
+# bm25() weights, in column order of the FTS5 table
+SQLITE_COLUMN_WEIGHTS = (10.0, 2.0, 4.0, 5.0)
+
+# Search backend picked by init_course_search(): 'fts5', 'tsvector' or None (LIKE scan)
+_backend = None
+
+def normalize_arabic(value):
+    """Fold text for indexing and querying: no diacritics, one alef/ya/ta-marbuta form, lower case"""
+    if not value:
+        return ''
+    return ARABIC_DIACRITICS.sub('', value).translate(ARABIC_LETTER_FORMS).lower()
+
+def search_terms(query):
+    """Normalized word tokens of a search query"""
+    return re.findall(r'\w+', normalize_arabic(query))
+
+def init_course_search(app):
+    """Create the search index for the configured database and fill it if it is out of date"""
+    global _backend
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'sqlite':
+                db.session.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS course_search USING fts5("
+                    "title, description, instructor_name, lesson_titles, tokenize = 'unicode61')"
+                ))
+                _backend = 'fts5'
+            elif dialect == 'postgresql':
+                db.session.execute(text(
+                    "CREATE TABLE IF NOT EXISTS course_search_documents ("
+                    "course_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+                ))
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_course_search_documents_document "
+                    "ON course_search_documents USING GIN (document)"
+                ))
+                _backend = 'tsvector'
+            db.session.commit()
+        except Exception as e:
+            # e.g. SQLite built without FTS5: search falls back to a LIKE scan
+            db.session.rollback()
+            _backend = None
+            app.logger.warning('Course search index unavailable: %s', e)
+            return
+
+        if _backend and _indexed_count() != Course.query.count():
+            rebuild_course_search()
+
+def rebuild_course_search():
+    """Re-index every course (two queries to read, one write per course)"""
+    if not _backend:
+        return 0
+
+    lesson_titles = {}
+    rows = db.session.query(CourseSection.course_id, CourseLesson.title).join(
+        CourseLesson, CourseLesson.section_id == CourseSection.id
+    ).order_by(CourseSection.course_id, CourseSection.order_index, CourseLesson.order_index).all()
+    for course_id, title in rows:
+        lesson_titles.setdefault(course_id, []).append(title or '')
+
+    connection = db.session.connection()
+    connection.execute(text(_delete_all_sql()))
+    courses = db.session.query(Course.id, Course.title, Course.description, Course.instructor_name).all()
+    for course_id, title, description, instructor_name in courses:
+        _write_document(connection, course_id, title, description, instructor_name, lesson_titles.get(course_id, []))
+    db.session.commit()
+    return len(courses)
+
+def search_courses(query, page=1, per_page=20):
+    """Ranked course ids matching `query` and the total match count.
+
+    FTS5 ranks with BM25 (title weighs most, then lesson titles); the
+    PostgreSQL index ranks with ts_rank over weighted tsvectors.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], 0
+    offset = (page - 1) * per_page
+
+    if _backend == 'fts5':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in SQLITE_COLUMN_WEIGHTS)
+        rows = db.session.execute(text(
+            # bm25() cannot share a SELECT with a window function, hence the subquery
+            f"SELECT rowid, count(*) OVER () FROM ("
+            f"SELECT rowid, bm25(course_search, {weights}) AS score FROM course_search WHERE course_search MATCH :match"
+            f") ORDER BY score, rowid LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'limit': per_page, 'offset': offset}).fetchall()
+    elif _backend == 'tsvector':
+        rows = db.session.execute(text(
+            "SELECT course_id, count(*) OVER () FROM course_search_documents "
+            "WHERE document @@ to_tsquery('simple', :match) "
+            "ORDER BY ts_rank(document, to_tsquery('simple', :match)) DESC, course_id "
+            "LIMIT :limit OFFSET :offset"
+        ), {'match': ' & '.join(f'{term}:*' for term in terms), 'limit': per_page, 'offset': offset}).fetchall()
+    else:
+        pattern = f"%{query}%"
+        rows = db.session.query(Course.id, func.count().over()).filter(
+            or_(Course.title.ilike(pattern), Course.description.ilike(pattern))
+        ).order_by(Course.id).limit(per_page).offset(offset).all()
+
+    total = rows[0][1] if rows else 0
+    return [row[0] for row in rows], total
+
+def _indexed_count():
+    table = 'course_search' if _backend == 'fts5' else 'course_search_documents'
+    return db.session.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+
+def _delete_all_sql():
+    return "DELETE FROM course_search" if _backend == 'fts5' else "DELETE FROM course_search_documents"
+
+def _write_document(connection, course_id, title, description, instructor_name, lesson_titles):
+    params = {
+        'course_id': course_id,
+        'title': normalize_arabic(title),
+        'description': normalize_arabic(description),
+        'instructor_name': normalize_arabic(instructor_name),
+        'lesson_titles': normalize_arabic(' '.join(lesson_titles))
+    }
+    if _backend == 'fts5':
+        connection.execute(text("DELETE FROM course_search WHERE rowid = :course_id"), params)
+        connection.execute(text(
+            "INSERT INTO course_search (rowid, title, description, instructor_name, lesson_titles) "
+            "VALUES (:course_id, :title, :description, :instructor_name, :lesson_titles)"
+        ), params)
+    elif _backend == 'tsvector':
+        connection.execute(text(
+            "INSERT INTO course_search_documents (course_id, document) VALUES (:course_id, "
+            "setweight(to_tsvector('simple', :title), 'A') || "
+            "setweight(to_tsvector('simple', :lesson_titles), 'B') || "
+            "setweight(to_tsvector('simple', :instructor_name), 'C') || "
+            "setweight(to_tsvector('simple', :description), 'D')) "
+            "ON CONFLICT (course_id) DO UPDATE SET document = excluded.document"
+        ), params)
+
+def _reindex_course(connection, course_id):
+    # Runs inside the flush, on the flushing connection, like a trigger would
+    course = connection.execute(
+        select(Course.title, Course.description, Course.instructor_name).where(Course.id == course_id)
+    ).first()
+    if course is None:
+        _remove_course(connection, course_id)
+        return
+    lesson_titles = [title or '' for (title,) in connection.execute(
+        select(CourseLesson.title).join(
+            CourseSection, CourseLesson.section_id == CourseSection.id
+        ).where(CourseSection.course_id == course_id).order_by(CourseSection.order_index, CourseLesson.order_index)
+    )]
+    _write_document(connection, course_id, course.title, course.description, course.instructor_name, lesson_titles)
+
+def _remove_course(connection, course_id):
+    if _backend == 'fts5':
+        connection.execute(text("DELETE FROM course_search WHERE rowid = :course_id"), {'course_id': course_id})
+    elif _backend == 'tsvector':
+        connection.execute(text("DELETE FROM course_search_documents WHERE course_id = :course_id"), {'course_id': course_id})
+
+# Keep the index current for writes from any code path (admin, seed scripts)
+@event.listens_for(Course, 'after_insert')
+@event.listens_for(Course, 'after_update')
+def _index_course(mapper, connection, course):
+    if _backend:
+        _reindex_course(connection, course.id)
+
+@event.listens_for(Course, 'after_delete')
+def _unindex_course(mapper, connection, course):
+    if _backend:
+        _remove_course(connection, course.id)
+
+@event.listens_for(CourseLesson, 'after_insert')
+@event.listens_for(CourseLesson, 'after_update')
+@event.listens_for(CourseLesson, 'after_delete')
+def _index_lesson_course(mapper, connection, lesson):
+    if not _backend:
+        return
+    course_id = connection.execute(
+        select(CourseSection.course_id).where(CourseSection.id == lesson.section_id)
+    ).scalar()
+    if course_id is not None:
+        _reindex_course(connection, course_id)
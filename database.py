@@ -18,3 +18,231 @@ class UserGameScore(db.Model):
 class AITool(db.Model):
     __tablename__ = 'ai_tools'
     
+
+class CourseRatingSummary(db.Model):
+    __tablename__ = 'course_rating_summaries'
+    
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0
+        return round(float(self.rating_sum) / self.rating_count, 1)
+    
+    @property
+    def histogram(self):
+        return {str(star): getattr(self, f'stars_{star}') or 0 for star in range(1, 6)}
+
+# Indexes backing keyset (cursor) pagination on non primary key orderings
+KEYSET_INDEXES = [
+    db.Index('ix_articles_published_created_at_id', Article.is_published, Article.created_at, Article.id),
+    db.Index('ix_user_game_scores_game_score_user', UserGameScore.game_id, UserGameScore.score, UserGameScore.user_id),
+]
+
+# Unique keys used as ON CONFLICT targets by src.utils.upsert
+UPSERT_INDEXES = [
+    db.Index('uq_course_ratings_user_course', CourseRating.user_id, CourseRating.course_id, unique=True),
+    db.Index('uq_user_course_progress_user_course', UserCourseProgress.user_id, UserCourseProgress.course_id, unique=True),
+]
+
+class FeaturedCourse(db.Model):
+    __tablename__ = 'featured_courses'
+    
+    rank = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    average_rating = db.Column(db.Float, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    course = db.relationship('Course', lazy='joined')
+
+class CourseLessonLayout(db.Model):
+    __tablename__ = 'course_lesson_layouts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    checksum = db.Column(db.String(40), nullable=False)
+    lesson_ids = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('course_id', 'checksum', name='uq_course_lesson_layout'),)
+
+class UserLessonCompletion(db.Model):
+    __tablename__ = 'user_lesson_completions'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    layout_id = db.Column(db.Integer, db.ForeignKey('course_lesson_layouts.id'), nullable=False)
+    bitmap = db.Column(db.LargeBinary, nullable=False, default=b'')
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    lesson_total = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Bit i is set when the i-th lesson of `layout` (in course order) is completed
+    layout = db.relationship('CourseLessonLayout', lazy='joined')
+
+class QuizQuestionTestCase(db.Model):
+    __tablename__ = 'quiz_question_test_cases'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.id'), nullable=False, index=True)
+    stdin = db.Column(db.Text, nullable=False, default='')
+    expected_output = db.Column(db.Text, nullable=False)
+    order_index = db.Column(db.Integer, nullable=False, default=0)
+
+class QuizAttemptGrading(db.Model):
+    __tablename__ = 'quiz_attempt_gradings'
+    
+    attempt_id = db.Column(db.Integer, db.ForeignKey('user_quiz_attempts.id'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, grading, graded, failed
+    total_questions = db.Column(db.Integer, nullable=False, default=0)
+    graded_questions = db.Column(db.Integer, nullable=False, default=0)
+    question_results = db.Column(db.JSON, nullable=False, default=dict)  # question id -> true/false, null while running
+    error = db.Column(db.Text)
+    claimed_by = db.Column(db.String(100))  # worker (host:pid) running the attempt's code answers
+    claimed_at = db.Column(db.DateTime)  # refreshed as answers finish; older claims may be taken over
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class QuizAttemptSnapshot(db.Model):
+    __tablename__ = 'quiz_attempt_snapshots'
+    
+    # Written when an attempt is graded so the history never joins quizzes or questions
+    attempt_id = db.Column(db.Integer, db.ForeignKey('user_quiz_attempts.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    quiz_title = db.Column(db.String(255))
+    score = db.Column(db.Integer, nullable=False, default=0)
+    total_possible = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='graded')
+    attempt_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_snapshots_user_date', 'user_id', 'attempt_date', 'attempt_id'),
+        db.Index('ix_quiz_attempt_snapshots_user_quiz_date', 'user_id', 'quiz_id', 'attempt_date', 'attempt_id'),
+    )
+
+class QuizBestScore(db.Model):
+    __tablename__ = 'quiz_best_scores'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), primary_key=True)
+    best_score = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    first_achieved_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # when best_score was first reached
+    
+    user = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_quiz_best_scores_quiz_rank', 'quiz_id', 'best_score', 'first_achieved_at'),
+    )
+
+class QuizUserTotal(db.Model):
+    __tablename__ = 'quiz_user_totals'
+    
+    # Sum of a user's best scores over all quizzes (global leaderboard)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_best_score = db.Column(db.Integer, nullable=False, default=0, index=True)
+    quizzes_attempted = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    user = db.relationship('User')
+
+class QuizCounter(db.Model):
+    __tablename__ = 'quiz_counters'
+    
+    # Counter cache for quiz listings, kept by the write paths and reconciled periodically
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Loaded in the same SELECT as the quiz
+    quiz = db.relationship('Quiz', backref=db.backref('counter', uselist=False, lazy='joined'))
+
+class QuizQuestionAnswerHash(db.Model):
+    __tablename__ = 'quiz_question_answer_hashes'
+    
+    # Canonical (AST / token) hash of a code question's correct answer
+    question_id = db.Column(db.Integer, db.ForeignKey('quiz_questions.id'), primary_key=True)
+    answer_hash = db.Column(db.String(64), nullable=False)
+    language = db.Column(db.String(50))
+    normalizer_version = db.Column(db.String(20), nullable=False)
+
+class QuizAttemptArchive(db.Model):
+    __tablename__ = 'quiz_attempt_archive'
+    
+    # Attempts past the retention age, moved out of user_quiz_attempts (answers zlib-compressed JSON)
+    attempt_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    quiz_id = db.Column(db.Integer, nullable=False)
+    quiz_title = db.Column(db.String(255))
+    score = db.Column(db.Integer, nullable=False, default=0)
+    total_possible = db.Column(db.Integer, nullable=False, default=0)
+    attempt_date = db.Column(db.DateTime, nullable=False)
+    answers = db.Column(db.LargeBinary)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_archive_user_date', 'user_id', 'attempt_date', 'attempt_id'),
+        db.Index('ix_quiz_attempt_archive_quiz', 'quiz_id'),
+    )
+
+class QuizAttemptRollup(db.Model):
+    __tablename__ = 'quiz_attempt_rollups'
+    
+    # Per-user per-quiz aggregates of archived attempts
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_total = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Integer, nullable=False, default=0)
+    best_achieved_at = db.Column(db.DateTime)  # when best_score was first reached
+    first_attempt_at = db.Column(db.DateTime)
+    last_attempt_at = db.Column(db.DateTime)
+
+class ArticleExcerpt(db.Model):
+    __tablename__ = 'article_excerpts'
+    
+    # Listing preview of an article, kept so listings never read the full content
+    article_id = db.Column(db.Integer, db.ForeignKey('articles.id'), primary_key=True)
+    excerpt = db.Column(db.Text, nullable=False, default='')
+    
+    # Loaded in the same SELECT as the article; deleted with it
+    article = db.relationship('Article', backref=db.backref(
+        'excerpt_entry', uselist=False, lazy='joined', cascade='all, delete-orphan'
+    ))
+
+class ArticleRendering(db.Model):
+    __tablename__ = 'article_renderings'
+    
+    # Sanitized HTML and table of contents rendered from the article content on save
+    article_id = db.Column(db.Integer, db.ForeignKey('articles.id'), primary_key=True)
+    content_html = db.Column(db.Text, nullable=False, default='')
+    toc = db.Column(db.JSON)
+    renderer_version = db.Column(db.Integer, nullable=False)
+    rendered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Loaded only where the article page asks for it; deleted with the article
+    article = db.relationship('Article', backref=db.backref(
+        'rendering', uselist=False, cascade='all, delete-orphan'
+    ))
+
+class ContentVersion(db.Model):
+    __tablename__ = 'content_versions'
+    
+    # Shared version counters, bumped in the writing transaction so every worker sees the change
+    scope = db.Column(db.String(40), primary_key=True)  # lesson_order, ...
+    key = db.Column(db.Integer, primary_key=True, autoincrement=False)  # e.g. course id; 0 for scope-wide counters
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
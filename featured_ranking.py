@@ -0,0 +1,165 @@
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import text
+from src.models.database import db, Course, CourseRatingSummary, FeaturedCourse
+
+# How many courses are kept in the ranking
+FEATURED_LIMIT = 12
+
+# Weight of the prior (in ratings): a course needs about this many ratings
+# before its own average outweighs the site-wide average
+FEATURED_PRIOR_WEIGHT = 5
+
+# Delay before a refresh triggered by a write runs; writes in between share it
+FEATURED_DEBOUNCE_SECONDS = 30
+
+# PostgreSQL advisory lock key ('feat') held by the worker rewriting featured_courses
+FEATURED_LOCK_KEY = 0x66656174
+
+_featured = None
+_lock = threading.Lock()
+_pending_refresh = None
+
+def bayesian_score(rating_sum, rating_count, prior_mean, prior_weight=FEATURED_PRIOR_WEIGHT):
+    """Average rating shrunk towards the site-wide mean for courses with few ratings"""
+    return (rating_sum + prior_weight * prior_mean) / float(rating_count + prior_weight)
+
+def compute_featured_ranking(limit=FEATURED_LIMIT):
+    """Score every rated course, store the top `limit` and swap them in memory.
+
+    The table is rewritten under a transaction-scoped advisory lock on
+    PostgreSQL, so workers refreshing at the same time do not collide on
+    the rank key; SQLite already serializes writers.
+    """
+    global _featured
+
+    rows = db.session.query(Course, CourseRatingSummary).join(
+        CourseRatingSummary, CourseRatingSummary.course_id == Course.id
+    ).filter(CourseRatingSummary.rating_count > 0).all()
+
+    total_sum = sum(summary.rating_sum for _, summary in rows)
+    total_count = sum(summary.rating_count for _, summary in rows)
+    prior_mean = float(total_sum) / total_count if total_count else 0
+
+    ranked = sorted(
+        rows,
+        key=lambda row: (bayesian_score(row[1].rating_sum, row[1].rating_count, prior_mean), row[0].id),
+        reverse=True
+    )[:limit]
+
+    now = datetime.utcnow()
+    # Every worker refreshes; only the lock holder rewrites the table, the
+    # others keep their (identical) result in memory only
+    store = _try_refresh_lock()
+    if store:
+        FeaturedCourse.query.delete()
+    entries = []
+    for rank, (course, summary) in enumerate(ranked, start=1):
+        entry = FeaturedCourse(
+            rank=rank,
+            course_id=course.id,
+            score=bayesian_score(summary.rating_sum, summary.rating_count, prior_mean),
+            average_rating=summary.average_rating,
+            rating_count=summary.rating_count,
+            computed_at=now
+        )
+        if store:
+            db.session.add(entry)
+        entries.append(_featured_payload(course, entry))
+    db.session.commit()
+
+    with _lock:
+        _featured = entries
+    return entries
+
+def get_featured_ranking(limit=6):
+    """Top featured course payloads; held in memory after the first load (one query per call)"""
+    global _featured
+
+    featured = _featured
+    if featured is None:
+        # First call in this process: load the stored ranking (deleted courses have no row)
+        stored = FeaturedCourse.query.order_by(FeaturedCourse.rank).all()
+        featured = [_featured_payload(entry.course, entry) for entry in stored if entry.course is not None]
+        if stored:
+            with _lock:
+                _featured = featured
+        else:
+            # Never computed yet: build it in the background, not in this request
+            schedule_featured_refresh(delay=0)
+        return featured[:limit]
+
+    # Courses deleted since the ranking was computed (possibly by another worker) are left out
+    live = _live_course_ids([course['id'] for course in featured])
+    if len(live) < len(featured):
+        featured = [course for course in featured if course['id'] in live]
+        with _lock:
+            _featured = featured
+        schedule_featured_refresh()
+
+    return featured[:limit]
+
+def schedule_featured_refresh(delay=FEATURED_DEBOUNCE_SECONDS):
+    """Recompute the ranking shortly after a write; calls made while one is pending are merged"""
+    global _pending_refresh
+
+    app = current_app._get_current_object()
+    with _lock:
+        if _pending_refresh is not None:
+            return
+        timer = threading.Timer(delay, _run_refresh, args=(app,))
+        timer.daemon = True
+        _pending_refresh = timer
+    timer.start()
+
+def _run_refresh(app):
+    global _pending_refresh
+
+    with _lock:
+        _pending_refresh = None
+    with app.app_context():
+        try:
+            compute_featured_ranking()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning('Featured course ranking failed: %s', e)
+
+def init_featured_ranking(app):
+    """Refresh the ranking every FEATURED_REFRESH_SECONDS in a background thread"""
+    interval = app.config.setdefault('FEATURED_REFRESH_SECONDS', 600)
+    if app.testing or not interval:
+        return
+
+    def refresh_forever():
+        while True:
+            _run_refresh(app)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=refresh_forever, name='featured-ranking', daemon=True)
+    thread.start()
+
+def _try_refresh_lock():
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return True
+    return db.session.execute(text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': FEATURED_LOCK_KEY}).scalar()
+
+def _live_course_ids(course_ids):
+    if not course_ids:
+        return set()
+    return {course_id for (course_id,) in db.session.query(Course.id).filter(Course.id.in_(course_ids))}
+
+def _featured_payload(course, entry):
+    return {
+        'id': course.id,
+        'title': course.title,
+        'description': course.description,
+        'youtube_video_id': course.youtube_video_id,
+        'language': course.language,
+        'level': course.level,
+        'programming_language': course.programming_language,
+        'instructor_name': course.instructor_name,
+        'average_rating': entry.average_rating,
+        'rating_count': entry.rating_count
+    }
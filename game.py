@@ -1,10 +1,16 @@
+from datetime import datetime
 from flask import Blueprint, jsonify, request
 from src.models.database import db, Game, UserGameScore
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.utils.pagination import keyset_paginate, wants_cursor, wants_total
+from src.utils.query_budget import query_budget
+from src.utils.upsert import upsert
+from sqlalchemy.orm import selectinload
 
 game_bp = Blueprint('game', __name__, url_prefix='/api/games')
 
 @game_bp.route('', methods=['GET'])
+@query_budget(1)
 def get_all_games():
     """Get all games"""
     games = Game.query.all()
@@ -25,12 +31,13 @@ def get_all_games():
     return jsonify(result)
 
 @game_bp.route('/<int:game_id>', methods=['GET'])
+@query_budget(3)
 def get_game(game_id):
     """Get a specific game by ID"""
     game = Game.query.get_or_404(game_id)
     
     # Get top scores
-    top_scores = UserGameScore.query.filter_by(game_id=game_id).order_by(UserGameScore.score.desc()).limit(10).all()
+    top_scores = UserGameScore.query.options(selectinload(UserGameScore.user)).filter_by(game_id=game_id).order_by(UserGameScore.score.desc()).limit(10).all()
     
     # Format response
     result = {
@@ -69,25 +76,23 @@ def submit_score(game_id):
     if not isinstance(score, int) or score < 0:
         return jsonify({'message': 'Score must be a positive integer'}), 400
     
-    # Check if user already has a score for this game
-    user_score = UserGameScore.query.filter_by(user_id=user_id, game_id=game_id).first()
+    # Keep the best score in one statement (insert, or update only if higher)
+    written = upsert(UserGameScore, {
+        'user_id': user_id,
+        'game_id': game_id,
+        'score': score,
+        'played_at': datetime.utcnow()
+    }, ['user_id', 'game_id'], where=lambda current, new: new.score > current.score)
+    db.session.commit()
     
-    if user_score:
-        # Update score if new score is higher
-        if score > user_score.score:
-            user_score.score = score
-            db.session.commit()
-            return jsonify({'message': 'Score updated successfully', 'score': score})
-        else:
-            return jsonify({'message': 'Your previous score was higher', 'score': user_score.score})
-    else:
-        # Create new score
-        new_score = UserGameScore(user_id=user_id, game_id=game_id, score=score)
-        db.session.add(new_score)
-        db.session.commit()
+    if written:
         return jsonify({'message': 'Score submitted successfully', 'score': score})
+    
+    user_score = UserGameScore.query.filter_by(user_id=user_id, game_id=game_id).first()
+    return jsonify({'message': 'Your previous score was higher', 'score': user_score.score})
 
 @game_bp.route('/<int:game_id>/leaderboard', methods=['GET'])
+@query_budget(4)
 def get_leaderboard(game_id):
     """Get leaderboard for a game"""
     # Check if game exists
@@ -98,10 +103,34 @@ def get_leaderboard(game_id):
     limit = request.args.get('limit', 10, type=int)
     
     # Get scores
-    scores_query = UserGameScore.query.filter_by(game_id=game_id).order_by(UserGameScore.score.desc())
+    scores_query = UserGameScore.query.options(selectinload(UserGameScore.user)).filter_by(game_id=game_id).order_by(UserGameScore.score.desc())
     
-    # Apply pagination
-    pagination = scores_query.paginate(page=page, per_page=limit, error_out=False)
+    # Apply pagination (keyset mode when a cursor is sent)
+    if wants_cursor(request.args):
+        try:
+            pagination = keyset_paginate(
+                scores_query, [UserGameScore.score, UserGameScore.user_id],
+                request.args.get('cursor'), limit,
+                descending=True, with_total=wants_total(request.args)
+            )
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        first_rank = pagination.offset + 1
+        page_info = {
+            'limit': limit,
+            'total': pagination.total,
+            'next_cursor': pagination.next_cursor,
+            'has_next': pagination.has_next
+        }
+    else:
+        pagination = scores_query.paginate(page=page, per_page=limit, error_out=False)
+        first_rank = (page - 1) * limit + 1
+        page_info = {
+            'page': page,
+            'limit': limit,
+            'total': pagination.total,
+            'pages': pagination.pages
+        }
     scores = pagination.items
     
     # Format response
@@ -112,17 +141,14 @@ def get_leaderboard(game_id):
         },
         'leaderboard': [
             {
-                'rank': (page - 1) * limit + i + 1,
+                'rank': first_rank + i,
                 'user_id': score.user_id,
                 'username': score.user.username,
                 'score': score.score,
                 'played_at': score.played_at.isoformat()
             } for i, score in enumerate(scores)
         ],
-        'page': page,
-        'limit': limit,
-        'total': pagination.total,
-        'pages': pagination.pages
+        **page_info
     }
     
     return jsonify(result)
@@ -0,0 +1,359 @@
+import hashlib
+import threading
+from datetime import datetime
+from flask import g, has_app_context
+from sqlalchemy import func
+from src.models.database import db, CourseSection, CourseLesson, CourseLessonLayout, UserCourseProgress, UserLessonCompletion
+from src.models.content_versions import bump_version, get_version
+from src.utils.upsert import upsert
+
+# Most events accepted by one POST /api/progress/batch call
+PROGRESS_BATCH_LIMIT = 500
+
+# course_id -> (persisted lesson order version, lesson ids in course order (section order, then lesson order))
+_lesson_order = {}
+_lock = threading.Lock()
+
+# ContentVersion scope bumped (per course) by every section or lesson write
+LESSON_ORDER_SCOPE = 'lesson_order'
+
+# Marks a completion row the caller did not load (None means "no row")
+_NOT_LOADED = object()
+
+def course_lesson_ids(course_id):
+    """Lesson ids of a course in course order (cached per process for courses with lessons).
+
+    The cached order is checked against the course's persisted lesson order
+    version once per request, so writes made through other workers are seen.
+    """
+    checked = g.setdefault('lesson_orders', {}) if has_app_context() else {}
+    if course_id in checked:
+        return checked[course_id]
+
+    version = get_version(LESSON_ORDER_SCOPE, course_id)
+    with _lock:
+        cached = _lesson_order.get(course_id)
+    if cached is not None and cached[0] == version:
+        checked[course_id] = cached[1]
+        return cached[1]
+
+    lesson_ids = [lesson_id for (lesson_id,) in db.session.query(CourseLesson.id).join(
+        CourseSection, CourseLesson.section_id == CourseSection.id
+    ).filter(
+        CourseSection.course_id == course_id
+    ).order_by(
+        CourseSection.order_index, CourseSection.id, CourseLesson.order_index, CourseLesson.id
+    ).all()]
+
+    # Empty results are not cached: any id can be asked for, so they would pile up
+    if lesson_ids:
+        with _lock:
+            _lesson_order[course_id] = (version, lesson_ids)
+    checked[course_id] = lesson_ids
+    return lesson_ids
+
+def invalidate_lesson_order(course_ids, connection=None):
+    """Forget the lesson order of courses after a section or lesson write, in every worker.
+
+    Bumps each course's persisted version; pass `connection` from mapper
+    events (inside the flush).
+    """
+    for course_id in course_ids:
+        with _lock:
+            _lesson_order.pop(course_id, None)
+        if has_app_context():
+            g.pop('lesson_orders', None)
+        bump_version(LESSON_ORDER_SCOPE, course_id, connection)
+
+def encode_bitmap(lesson_ids, completed_ids):
+    """Bit i (LSB first) is set when lesson_ids[i] is in completed_ids"""
+    bits = bytearray((len(lesson_ids) + 7) // 8)
+    for index, lesson_id in enumerate(lesson_ids):
+        if lesson_id in completed_ids:
+            bits[index // 8] |= 1 << (index % 8)
+    return bytes(bits)
+
+def decode_bitmap(bitmap, lesson_ids):
+    """Lesson ids whose bit is set, in layout order"""
+    return [
+        lesson_id for index, lesson_id in enumerate(lesson_ids)
+        if index // 8 < len(bitmap) and bitmap[index // 8] & (1 << (index % 8))
+    ]
+
+def count_bits(bitmap):
+    return sum(bin(byte).count('1') for byte in bitmap)
+
+def get_course_progress(user_id, course_id):
+    """Load (progress, completed lesson ids in course order, lesson total) for a user"""
+    lesson_ids = course_lesson_ids(course_id)
+    progress = UserCourseProgress.query.filter_by(user_id=user_id, course_id=course_id).first()
+    completion = UserLessonCompletion.query.get((user_id, course_id))
+    completed = set(_completed_ids(progress, completion))
+    return progress, [lesson_id for lesson_id in lesson_ids if lesson_id in completed], len(lesson_ids)
+
+def set_lesson_completed(user_id, course_id, lesson_id, completed):
+    """Mark one lesson complete or incomplete (the caller commits).
+
+    Only the completion row of this user and course is rewritten. It is
+    inserted with ON CONFLICT DO NOTHING when missing and then locked, so
+    concurrent writes, first ones included, queue on the row instead of
+    failing. Raises ValueError if the lesson does not belong to the course.
+    """
+    if lesson_id not in course_lesson_ids(course_id):
+        raise ValueError('Lesson does not belong to this course')
+    return apply_lesson_changes(user_id, course_id, {lesson_id: completed}, current_lesson_id=lesson_id)
+
+def apply_lesson_changes(user_id, course_id, changes, current_lesson_id=None, progress=None, completion=_NOT_LOADED):
+    """Apply {lesson_id: completed} changes to a user's bitmap in one write (the caller commits).
+
+    `progress` and `completion` may be passed when the caller already
+    loaded them (e.g. for a whole batch); otherwise they are loaded here,
+    with the completion row locked. Ids of other courses are ignored.
+    """
+    lesson_ids = course_lesson_ids(course_id)
+
+    if progress is None:
+        progress = _get_or_create_progress(user_id, course_id)
+    if completion is _NOT_LOADED:
+        completion = _lock_completion(user_id, course_id)
+    layout = _get_layout(course_id, lesson_ids)
+
+    created = False
+    if completion is None:
+        completion, created = _create_completion(user_id, course_id, layout)
+
+    if not created and completion.layout_id == layout.id:
+        bits = bytearray(completion.bitmap.ljust((len(lesson_ids) + 7) // 8, b'\0'))
+    else:
+        # New row (seeded from legacy progress), or the lessons were reordered since it was written
+        bits = bytearray(encode_bitmap(lesson_ids, set(_completed_ids(progress, None if created else completion))))
+
+    positions = {lesson_id: index for index, lesson_id in enumerate(lesson_ids)}
+    for lesson_id, completed in changes.items():
+        index = positions.get(lesson_id)
+        if index is None:
+            continue
+        if completed:
+            bits[index // 8] |= 1 << (index % 8)
+        else:
+            bits[index // 8] &= ~(1 << (index % 8)) & 0xFF
+
+    completion = _store_bitmap(completion, layout, bytes(bits), len(lesson_ids))
+    if current_lesson_id is not None:
+        progress.lesson_id = current_lesson_id
+    _sync_status(progress, completion)
+    return progress, completion
+
+def set_current_lesson(user_id, course_id, lesson_id):
+    """Remember the last lesson a user opened in a course (the caller commits)"""
+    progress = _get_or_create_progress(user_id, course_id)
+    progress.lesson_id = lesson_id
+    if not progress.status or progress.status == 'not_started':
+        progress.status = 'in_progress'
+    return progress
+
+def replace_completed_lessons(user_id, course_id, completed_ids):
+    """Store a full list of completed lessons (legacy clients); unknown ids are ignored"""
+    lesson_ids = course_lesson_ids(course_id)
+    progress = _get_or_create_progress(user_id, course_id)
+    completion = _lock_completion(user_id, course_id)
+    layout = _get_layout(course_id, lesson_ids)
+    if completion is None:
+        completion, _ = _create_completion(user_id, course_id, layout)
+
+    bitmap = encode_bitmap(lesson_ids, set(completed_ids))
+    completion = _store_bitmap(completion, layout, bitmap, len(lesson_ids))
+    _sync_status(progress, completion)
+    return progress, completion
+
+def apply_progress_batch(user_id, events):
+    """Apply an ordered list of offline progress events in one pass (the caller commits).
+
+    Each event is {'course_id', 'lesson_id', 'completed'?, 'id'?}; without
+    'completed' it only records the lesson as opened. Events are coalesced
+    per course (the last event for a lesson wins) so every course gets a
+    single bitmap write. Returns one result per event, in order, and a
+    summary per touched course.
+    """
+    results = []
+    pending = {}  # course_id -> (changes, current lesson id)
+
+    for index, event in enumerate(events):
+        result = {'index': index}
+        if isinstance(event, dict) and 'id' in event:
+            result['id'] = event['id']
+        results.append(result)
+
+        error = _validate_event(event)
+        if error:
+            result.update({'status': 'rejected', 'error': error})
+            continue
+
+        course_id = event['course_id']
+        lesson_id = event['lesson_id']
+        if lesson_id not in course_lesson_ids(course_id):
+            result.update({'status': 'rejected', 'error': 'Lesson does not belong to this course'})
+            continue
+
+        changes, _ = pending.get(course_id, ({}, None))
+        if 'completed' in event:
+            changes[lesson_id] = event['completed']
+        pending[course_id] = (changes, lesson_id)
+        result.update({'status': 'applied', 'course_id': course_id})
+
+    if not pending:
+        return results, {}
+
+    course_ids = list(pending)
+    progress_rows = {
+        progress.course_id: progress
+        for progress in UserCourseProgress.query.filter(
+            UserCourseProgress.user_id == user_id,
+            UserCourseProgress.course_id.in_(course_ids)
+        ).all()
+    }
+    completion_rows = {
+        completion.course_id: completion
+        for completion in UserLessonCompletion.query.filter(
+            UserLessonCompletion.user_id == user_id,
+            UserLessonCompletion.course_id.in_(course_ids)
+        ).with_for_update().all()
+    }
+
+    courses = {}
+    for course_id, (changes, current_lesson_id) in pending.items():
+        progress = progress_rows.get(course_id) or _get_or_create_progress(user_id, course_id)
+        progress, completion = apply_lesson_changes(
+            user_id,
+            course_id,
+            changes,
+            current_lesson_id=current_lesson_id,
+            progress=progress,
+            completion=completion_rows.get(course_id)
+        )
+        courses[course_id] = {
+            'status': progress.status,
+            'lesson_id': progress.lesson_id,
+            'completed_count': completion.completed_count,
+            'lesson_total': completion.lesson_total
+        }
+
+    return results, courses
+
+def delete_user_completions(user_id):
+    """Remove a user's lesson completion bitmaps before the user is deleted (the caller commits)"""
+    UserLessonCompletion.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+def progress_payload(progress, completed_ids, lesson_total):
+    """JSON body of GET /courses/<id>/progress"""
+    completed_count = len(completed_ids)
+    return {
+        'status': progress.status if progress else 'not_started',
+        'completed_lessons': completed_ids,
+        'completed_count': completed_count,
+        'lesson_total': lesson_total,
+        'percent_complete': round(100.0 * completed_count / lesson_total, 1) if lesson_total else 0,
+        'started_at': progress.started_at.isoformat() if progress and progress.started_at else None,
+        'completed_at': progress.completed_at.isoformat() if progress and progress.completed_at else None
+    }
+
+def _completed_ids(progress, completion):
+    if completion is not None:
+        # Decode with the layout the bits were written for
+        return decode_bitmap(completion.bitmap, completion.layout.lesson_ids)
+    if progress is not None and progress.completed_lessons:
+        # Rows written before completion bitmaps existed
+        return list(progress.completed_lessons)
+    return []
+
+def _validate_event(event):
+    if not isinstance(event, dict):
+        return 'Event must be an object'
+    for field in ('course_id', 'lesson_id'):
+        if not isinstance(event.get(field), int) or isinstance(event.get(field), bool):
+            return f'{field} must be an integer'
+    if 'completed' in event and not isinstance(event['completed'], bool):
+        return 'completed must be true or false'
+    return None
+
+def _get_or_create_progress(user_id, course_id):
+    progress = UserCourseProgress.query.filter_by(user_id=user_id, course_id=course_id).first()
+    if not progress:
+        # Concurrent first writes: the losing insert does nothing and both read the winning row
+        upsert(UserCourseProgress, {
+            'user_id': user_id,
+            'course_id': course_id,
+            'completed_lessons': []
+        }, ['user_id', 'course_id'], update_columns=[])
+        progress = UserCourseProgress.query.filter_by(user_id=user_id, course_id=course_id).first()
+    return progress
+
+def _lock_completion(user_id, course_id):
+    return UserLessonCompletion.query.filter_by(
+        user_id=user_id,
+        course_id=course_id
+    ).with_for_update().first()
+
+def _create_completion(user_id, course_id, layout):
+    """Insert an empty completion row unless one exists, then lock it; returns (row, whether we inserted it)"""
+    created = upsert(UserLessonCompletion, {
+        'user_id': user_id,
+        'course_id': course_id,
+        'layout_id': layout.id,
+        'bitmap': b'',
+        'completed_count': 0,
+        'lesson_total': 0,
+        'updated_at': datetime.utcnow()
+    }, ['user_id', 'course_id'], update_columns=[])
+    return _lock_completion(user_id, course_id), created
+
+def _get_layout(course_id, lesson_ids):
+    checksum = hashlib.sha1(','.join(str(lesson_id) for lesson_id in lesson_ids).encode('ascii')).hexdigest()
+    layout = CourseLessonLayout.query.filter_by(course_id=course_id, checksum=checksum).first()
+    if not layout:
+        upsert(CourseLessonLayout, {
+            'course_id': course_id,
+            'checksum': checksum,
+            'lesson_ids': list(lesson_ids),
+            'created_at': datetime.utcnow()
+        }, ['course_id', 'checksum'], update_columns=[])
+        layout = CourseLessonLayout.query.filter_by(course_id=course_id, checksum=checksum).first()
+    return layout
+
+def _store_bitmap(completion, layout, bitmap, lesson_total):
+    completion.layout_id = layout.id
+    completion.layout = layout
+    completion.bitmap = bitmap
+    completion.completed_count = count_bits(bitmap)
+    completion.lesson_total = lesson_total
+    return completion
+
+def remove_duplicate_progress(dry_run=False):
+    """Delete all but the newest progress row of each (user, course) pair.
+
+    Duplicates were possible before progress rows were upserted and block
+    the uq_user_course_progress_user_course index. Returns the number of
+    rows removed.
+    """
+    newest = db.session.query(func.max(UserCourseProgress.id)).group_by(
+        UserCourseProgress.user_id, UserCourseProgress.course_id
+    )
+    duplicates = UserCourseProgress.query.filter(~UserCourseProgress.id.in_(newest))
+    count = duplicates.count()
+
+    if count and not dry_run:
+        duplicates.delete(synchronize_session=False)
+        db.session.commit()
+
+    return count
+
+def _sync_status(progress, completion):
+    # Status and completed_at are derived from the bitmap, never sent by clients
+    progress.completed_lessons = []
+    if completion.lesson_total and completion.completed_count >= completion.lesson_total:
+        if progress.status != 'completed' or not progress.completed_at:
+            progress.completed_at = datetime.utcnow()
+        progress.status = 'completed'
+    else:
+        progress.status = 'in_progress'
+        progress.completed_at = None
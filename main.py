@@ -8,11 +8,13 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
 
 # Load environment variables
 load_dotenv()
 
-from src.models.database import db
+from src.models.database import db, KEYSET_INDEXES, UPSERT_INDEXES
 from src.routes.user import user_bp
 from src.routes.auth import auth_bp, init_auth_oauth
 from src.routes.course import course_bp
@@ -21,6 +23,18 @@ from src.routes.article import article_bp
 from src.routes.game import game_bp
 from src.routes.ai_tool import ai_tool_bp
 from src.routes.admin import admin_bp
+from src.models.article_excerpts import backfill_article_excerpts
+from src.models.article_search import init_article_search
+from src.models.async_grading import init_async_grading
+from src.models.attempt_archive import init_attempt_archival
+from src.models.code_grading import init_grading_pool
+from src.models.course_facets import refresh_course_facets
+from src.models.course_search import init_course_search
+from src.models.featured_ranking import init_featured_ranking
+from src.models.lesson_progress import remove_duplicate_progress
+from src.models.quiz_counters import init_quiz_counters
+from src.models.rating_summary import backfill_rating_summaries
+from src.utils.query_budget import init_query_budget
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
@@ -38,6 +52,8 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 CORS(app, origins="*")  # Allow all origins for development
 jwt = JWTManager(app)
 db.init_app(app)
+init_query_budget(app)
+init_grading_pool(app)
 
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
@@ -52,9 +68,54 @@ app.register_blueprint(admin_bp, url_prefix='/api')
 # Initialize OAuth for auth blueprint
 init_auth_oauth(app)
 
+# One-off cleanups that must run before a unique index can be created
+INDEX_CLEANUP_COMMANDS = {
+    'uq_course_ratings_user_course': 'python src/scripts/reconcile_rating_summaries.py',
+}
+
+def create_index(index):
+    """Create an index if missing; a unique index blocked by duplicate rows stops the boot with the cleanup to run"""
+    try:
+        index.create(bind=db.engine, checkfirst=True)
+    except DBAPIError as e:
+        # Another worker may have created it in between
+        existing = {item['name'] for item in inspect(db.engine).get_indexes(index.table.name)}
+        if index.name in existing:
+            return
+        cleanup = INDEX_CLEANUP_COMMANDS.get(index.name)
+        hint = f' Remove duplicate rows first: {cleanup}' if cleanup else ''
+        raise RuntimeError(f'Could not create index {index.name}: {e.orig}.{hint}') from e
+
 # Create database tables
 with app.app_context():
     db.create_all()
+    # Summaries of ratings written before summaries existed (first deploy)
+    backfill_rating_summaries()
+    # Rows duplicated before progress was upserted would block its unique index
+    remove_duplicate_progress()
+    # create_all() skips indexes of tables that already exist
+    for index in KEYSET_INDEXES + UPSERT_INDEXES:
+        create_index(index)
+    # Build the catalog facet index before the first request
+    refresh_course_facets()
+    # Excerpts of articles written without them (e.g. by seed scripts)
+    backfill_article_excerpts()
+
+# Create (and fill if needed) the course and article search indexes
+init_course_search(app)
+init_article_search(app)
+
+# Keep the featured course ranking fresh
+init_featured_ranking(app)
+
+# Finish quiz gradings left pending by a full queue or a restart
+init_async_grading(app)
+
+# Correct drift in the quiz counter caches
+init_quiz_counters(app)
+
+# Move quiz attempts past the retention age to the archive
+init_attempt_archival(app)
 
 # Admin dashboard route
 @app.route('/admin')
@@ -0,0 +1,130 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DATETIME_PREFIX = 'dt:'
+
+# Types a decoded sort key value may have (nested lists or objects are rejected)
+SCALAR_TYPES = (str, int, float, datetime, type(None))
+
+class KeysetPage:
+    """One page of a keyset (cursor) paginated query"""
+
+    def __init__(self, items, per_page, next_cursor, offset, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.offset = offset
+        self.total = total
+
+    def to_dict(self):
+        return {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'has_next': self.has_next,
+            'total': self.total
+        }
+
+def wants_cursor(args):
+    """Cursor mode is opt-in: it is used whenever a `cursor` argument is sent (even empty)"""
+    return 'cursor' in args
+
+def wants_total(args):
+    """Parse the `with_total` flag (the exact total is skipped unless asked for)"""
+    return str(args.get('with_total', 'false')).lower() in ('1', 'true', 'yes')
+
+def encode_cursor(values, offset):
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    payload = {
+        'k': [_encode_value(value) for value in values],
+        'o': offset
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor into (sort key values, offset); raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(payload, dict) or not isinstance(payload['k'], list):
+            raise ValueError('Invalid cursor')
+        values = [_decode_value(value) for value in payload['k']]
+        offset = payload['o']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor') from None
+    if not all(isinstance(value, SCALAR_TYPES) for value in values):
+        raise ValueError('Invalid cursor')
+    if type(offset) is not int or offset < 0:
+        raise ValueError('Invalid cursor')
+    return values, offset
+
+def keyset_paginate(query, order_columns, cursor=None, per_page=20, descending=False, with_total=False):
+    """Paginate a query by seeking past the last seen (sort_key, id) tuple.
+
+    `order_columns` must end with a unique column (usually the primary key)
+    and should be covered by an index. Unlike OFFSET pagination the cost of
+    a page does not grow with its depth, and COUNT(*) only runs when
+    `with_total` is set.
+    """
+    per_page = max(1, int(per_page))
+    offset = 0
+    total = query.order_by(None).count() if with_total else None
+
+    if cursor:
+        values, offset = decode_cursor(cursor)
+        if len(values) != len(order_columns) or not all(
+            _matches_column(column, value) for column, value in zip(order_columns, values)
+        ):
+            raise ValueError('Invalid cursor')
+        query = query.filter(_seek_condition(order_columns, values, descending))
+
+    ordering = [column.desc() if descending else column.asc() for column in order_columns]
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            [getattr(last, column.key) for column in order_columns],
+            offset + len(items)
+        )
+
+    return KeysetPage(items, per_page, next_cursor, offset, total)
+
+def _seek_condition(order_columns, values, descending):
+    # Expanded form of (a, b) > (x, y): a > x OR (a = x AND b > y).
+    # Works on every dialect and can still use a composite index.
+    clauses = []
+    for i, column in enumerate(order_columns):
+        equal = [order_columns[j] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return DATETIME_PREFIX + value.isoformat()
+    return value
+
+def _decode_value(value):
+    if isinstance(value, str) and value.startswith(DATETIME_PREFIX):
+        return datetime.fromisoformat(value[len(DATETIME_PREFIX):])
+    return value
+
+def _matches_column(column, value):
+    # A value of the wrong type would only fail in the database (500 instead of 400)
+    if value is None:
+        return True
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return True
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
@@ -0,0 +1,59 @@
+from functools import wraps
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised (in testing) when an endpoint runs more queries than its budget"""
+
+def query_budget(max_queries):
+    """Declare how many SQL statements a view may run per request.
+
+    Place it directly under the route decorator so the budget is attached
+    to the function Flask registers, e.g.:
+
+        @course_bp.route('/courses', methods=['GET'])
+        @query_budget(4)
+        def get_courses():
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            g.query_budget = max_queries
+            return fn(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+def get_query_count():
+    """Number of SQL statements run so far in the current request"""
+    return g.get('query_count', 0)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+def init_query_budget(app):
+    """Check every request against the budget of its endpoint.
+
+    Over-budget requests raise QueryBudgetExceeded when QUERY_BUDGET_RAISE
+    is set (defaults to app.testing) and are logged as warnings otherwise.
+    """
+    app.config.setdefault('QUERY_BUDGET_RAISE', app.testing)
+
+    @app.after_request
+    def check_query_budget(response):
+        budget = g.get('query_budget')
+        count = get_query_count()
+
+        if app.debug:
+            response.headers['X-Query-Count'] = str(count)
+
+        if budget is not None and count > budget:
+            message = f'{request.endpoint} ran {count} queries (budget {budget})'
+            if app.config['QUERY_BUDGET_RAISE']:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning('Query budget exceeded: %s', message)
+
+        return response
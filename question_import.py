@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+from src.models.database import db, QuizQuestion, QuizQuestionAnswerHash, QuizQuestionTestCase
+from src.models.answer_keys import bump_quiz_version
+from src.models.code_grading import RUNNABLE_QUESTION_TYPES
+from src.models.quiz_counters import bump_quiz_counters
+from src.utils.answer_normalization import NORMALIZER_VERSION, answer_hash
+
+QUESTION_TYPES = ('multiple_choice', 'code_output', 'code_completion', 'debugging')
+IMPORT_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+# CSV columns holding JSON
+JSON_COLUMNS = ('options', 'test_cases')
+
+def read_rows(stream, fmt):
+    """Yield (row number, dict or error message) from a CSV or NDJSON byte stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            data = {key: value for key, value in row.items() if key and value not in (None, '')}
+            for column in JSON_COLUMNS:
+                if column in data:
+                    try:
+                        data[column] = json.loads(data[column])
+                    except ValueError:
+                        data = f'{column} is not valid JSON'
+                        break
+            yield reader.line_num, data
+    else:
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                yield number, 'Invalid JSON'
+                continue
+            yield number, data if isinstance(data, dict) else 'Each line must be a JSON object'
+
+def validate_row(data):
+    """QuizQuestion fields and test cases of one import row; raises ValueError"""
+    if not all(data.get(field) for field in ('question_text', 'question_type')):
+        raise ValueError('Missing required fields')
+    if data['question_type'] not in QUESTION_TYPES:
+        raise ValueError(f"Unknown question_type '{data['question_type']}'")
+
+    try:
+        points = int(data.get('difficulty_points', 1))
+    except (TypeError, ValueError):
+        raise ValueError('difficulty_points must be an integer') from None
+
+    test_cases = data.get('test_cases') or []
+    if not isinstance(test_cases, list) or not all(
+        isinstance(case, dict) and isinstance(case.get('expected_output'), str) for case in test_cases
+    ):
+        raise ValueError('test_cases must be a list of {stdin, expected_output}')
+
+    fields = {
+        'question_text': str(data['question_text']),
+        'question_type': data['question_type'],
+        'code_snippet': data.get('code_snippet'),
+        'correct_answer': data.get('correct_answer'),
+        'options': data.get('options'),
+        'explanation': data.get('explanation'),
+        'difficulty_points': points
+    }
+    return fields, test_cases
+
+def import_questions(quiz, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """Insert validated rows in chunks, one transaction each; returns (imported, error count, errors).
+
+    Invalid rows are reported and skipped; a chunk the database rejects
+    is rolled back and all of its rows reported. The caller bumps the
+    quiz's answer-key version once at the end.
+    """
+    language = quiz.programming_language
+    imported = 0
+    error_count = 0
+    errors = []
+    chunk = []
+
+    def report(number, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'row': number, 'error': message})
+
+    def flush():
+        nonlocal imported
+        try:
+            _insert_chunk(quiz.id, language, [(fields, test_cases) for _, fields, test_cases in chunk])
+            # Every worker drops its answer key and payload as this chunk commits
+            bump_quiz_version(quiz.id)
+            db.session.commit()
+            imported += len(chunk)
+        except Exception as e:
+            db.session.rollback()
+            for number, _, _ in chunk:
+                report(number, str(e))
+        chunk.clear()
+
+    try:
+        for number, data in rows:
+            if isinstance(data, str):
+                report(number, data)
+                continue
+            try:
+                fields, test_cases = validate_row(data)
+            except ValueError as e:
+                report(number, str(e))
+                continue
+            chunk.append((number, fields, test_cases))
+            if len(chunk) >= chunk_size:
+                flush()
+    except UnicodeDecodeError:
+        # Keep what was read before the bad bytes
+        report(None, 'Body is not valid UTF-8')
+    if chunk:
+        flush()
+
+    return imported, error_count, errors
+
+def _insert_chunk(quiz_id, language, items):
+    # Questions go in as one multi-row INSERT (ids come back with it);
+    # their test cases and answer hashes follow as executemany inserts
+    questions = [QuizQuestion(quiz_id=quiz_id, **fields) for fields, _ in items]
+    db.session.add_all(questions)
+    db.session.flush()
+
+    test_case_rows = []
+    hash_rows = []
+    for question, (_, test_cases) in zip(questions, items):
+        for index, case in enumerate(test_cases):
+            test_case_rows.append({
+                'question_id': question.id,
+                'stdin': case.get('stdin') or '',
+                'expected_output': case['expected_output'],
+                'order_index': index
+            })
+        if question.question_type in RUNNABLE_QUESTION_TYPES and question.correct_answer is not None:
+            hash_rows.append({
+                'question_id': question.id,
+                'answer_hash': answer_hash(language, question.correct_answer),
+                'language': (language or '').lower(),
+                'normalizer_version': NORMALIZER_VERSION
+            })
+
+    if test_case_rows:
+        db.session.execute(QuizQuestionTestCase.__table__.insert(), test_case_rows)
+    if hash_rows:
+        db.session.execute(QuizQuestionAnswerHash.__table__.insert(), hash_rows)
+    bump_quiz_counters(quiz_id, questions=len(questions))
@@ -1,11 +1,26 @@
-from flask import Blueprint, jsonify, request
+import json
+import time
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.database import db, Quiz, QuizQuestion, UserQuizAttempt
-from sqlalchemy import func
+from src.models.database import db, Quiz, QuizAttemptGrading, QuizAttemptSnapshot, QuizBestScore, QuizUserTotal, UserQuizAttempt
+from src.models.database import QuizAttemptArchive, User
+from src.models.answer_keys import get_answer_key, quiz_version
+from src.models.attempt_archive import archive_payload
+from src.models.async_grading import attempt_status_payload, launch_grading, start_attempt_grading
+from src.models.quiz_attempts import record_attempt, snapshot_payload
+from src.models.quiz_counters import counter_fields
+from src.utils.pagination import keyset_paginate, wants_cursor, wants_total
+from src.utils.query_budget import query_budget
+from src.utils.response_cache import quiz_cache, accepts_gzip, gzip_body, conditional_json_response
+from sqlalchemy.orm import contains_eager, selectinload
 
 quiz_bp = Blueprint('quiz', __name__)
 
+# Quiz content only changes through admin edits; shared caches may keep it this many seconds
+QUIZ_MAX_AGE = 60
+
 @quiz_bp.route('/quizzes', methods=['GET'])
+@query_budget(2)
 def get_quizzes():
     """Get all quizzes with filters"""
     try:
@@ -23,48 +38,63 @@ def get_quizzes():
         if level:
             query = query.filter(Quiz.level == level)
         
-        # Paginate
-        quizzes = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Paginate (keyset mode when a cursor is sent, page/per_page otherwise)
+        if wants_cursor(request.args):
+            quizzes = keyset_paginate(
+                query, [Quiz.id], request.args.get('cursor'), per_page,
+                with_total=wants_total(request.args)
+            )
+            pagination = quizzes.to_dict()
+        else:
+            quizzes = query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination = {
+                'page': quizzes.page,
+                'pages': quizzes.pages,
+                'per_page': quizzes.per_page,
+                'total': quizzes.total,
+                'has_next': quizzes.has_next,
+                'has_prev': quizzes.has_prev
+            }
         
         quiz_list = []
         for quiz in quizzes.items:
-            # Get attempt count
-            attempt_count = db.session.query(func.count(UserQuizAttempt.id)).filter(
-                UserQuizAttempt.quiz_id == quiz.id
-            ).scalar()
-            
+            # Counts come from the counter row joined into the same SELECT
             quiz_list.append({
                 'id': quiz.id,
                 'title': quiz.title,
                 'description': quiz.description,
                 'programming_language': quiz.programming_language,
                 'level': quiz.level,
-                'question_count': quiz.question_count,
                 'time_limit_minutes': quiz.time_limit_minutes,
                 'created_at': quiz.created_at.isoformat() if quiz.created_at else None,
-                'attempt_count': attempt_count or 0
+                **counter_fields(quiz)
             })
         
         return jsonify({
             'quizzes': quiz_list,
-            'pagination': {
-                'page': quizzes.page,
-                'pages': quizzes.pages,
-                'per_page': quizzes.per_page,
-                'total': quizzes.total,
-                'has_next': quizzes.has_next,
-                'has_prev': quizzes.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @quiz_bp.route('/quizzes/<int:quiz_id>', methods=['GET'])
+@query_budget(3)
 def get_quiz(quiz_id):
     """Get quiz details (without answers)"""
     try:
-        quiz = Quiz.query.get_or_404(quiz_id)
+        encoding = 'gzip' if accepts_gzip() else None
+        
+        # Serve the prebuilt (and compressed) payload while the quiz's persisted version is unchanged
+        stored_version = quiz_version(quiz_id)
+        cached = quiz_cache.get(quiz_id, variant=encoding, stamp=stored_version)
+        if cached:
+            return conditional_json_response(cached, max_age=QUIZ_MAX_AGE)
+        
+        version = quiz_cache.version(quiz_id, stamp=stored_version)
+        quiz = Quiz.query.options(selectinload(Quiz.questions)).get_or_404(quiz_id)
         
         # Get questions without correct answers
         questions = []
@@ -79,22 +109,30 @@ def get_quiz(quiz_id):
             }
             questions.append(question_data)
         
-        return jsonify({
+        payload = jsonify({
             'id': quiz.id,
             'title': quiz.title,
             'description': quiz.description,
             'programming_language': quiz.programming_language,
             'level': quiz.level,
-            'question_count': quiz.question_count,
+            # Same counter row as the listings (joined with the quiz); attempt counts change too often to cache
+            'question_count': counter_fields(quiz)['question_count'],
             'time_limit_minutes': quiz.time_limit_minutes,
             'created_at': quiz.created_at.isoformat() if quiz.created_at else None,
             'questions': questions
-        }), 200
+        }).get_data()
+        
+        if encoding:
+            payload = gzip_body(payload)
+        
+        cached = quiz_cache.set(quiz_id, payload, version, variant=encoding, encoding=encoding)
+        return conditional_json_response(cached, max_age=QUIZ_MAX_AGE)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @quiz_bp.route('/quizzes/<int:quiz_id>/submit', methods=['POST'])
+@query_budget(7)
 @jwt_required()
 def submit_quiz(quiz_id):
     """Submit quiz answers"""
@@ -105,33 +143,14 @@ def submit_quiz(quiz_id):
         if 'answers' not in data:
             return jsonify({'error': 'No answers provided'}), 400
         
-        # Get quiz
-        quiz = Quiz.query.get_or_404(quiz_id)
+        # Compiled answer key (held in memory between submissions)
+        answer_key = get_answer_key(quiz_id)
+        if answer_key is None:
+            return jsonify({'error': 'Quiz not found'}), 404
         
-        # Calculate score
-        score = 0
+        # Calculate score (answers decided in memory)
         answers = data['answers']
-        
-        for answer in answers:
-            question_id = answer.get('question_id')
-            user_answer = answer.get('answer')
-            
-            if not question_id or user_answer is None:
-                continue
-            
-            question = QuizQuestion.query.get(question_id)
-            if not question or question.quiz_id != quiz_id:
-                continue
-            
-            # Check answer
-            if question.question_type == 'multiple_choice':
-                if str(user_answer) == str(question.correct_answer):
-                    score += question.difficulty_points
-            elif question.question_type in ['code_output', 'code_completion', 'debugging']:
-                # For code questions, we might need more sophisticated comparison
-                # For now, just do a simple string comparison
-                if str(user_answer).strip() == str(question.correct_answer).strip():
-                    score += question.difficulty_points
+        score, results, pending = answer_key.grade(answers)
         
         # Create attempt record
         attempt = UserQuizAttempt(
@@ -141,98 +160,205 @@ def submit_quiz(quiz_id):
             answers_submitted=answers
         )
         db.session.add(attempt)
-        db.session.commit()
+        db.session.flush()
+        record_attempt(attempt, answer_key, 'pending' if pending else 'graded')
         
-        # Get correct answers for feedback
-        correct_answers = {}
-        for question in quiz.questions:
-            correct_answers[question.id] = {
-                'correct_answer': question.correct_answer,
-                'explanation': question.explanation
-            }
+        if pending:
+            # Code answers are run in the background; clients poll the attempt
+            start_attempt_grading(attempt, results)
+            db.session.commit()
+            launch_grading(current_app._get_current_object(), attempt.id, score, results, pending)
+            
+            return jsonify({
+                'message': 'Quiz submitted, grading in progress',
+                'status': 'pending',
+                'attempt_id': attempt.id,
+                'status_url': f'/api/quizzes/attempts/{attempt.id}'
+            }), 202
+        
+        db.session.commit()
         
         return jsonify({
             'message': 'Quiz submitted successfully',
+            'status': 'graded',
             'score': score,
-            'total_possible': sum(q.difficulty_points for q in quiz.questions),
-            'correct_answers': correct_answers,
+            'total_possible': answer_key.max_score,
+            'correct_answers': answer_key.feedback(),
             'attempt_id': attempt.id
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@quiz_bp.route('/quizzes/attempts/<int:attempt_id>', methods=['GET'])
+@query_budget(5)
+@jwt_required()
+def get_quiz_attempt(attempt_id):
+    """Get the grading status of one of the user's quiz attempts"""
+    try:
+        user_id = get_jwt_identity()
+        
+        attempt = UserQuizAttempt.query.get(attempt_id)
+        if not attempt or str(attempt.user_id) != str(user_id):
+            return jsonify({'error': 'Attempt not found'}), 404
+        
+        grading = QuizAttemptGrading.query.get(attempt_id)
+        answer_key = None
+        if grading is None or grading.status == 'graded':
+            answer_key = get_answer_key(attempt.quiz_id)
+        
+        return jsonify(attempt_status_payload(attempt, grading, answer_key)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@quiz_bp.route('/quizzes/attempts/<int:attempt_id>/events', methods=['GET'])
+@jwt_required()
+def stream_quiz_attempt(attempt_id):
+    """Stream grading progress of a quiz attempt as Server-Sent Events"""
+    user_id = get_jwt_identity()
+    
+    attempt = UserQuizAttempt.query.get(attempt_id)
+    if not attempt or str(attempt.user_id) != str(user_id):
+        return jsonify({'error': 'Attempt not found'}), 404
+    
+    interval = current_app.config.get('GRADING_STREAM_INTERVAL', 1)
+    deadline = time.monotonic() + current_app.config.get('GRADING_STREAM_SECONDS', 60)
+    
+    def events():
+        last = None
+        while True:
+            # Read fresh rows on every poll
+            db.session.expire_all()
+            attempt = UserQuizAttempt.query.get(attempt_id)
+            grading = QuizAttemptGrading.query.get(attempt_id)
+            finished = grading is None or grading.status in ('graded', 'failed')
+            answer_key = get_answer_key(attempt.quiz_id) if finished else None
+            
+            payload = json.dumps(attempt_status_payload(attempt, grading, answer_key))
+            if payload != last:
+                yield f'event: progress\ndata: {payload}\n\n'
+                last = payload
+            else:
+                yield ': keep-alive\n\n'
+            
+            if finished or time.monotonic() > deadline:
+                return
+            time.sleep(interval)
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @quiz_bp.route('/quizzes/user/attempts', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_user_quiz_attempts():
-    """Get user's quiz attempts"""
+    """Get user's quiz attempts (newest first, keyset paginated)"""
     try:
         user_id = get_jwt_identity()
+        quiz_id = request.args.get('quiz_id', type=int)
+        per_page = min(int(request.args.get('per_page', 20)), 100)
         
-        attempts = UserQuizAttempt.query.filter_by(user_id=user_id).order_by(
-            UserQuizAttempt.attempt_date.desc()
-        ).all()
-        
-        attempt_list = []
-        for attempt in attempts:
-            attempt_list.append({
-                'id': attempt.id,
-                'quiz_id': attempt.quiz_id,
-                'quiz_title': attempt.quiz.title,
-                'score': attempt.score,
-                'total_possible': sum(q.difficulty_points for q in attempt.quiz.questions),
-                'attempt_date': attempt.attempt_date.isoformat() if attempt.attempt_date else None
-            })
+        # Snapshots carry the quiz title and total, so no joins are needed
+        query = QuizAttemptSnapshot.query.filter_by(user_id=user_id)
+        if quiz_id:
+            query = query.filter_by(quiz_id=quiz_id)
+        
+        attempts = keyset_paginate(
+            query, [QuizAttemptSnapshot.attempt_date, QuizAttemptSnapshot.attempt_id],
+            request.args.get('cursor'), per_page,
+            descending=True, with_total=wants_total(request.args)
+        )
         
         return jsonify({
-            'attempts': attempt_list
+            'attempts': [snapshot_payload(snapshot) for snapshot in attempts.items],
+            'pagination': attempts.to_dict()
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@quiz_bp.route('/quizzes/leaderboard', methods=['GET'])
-def get_quiz_leaderboard():
-    """Get quiz leaderboard"""
+@quiz_bp.route('/quizzes/user/attempts/archive', methods=['GET'])
+@query_budget(2)
+@jwt_required()
+def get_user_archived_quiz_attempts():
+    """Get user's archived quiz attempts (slow path: older than the retention age)"""
     try:
-        quiz_id = request.args.get('quiz_id')
-        limit = int(request.args.get('limit', 10))
-        
-        # Build query
-        query = db.session.query(
-            UserQuizAttempt,
-            func.max(UserQuizAttempt.score).label('best_score')
-        ).join(UserQuizAttempt.user)
+        user_id = get_jwt_identity()
+        quiz_id = request.args.get('quiz_id', type=int)
+        per_page = min(int(request.args.get('per_page', 20)), 100)
+        with_answers = request.args.get('answers', '').lower() in ('1', 'true')
         
+        query = QuizAttemptArchive.query.filter_by(user_id=user_id)
         if quiz_id:
-            query = query.filter(UserQuizAttempt.quiz_id == quiz_id)
+            query = query.filter_by(quiz_id=quiz_id)
         
-        # Group by user and get best score
-        query = query.group_by(UserQuizAttempt.user_id)
+        attempts = keyset_paginate(
+            query, [QuizAttemptArchive.attempt_date, QuizAttemptArchive.attempt_id],
+            request.args.get('cursor'), per_page,
+            descending=True, with_total=wants_total(request.args)
+        )
         
-        # Order by best score
-        query = query.order_by(func.max(UserQuizAttempt.score).desc())
+        return jsonify({
+            'attempts': [archive_payload(row, with_answers) for row in attempts.items],
+            'pagination': attempts.to_dict()
+        }), 200
         
-        # Limit results
-        query = query.limit(limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@quiz_bp.route('/quizzes/leaderboard', methods=['GET'])
+@query_budget(2)
+def get_quiz_leaderboard():
+    """Get quiz leaderboard (one quiz, or total best scores across quizzes)"""
+    try:
+        quiz_id = request.args.get('quiz_id', type=int)
+        limit = min(int(request.args.get('limit', 10)), 100)
         
-        results = query.all()
+        # Top rows straight from the ranking indexes, joined to their users (rows of deleted users never show)
+        if quiz_id:
+            quiz = Quiz.query.get_or_404(quiz_id)
+            rows = QuizBestScore.query.join(QuizBestScore.user).options(contains_eager(QuizBestScore.user)).filter(
+                QuizBestScore.quiz_id == quiz_id
+            ).order_by(
+                QuizBestScore.best_score.desc(),
+                QuizBestScore.first_achieved_at,
+                QuizBestScore.user_id
+            ).limit(limit).all()
+            scores = [(row.user, row.best_score, row.attempts) for row in rows]
+        else:
+            quiz = None
+            rows = QuizUserTotal.query.join(QuizUserTotal.user).options(contains_eager(QuizUserTotal.user)).order_by(
+                QuizUserTotal.total_best_score.desc(),
+                QuizUserTotal.user_id
+            ).limit(limit).all()
+            scores = [(row.user, row.total_best_score, row.quizzes_attempted) for row in rows]
         
         leaderboard = []
-        for attempt, best_score in results:
-            leaderboard.append({
-                'user_id': attempt.user_id,
-                'username': attempt.user.username,
-                'profile_picture_url': attempt.user.profile_picture_url,
-                'score': best_score,
-                'quiz_id': attempt.quiz_id if quiz_id else None,
-                'quiz_title': attempt.quiz.title if quiz_id else None
-            })
+        for rank, (user, score, count) in enumerate(scores, start=1):
+            entry = {
+                'rank': rank,
+                'user_id': user.id,
+                'username': user.username,
+                'profile_picture_url': user.profile_picture_url,
+                'score': score,
+                'quiz_id': quiz.id if quiz else None,
+                'quiz_title': quiz.title if quiz else None
+            }
+            entry['attempts' if quiz else 'quizzes_attempted'] = count
+            leaderboard.append(entry)
         
         return jsonify({
             'leaderboard': leaderboard
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
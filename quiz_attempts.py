@@ -0,0 +1,223 @@
+from datetime import datetime
+from src.models.database import db, Quiz, QuizQuestion, QuizAttemptGrading, QuizAttemptSnapshot, UserQuizAttempt
+from src.models.database import QuizAttemptRollup, QuizBestScore, QuizUserTotal
+from src.models.attempt_archive import delete_quiz_archive, delete_user_archive
+from src.models.quiz_counters import bump_quiz_counters
+from src.utils.upsert import upsert
+from sqlalchemy import and_, case, func
+
+def record_attempt(attempt, answer_key, status='graded'):
+    """Snapshot a flushed attempt for the history and count it (the caller commits)"""
+    snapshot = QuizAttemptSnapshot(
+        attempt_id=attempt.id,
+        user_id=attempt.user_id,
+        quiz_id=attempt.quiz_id,
+        quiz_title=answer_key.title,
+        score=attempt.score or 0,
+        total_possible=answer_key.max_score,
+        status=status,
+        attempt_date=attempt.attempt_date or datetime.utcnow()
+    )
+    db.session.add(snapshot)
+    bump_quiz_counters(attempt.quiz_id, attempts=1)
+    if status == 'graded':
+        record_best_score(snapshot.user_id, snapshot.quiz_id, snapshot.score, snapshot.attempt_date)
+    return snapshot
+
+def mark_attempt_graded(attempt):
+    """Store the final score of an asynchronously graded attempt (the caller commits)"""
+    # Locked so two finishing gradings cannot both see it ungraded and fold the score in twice
+    snapshot = QuizAttemptSnapshot.query.filter_by(attempt_id=attempt.id).populate_existing().with_for_update().first()
+    if snapshot is not None and snapshot.status != 'graded':
+        snapshot.score = attempt.score or 0
+        snapshot.status = 'graded'
+        record_best_score(snapshot.user_id, snapshot.quiz_id, snapshot.score, snapshot.attempt_date)
+    return snapshot
+
+def record_best_score(user_id, quiz_id, score, achieved_at):
+    """Fold a graded score into quiz_best_scores and the user's total (the caller commits).
+
+    The (user, quiz) row keeps the best score, the attempt count and when
+    the best was first reached. Its previous best is read under a row
+    lock, so the user total moves by exactly the improvement (plus one
+    quiz on a first attempt) and concurrent attempts cannot double count.
+    """
+    values = {
+        'user_id': user_id,
+        'quiz_id': quiz_id,
+        'best_score': score,
+        'attempts': 1,
+        'first_achieved_at': achieved_at
+    }
+    previous = _locked_best_score(user_id, quiz_id)
+
+    if previous is None and upsert(QuizBestScore, values, ['user_id', 'quiz_id'], update_columns=[]):
+        gained, new_quizzes = score, 1
+    else:
+        if previous is None:
+            # A concurrent first attempt inserted the row; lock it and fold into it
+            previous = _locked_best_score(user_id, quiz_id)
+        upsert(QuizBestScore, values, ['user_id', 'quiz_id'], update_columns=[], update_expressions={
+            'best_score': lambda current, new: case(
+                (new.best_score > current.best_score, new.best_score), else_=current.best_score
+            ),
+            'first_achieved_at': lambda current, new: case(
+                (new.best_score > current.best_score, new.first_achieved_at), else_=current.first_achieved_at
+            ),
+            'attempts': lambda current, new: current.attempts + 1
+        })
+        gained, new_quizzes = max(0, score - previous), 0
+
+    if gained or new_quizzes:
+        upsert(QuizUserTotal, {
+            'user_id': user_id,
+            'total_best_score': gained,
+            'quizzes_attempted': new_quizzes,
+            'updated_at': datetime.utcnow()
+        }, ['user_id'], update_columns=['updated_at'], update_expressions={
+            'total_best_score': lambda current, new: current.total_best_score + new.total_best_score,
+            'quizzes_attempted': lambda current, new: current.quizzes_attempted + new.quizzes_attempted
+        })
+
+def delete_quiz_scores(quiz_id):
+    """Remove derived attempt rows of a quiz before its attempts are deleted (the caller commits)"""
+    attempt_ids = db.session.query(UserQuizAttempt.id).filter_by(quiz_id=quiz_id)
+    QuizAttemptGrading.query.filter(QuizAttemptGrading.attempt_id.in_(attempt_ids)).delete(synchronize_session=False)
+    QuizAttemptSnapshot.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    delete_quiz_archive(quiz_id)
+
+    best_scores = db.session.query(QuizBestScore.user_id, QuizBestScore.best_score).filter_by(
+        quiz_id=quiz_id
+    ).with_for_update().all()
+    QuizBestScore.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+
+    # Totals of the affected users lose this quiz's best score; users left with no quiz drop off
+    for user_id, best_score in best_scores:
+        QuizUserTotal.query.filter_by(user_id=user_id).update({
+            'total_best_score': QuizUserTotal.total_best_score - best_score,
+            'quizzes_attempted': QuizUserTotal.quizzes_attempted - 1
+        }, synchronize_session=False)
+    if best_scores:
+        QuizUserTotal.query.filter(
+            QuizUserTotal.user_id.in_([user_id for user_id, _ in best_scores]),
+            QuizUserTotal.quizzes_attempted <= 0
+        ).delete(synchronize_session=False)
+
+def delete_user_scores(user_id):
+    """Remove derived attempt rows of a user before the user is deleted (the caller commits)"""
+    attempt_ids = db.session.query(UserQuizAttempt.id).filter_by(user_id=user_id)
+    QuizAttemptGrading.query.filter(QuizAttemptGrading.attempt_id.in_(attempt_ids)).delete(synchronize_session=False)
+    QuizAttemptSnapshot.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    delete_user_archive(user_id)
+    QuizBestScore.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    QuizUserTotal.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+def rebuild_best_scores():
+    """Recompute quiz_best_scores and quiz_user_totals from graded snapshots and archive rollups; returns row counts"""
+    snapshots = QuizAttemptSnapshot.__table__.c
+    grouped = db.session.query(
+        QuizAttemptSnapshot.user_id,
+        QuizAttemptSnapshot.quiz_id,
+        func.max(QuizAttemptSnapshot.score).label('best_score'),
+        func.count(QuizAttemptSnapshot.attempt_id).label('attempts')
+    ).filter(QuizAttemptSnapshot.status == 'graded').group_by(
+        QuizAttemptSnapshot.user_id, QuizAttemptSnapshot.quiz_id
+    ).subquery()
+
+    rows = db.session.query(
+        grouped.c.user_id,
+        grouped.c.quiz_id,
+        grouped.c.best_score,
+        grouped.c.attempts,
+        func.min(snapshots.attempt_date)
+    ).join(QuizAttemptSnapshot, and_(
+        snapshots.user_id == grouped.c.user_id,
+        snapshots.quiz_id == grouped.c.quiz_id,
+        snapshots.score == grouped.c.best_score,
+        snapshots.status == 'graded'
+    )).group_by(grouped.c.user_id, grouped.c.quiz_id, grouped.c.best_score, grouped.c.attempts).all()
+
+    best = {(user_id, quiz_id): (best_score, attempts, first_achieved_at)
+            for user_id, quiz_id, best_score, attempts, first_achieved_at in rows}
+
+    # Archived attempts are older than any snapshot, so their best wins ties
+    for rollup in QuizAttemptRollup.query.all():
+        key = (rollup.user_id, rollup.quiz_id)
+        best_score, attempts, first_achieved_at = best.get(key, (None, 0, None))
+        if best_score is None or rollup.best_score >= best_score:
+            best_score, first_achieved_at = rollup.best_score, rollup.best_achieved_at
+        best[key] = (best_score, attempts + rollup.attempts, first_achieved_at)
+
+    QuizBestScore.query.delete()
+    QuizUserTotal.query.delete()
+    totals = {}
+    for (user_id, quiz_id), (best_score, attempts, first_achieved_at) in best.items():
+        db.session.add(QuizBestScore(
+            user_id=user_id,
+            quiz_id=quiz_id,
+            best_score=best_score,
+            attempts=attempts,
+            first_achieved_at=first_achieved_at
+        ))
+        total, count = totals.get(user_id, (0, 0))
+        totals[user_id] = (total + best_score, count + 1)
+    for user_id, (total, count) in totals.items():
+        db.session.add(QuizUserTotal(user_id=user_id, total_best_score=total, quizzes_attempted=count))
+    db.session.commit()
+
+    return len(best), len(totals)
+
+def _locked_best_score(user_id, quiz_id):
+    return db.session.query(QuizBestScore.best_score).filter_by(
+        user_id=user_id,
+        quiz_id=quiz_id
+    ).with_for_update().scalar()
+
+def snapshot_payload(snapshot):
+    return {
+        'id': snapshot.attempt_id,
+        'quiz_id': snapshot.quiz_id,
+        'quiz_title': snapshot.quiz_title,
+        'score': snapshot.score if snapshot.status == 'graded' else None,
+        'total_possible': snapshot.total_possible,
+        'status': snapshot.status,
+        'attempt_date': snapshot.attempt_date.isoformat() if snapshot.attempt_date else None
+    }
+
+def backfill_attempt_snapshots(batch_size=500):
+    """Snapshot attempts made before snapshots existed; returns how many were added.
+
+    Titles and totals are taken from the quizzes as they are now.
+    """
+    titles = dict(db.session.query(Quiz.id, Quiz.title).all())
+    totals = dict(db.session.query(
+        QuizQuestion.quiz_id,
+        func.coalesce(func.sum(QuizQuestion.difficulty_points), 0)
+    ).group_by(QuizQuestion.quiz_id).all())
+
+    added = 0
+    while True:
+        rows = db.session.query(UserQuizAttempt, QuizAttemptGrading.status).outerjoin(
+            QuizAttemptSnapshot, QuizAttemptSnapshot.attempt_id == UserQuizAttempt.id
+        ).outerjoin(
+            QuizAttemptGrading, QuizAttemptGrading.attempt_id == UserQuizAttempt.id
+        ).filter(
+            QuizAttemptSnapshot.attempt_id.is_(None)
+        ).order_by(UserQuizAttempt.id).limit(batch_size).all()
+
+        if not rows:
+            return added
+
+        for attempt, grading_status in rows:
+            db.session.add(QuizAttemptSnapshot(
+                attempt_id=attempt.id,
+                user_id=attempt.user_id,
+                quiz_id=attempt.quiz_id,
+                quiz_title=titles.get(attempt.quiz_id),
+                score=attempt.score or 0,
+                total_possible=totals.get(attempt.quiz_id, 0),
+                status=grading_status or 'graded',
+                attempt_date=attempt.attempt_date or datetime.utcnow()
+            ))
+        db.session.commit()
+        added += len(rows)
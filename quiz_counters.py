@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import datetime
+from src.models.database import db, Quiz, QuizAttemptRollup, QuizCounter, QuizQuestion, UserQuizAttempt
+from src.utils.upsert import upsert
+from sqlalchemy import func
+
+def bump_quiz_counters(quiz_id, attempts=0, questions=0):
+    """Add to a quiz's cached counts in one upsert (the caller commits)"""
+    upsert(QuizCounter, {
+        'quiz_id': quiz_id,
+        'attempt_count': max(attempts, 0),
+        'question_count': max(questions, 0),
+        'updated_at': datetime.utcnow()
+    }, ['quiz_id'], update_columns=['updated_at'], update_expressions={
+        'attempt_count': lambda current, new: current.attempt_count + attempts,
+        'question_count': lambda current, new: current.question_count + questions
+    })
+
+def counter_fields(quiz):
+    """question_count/attempt_count of a quiz from its counter row (joined with the quiz)"""
+    counter = quiz.counter
+    return {
+        'question_count': counter.question_count if counter else 0,
+        'attempt_count': counter.attempt_count if counter else 0
+    }
+
+def reconcile_quiz_counters():
+    """Recount questions and attempts for every quiz and fix drift; returns the fixed quiz ids"""
+    question_counts = dict(db.session.query(
+        QuizQuestion.quiz_id, func.count(QuizQuestion.id)
+    ).group_by(QuizQuestion.quiz_id).all())
+    attempt_counts = dict(db.session.query(
+        UserQuizAttempt.quiz_id, func.count(UserQuizAttempt.id)
+    ).group_by(UserQuizAttempt.quiz_id).all())
+    # Archived attempts still count
+    for quiz_id, archived in db.session.query(
+        QuizAttemptRollup.quiz_id, func.sum(QuizAttemptRollup.attempts)
+    ).group_by(QuizAttemptRollup.quiz_id):
+        attempt_counts[quiz_id] = attempt_counts.get(quiz_id, 0) + (archived or 0)
+    counters = {counter.quiz_id: counter for counter in QuizCounter.query.all()}
+
+    fixed = []
+    for (quiz_id,) in db.session.query(Quiz.id).all():
+        questions = question_counts.get(quiz_id, 0)
+        attempts = attempt_counts.get(quiz_id, 0)
+        counter = counters.get(quiz_id)
+        if counter is None:
+            db.session.add(QuizCounter(quiz_id=quiz_id, question_count=questions, attempt_count=attempts))
+        elif counter.question_count != questions or counter.attempt_count != attempts:
+            counter.question_count = questions
+            counter.attempt_count = attempts
+        else:
+            continue
+        fixed.append(quiz_id)
+    db.session.commit()
+    return fixed
+
+def init_quiz_counters(app):
+    """Reconcile quiz counters every QUIZ_COUNTER_RECONCILE_SECONDS in a background thread"""
+    interval = app.config.setdefault('QUIZ_COUNTER_RECONCILE_SECONDS', 3600)
+    if app.testing or not interval:
+        return
+
+    def reconcile_forever():
+        while True:
+            with app.app_context():
+                try:
+                    fixed = reconcile_quiz_counters()
+                    if fixed:
+                        app.logger.info('Quiz counters reconciled for %d quizzes', len(fixed))
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning('Quiz counter reconciliation failed: %s', e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=reconcile_forever, name='quiz-counters', daemon=True)
+    thread.start()
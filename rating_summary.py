@@ -0,0 +1,144 @@
+from src.models.database import db, CourseRating, CourseRatingSummary
+from src.utils.upsert import upsert
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+STAR_COLUMNS = {star: f'stars_{star}' for star in range(1, 6)}
+
+def get_rating_summary(course_id):
+    """Get the rating summary of a course (None if it was never rated)"""
+    return CourseRatingSummary.query.get(course_id)
+
+def get_rating_summaries(course_ids):
+    """Get rating summaries for several courses in one query, keyed by course id"""
+    if not course_ids:
+        return {}
+    summaries = CourseRatingSummary.query.filter(
+        CourseRatingSummary.course_id.in_(course_ids)
+    ).all()
+    return {summary.course_id: summary for summary in summaries}
+
+def summary_fields(summary):
+    """Format the average/count pair used by the course payloads"""
+    if not summary:
+        return {'average_rating': 0, 'rating_count': 0}
+    return {
+        'average_rating': summary.average_rating,
+        'rating_count': summary.rating_count or 0
+    }
+
+def apply_rating_change(course_id, old_rating, new_rating):
+    """Update a course summary for a new or changed rating.
+
+    Must be called inside the transaction that writes the CourseRating row;
+    it does not commit. Counters are updated with SQL increments so two
+    concurrent raters do not overwrite each other.
+    """
+    # Create the zeroed row if missing; a concurrent first rating is a no-op
+    upsert(CourseRatingSummary, dict(course_id=course_id, **_empty_counts()), ['course_id'], update_columns=[])
+    summary = CourseRatingSummary.query.get(course_id)
+
+    if old_rating is None:
+        summary.rating_sum = CourseRatingSummary.rating_sum + new_rating
+        summary.rating_count = CourseRatingSummary.rating_count + 1
+        _increment_star(summary, new_rating, 1)
+    elif old_rating != new_rating:
+        summary.rating_sum = CourseRatingSummary.rating_sum + (new_rating - old_rating)
+        _increment_star(summary, old_rating, -1)
+        _increment_star(summary, new_rating, 1)
+
+    return summary
+
+def _increment_star(summary, star, delta):
+    column = STAR_COLUMNS.get(star)
+    if column:
+        setattr(summary, column, getattr(CourseRatingSummary, column) + delta)
+
+def remove_duplicate_ratings(dry_run=False):
+    """Delete all but the newest rating of each (user, course) pair.
+
+    Duplicates were possible before ratings were upserted and block the
+    uq_course_ratings_user_course index. Returns the number of rows removed.
+    """
+    newest = db.session.query(func.max(CourseRating.id)).group_by(
+        CourseRating.user_id, CourseRating.course_id
+    )
+    duplicates = CourseRating.query.filter(~CourseRating.id.in_(newest))
+    count = duplicates.count()
+
+    if count and not dry_run:
+        duplicates.delete(synchronize_session=False)
+        db.session.commit()
+
+    return count
+
+def backfill_rating_summaries():
+    """Build the summaries once when ratings exist but no summary does (first deploy).
+
+    Cheap on later boots (two single-row reads). Workers starting together
+    may race to build them; the losers roll back and keep the winner's rows.
+    Returns the number of summaries written.
+    """
+    if CourseRatingSummary.query.first() is not None or CourseRating.query.first() is None:
+        return 0
+    try:
+        return len(rebuild_rating_summaries())
+    except IntegrityError:
+        db.session.rollback()
+        return 0
+
+def rebuild_rating_summaries(dry_run=False):
+    """Rebuild every course summary from CourseRating and report drift.
+
+    Returns a list of {'course_id', 'expected', 'actual'} entries for the
+    summaries that did not match the ratings table.
+    """
+    expected = {}
+    rows = db.session.query(
+        CourseRating.course_id,
+        CourseRating.rating,
+        func.count(CourseRating.id)
+    ).group_by(CourseRating.course_id, CourseRating.rating).all()
+
+    for course_id, rating, count in rows:
+        entry = expected.setdefault(course_id, _empty_counts())
+        if rating in STAR_COLUMNS:
+            entry[STAR_COLUMNS[rating]] += count
+        entry['rating_sum'] += rating * count
+        entry['rating_count'] += count
+
+    drift = []
+    existing = {summary.course_id: summary for summary in CourseRatingSummary.query.all()}
+
+    for course_id in set(expected) | set(existing):
+        wanted = expected.get(course_id, _empty_counts())
+        summary = existing.get(course_id)
+        actual = _summary_counts(summary) if summary else _empty_counts()
+
+        if wanted == actual:
+            continue
+
+        drift.append({'course_id': course_id, 'expected': wanted, 'actual': actual})
+        if dry_run:
+            continue
+
+        if summary is None:
+            db.session.add(CourseRatingSummary(course_id=course_id, **wanted))
+        else:
+            for key, value in wanted.items():
+                setattr(summary, key, value)
+
+    if not dry_run:
+        db.session.commit()
+
+    return drift
+
+def _empty_counts():
+    counts = {'rating_sum': 0, 'rating_count': 0}
+    counts.update({column: 0 for column in STAR_COLUMNS.values()})
+    return counts
+
+def _summary_counts(summary):
+    counts = {'rating_sum': summary.rating_sum or 0, 'rating_count': summary.rating_count or 0}
+    counts.update({column: getattr(summary, column) or 0 for column in STAR_COLUMNS.values()})
+    return counts
@@ -0,0 +1,60 @@
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from flask import Flask
+from src.models.database import db
+from src.models.featured_ranking import compute_featured_ranking
+from src.models.rating_summary import rebuild_rating_summaries, remove_duplicate_ratings
+
+def create_app():
+    """Create Flask app for reconciling rating summaries"""
+    app = Flask(__name__)
+
+    # Configure database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL',
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'code_aura_dev.db')}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Initialize database
+    db.init_app(app)
+
+    return app
+
+def main():
+    """Rebuild course rating summaries from course_ratings and report drift"""
+    dry_run = '--dry-run' in sys.argv[1:]
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        duplicates = remove_duplicate_ratings(dry_run=dry_run)
+        if duplicates:
+            action = "would be removed" if dry_run else "removed"
+            print(f"{duplicates} duplicate course ratings {action}.")
+
+        drift = rebuild_rating_summaries(dry_run=dry_run)
+
+        if not drift:
+            print("All course rating summaries are up to date.")
+            return
+
+        for entry in drift:
+            expected = entry['expected']
+            actual = entry['actual']
+            print(f"  - Course {entry['course_id']}: "
+                  f"count {actual['rating_count']} -> {expected['rating_count']}, "
+                  f"sum {actual['rating_sum']} -> {expected['rating_sum']}")
+
+        action = "would be fixed" if dry_run else "fixed"
+        print(f"\n{len(drift)} course rating summaries {action}.")
+
+        if not dry_run:
+            compute_featured_ranking()
+            print("Featured course ranking recomputed.")
+
+if __name__ == "__main__":
+    main()
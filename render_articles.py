@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from flask import Flask
+from src.models.database import db, Article
+from src.models.article_html import stale_article_ids, store_renderings
+from src.utils.article_render import RENDERER_VERSION, render_markdown
+
+BATCH_SIZE = 200
+
+def create_app():
+    """Create Flask app for re-rendering article HTML"""
+    app = Flask(__name__)
+
+    # Configure database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL',
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'code_aura_dev.db')}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Initialize database
+    db.init_app(app)
+
+    return app
+
+def render_one(item):
+    """Render one (article_id, content) in a worker process"""
+    article_id, content = item
+    content_html, toc = render_markdown(content)
+    return article_id, content_html, toc
+
+def main():
+    """Re-render stale article HTML in a process pool: render_articles.py [--all] [--workers N]"""
+    args = sys.argv[1:]
+    force = '--all' in args
+    workers = int(args[args.index('--workers') + 1]) if '--workers' in args else os.cpu_count()
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        article_ids = stale_article_ids(force)
+        print(f"{len(article_ids)} articles to render with renderer version {RENDERER_VERSION}.")
+
+        started = time.perf_counter()
+        rendered = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Workers only render; reads and writes stay in this process, one transaction per batch
+            for start in range(0, len(article_ids), BATCH_SIZE):
+                batch = article_ids[start:start + BATCH_SIZE]
+                items = [tuple(row) for row in db.session.query(Article.id, Article.content).filter(Article.id.in_(batch))]
+                results = list(pool.map(render_one, items, chunksize=8))
+                if results:
+                    store_renderings(results)
+                db.session.commit()
+                rendered += len(results)
+                print(f"  {rendered}/{len(article_ids)} rendered")
+
+        print(f"{rendered} articles rendered in {time.perf_counter() - started:.1f}s with {workers} workers.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, request
+
+# Seconds a rendered payload may be served. Versions are process-local: a
+# write served by another worker is only seen here once the entry expires
+RESPONSE_CACHE_TTL = 30
+
+class CachedResponse:
+    """A rendered JSON body together with its strong ETag"""
+
+    def __init__(self, body, etag, version=None, encoding=None):
+        self.body = body
+        self.etag = etag
+        self.version = version
+        self.encoding = encoding
+        self.created_at = time.monotonic()
+
+class VersionedResponseCache:
+    """Process-local cache of rendered payloads, invalidated by version stamps.
+
+    Every key has a version counter. Writers call `bump(key)` (or `clear()`)
+    after committing a change; entries rendered under an older version are
+    never served again. A key can hold several variants of its payload
+    (e.g. an outline view or a gzip encoding) that share its version.
+    Versions live in this process only, so entries also expire after
+    `ttl` seconds: writes handled by other workers are picked up within
+    that bound. Lookups and ETag checks touch no database, unless the
+    caller passes a `stamp` (e.g. a version persisted with the data):
+    entries are then only served under the stamp they were stored with.
+    """
+
+    def __init__(self, name, max_entries=1000, ttl=RESPONSE_CACHE_TTL):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._generation = 0
+        self._versions = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self, key, stamp=None):
+        """Version to pass to `set()`; read it (and `stamp`) before loading the data"""
+        with self._lock:
+            return self._current_version(key, stamp)
+
+    def _current_version(self, key, stamp=None):
+        return (self._generation, self._versions.get(key, 0), stamp)
+
+    def get(self, key, variant=None, stamp=None):
+        """Return the cached response for the current version of `key` (stored under `stamp`), or None"""
+        with self._lock:
+            entry = self._entries.get((key, variant))
+            if entry is None or entry.version != self._current_version(key, stamp):
+                return None
+            if self.ttl is not None and time.monotonic() - entry.created_at > self.ttl:
+                del self._entries[(key, variant)]
+                return None
+            self._entries.move_to_end((key, variant))
+            return entry
+
+    def set(self, key, body, version, variant=None, encoding=None):
+        """Store a body rendered under `version`; not stored if a write bumped it meanwhile"""
+        entry = CachedResponse(body, hashlib.sha256(body).hexdigest(), version, encoding)
+        with self._lock:
+            if version != self._current_version(key, version[2]):
+                return entry
+            self._entries[(key, variant)] = entry
+            self._entries.move_to_end((key, variant))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def bump(self, key):
+        """Invalidate every variant of `key` after a write"""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            for entry_key in [k for k in self._entries if k[0] == key]:
+                del self._entries[entry_key]
+
+    def clear(self):
+        """Invalidate every key (for writes that touch many payloads)"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+def accepts_gzip():
+    """Whether the client accepts a gzip encoded response"""
+    return request.accept_encodings['gzip'] > 0
+
+def gzip_body(body):
+    """Compress deterministically so equal payloads keep equal ETags"""
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+def conditional_json_response(entry, max_age=None, last_modified=None):
+    """Serve a cached body with its strong ETag; If-None-Match hits become a 304.
+
+    Without `max_age` clients must revalidate on every use; with it shared
+    caches (CDN, proxies) may keep the response for that many seconds.
+    `last_modified` also answers If-Modified-Since.
+    """
+    response = Response(entry.body, mimetype='application/json')
+    if last_modified:
+        response.last_modified = last_modified
+    if entry.encoding:
+        response.headers['Content-Encoding'] = entry.encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(entry.etag)
+    if max_age is None:
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+# Rendered GET /api/courses/<id> payloads, keyed by course id
+course_cache = VersionedResponseCache('course')
+
+# Rendered GET /api/lessons/<id> payloads, keyed by lesson id
+lesson_cache = VersionedResponseCache('lesson', max_entries=5000)
+
+# Rendered GET /api/quizzes/<id> payloads (no answers), keyed by quiz id and
+# stamped with the persisted quiz version, so they need no expiry
+quiz_cache = VersionedResponseCache('quiz', max_entries=2000, ttl=None)
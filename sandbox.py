@@ -0,0 +1,268 @@
+import hashlib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Runs before the submitted code: cap resources, then install an audit hook
+# refusing network, process creation, signals, native code and file access
+# outside the scratch directory. The hook keeps its settings (and the
+# builtins it calls) in a closure so the answer cannot rebind them; it is
+# a second line of defence behind the OS-level sandbox, not a boundary.
+PYTHON_BOOTSTRAP = '''
+import resource, sys, types  # types reads a traceback frame on import; load it before the hook
+cpu, memory, file_size = (int(value) for value in sys.argv[2:5])
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_FSIZE, (file_size, file_size))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+def install_guard(workdir, read_roots):
+    denied = (
+        'socket.', 'subprocess.', 'os.system', 'os.exec', 'os.fork', 'os.forkpty', 'os.posix_spawn', 'os.spawn',
+        'os.kill', 'os.killpg', 'signal.pthread_kill', 'os.chdir', 'os.chroot', 'os.symlink', 'os.link',
+        'ctypes.', 'mmap.', 'sys.settrace', 'sys.setprofile', 'sys._current_frames', 'sys.addaudithook',
+        'gc.get_objects', 'gc.get_referrers', 'gc.get_referents', 'code.__new__',
+    )
+    # Attributes leading to frames (a traceback would otherwise expose this hook's frame)
+    frame_attributes = ('tb_frame', 'gi_frame', 'cr_frame', 'ag_frame')
+    denied_modules = ('_posixsubprocess', '_ctypes', 'ctypes', 'mmap', '_xxsubinterpreters')
+    path_events = ('os.remove', 'os.rmdir', 'os.mkdir', 'os.rename', 'os.chmod', 'os.chown', 'os.truncate', 'os.utime')
+    write_flags = 0o1 | 0o2 | 0o100 | 0o1000 | 0o2000  # O_WRONLY | O_RDWR | O_CREAT | O_TRUNC | O_APPEND
+    workdir_prefix = workdir + '/'
+    read_prefixes = tuple(root.rstrip('/') + '/' for root in read_roots) + (workdir_prefix,)
+    _str, _int, _type, _isinstance, _PermissionError = str, int, type, isinstance, PermissionError
+
+    def resolve(path):
+        # Lexical only: the answer cannot create symlinks and cannot chdir
+        if _type(path) is not _str:
+            return None
+        if not path.startswith('/'):
+            path = workdir_prefix + path
+        parts = []
+        for part in path.split('/'):
+            if part == '..':
+                if parts:
+                    parts.pop()
+            elif part and part != '.':
+                parts.append(part)
+        return '/' + '/'.join(parts)
+
+    def guard(event, args):
+        if event.startswith(denied):
+            raise _PermissionError(f'{event} is not allowed')
+        if event == 'object.__getattr__' and args[1] in frame_attributes:
+            raise _PermissionError(f'{args[1]} is not allowed')
+        if event == 'import' and args[0] in denied_modules:
+            raise _PermissionError(f'import of {args[0]} is not allowed')
+        if event == 'open':
+            path, mode, flags = args
+            if _isinstance(path, _int):
+                return
+            resolved = resolve(path)
+            writing = (_isinstance(mode, _str) and ('w' in mode or 'a' in mode or 'x' in mode or '+' in mode)) \\
+                or (_isinstance(flags, _int) and flags & write_flags)
+            allowed = workdir_prefix if writing else read_prefixes
+            if resolved is None or not (resolved + '/').startswith(allowed):
+                raise _PermissionError('file access outside the working directory is not allowed')
+        elif event in path_events:
+            for path in (args[:2] if event == 'os.rename' else args[:1]):
+                resolved = resolve(path)
+                if resolved is None or not (resolved + '/').startswith(workdir_prefix):
+                    raise _PermissionError('file access outside the working directory is not allowed')
+
+    sys.addaudithook(guard)
+
+with open(sys.argv[1], encoding='utf-8') as handle:
+    source = handle.read()
+workdir = sys.argv[1].rsplit('/', 1)[0]
+read_roots = [path for path in sys.path if path.startswith('/')]
+del sys.argv[1:]
+install_guard(workdir, read_roots)
+del install_guard, workdir, read_roots, resource, types
+exec(compile(source, '<answer>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+'''
+
+# Uid and gid the answer runs as inside the OS-level sandbox (nobody)
+SANDBOX_UID = 65534
+
+def nsjail_prefix(workdir):
+    """nsjail: new network/user/mount namespaces, / read-only, only the workdir writable"""
+    return [
+        'nsjail', '--mode', 'o', '--really_quiet', '--chroot', '/', '--bindmount', workdir, '--cwd', workdir,
+        '--user', str(SANDBOX_UID), '--group', str(SANDBOX_UID), '--time_limit', '0',
+        '--env', 'PYTHONIOENCODING=utf-8', '--env', 'PYTHONHASHSEED=0', '--'
+    ]
+
+def bwrap_prefix(workdir):
+    """bubblewrap: every namespace unshared (no network), / read-only, only the workdir writable"""
+    return [
+        'bwrap', '--ro-bind', '/', '/', '--dev', '/dev', '--proc', '/proc', '--tmpfs', '/tmp',
+        '--bind', workdir, workdir, '--chdir', workdir, '--unshare-all', '--die-with-parent', '--new-session',
+        '--uid', str(SANDBOX_UID), '--gid', str(SANDBOX_UID), '--'
+    ]
+
+# OS-level sandboxes, in order of preference; 'none' runs unisolated (local development only)
+SANDBOXES = {
+    'nsjail': nsjail_prefix,
+    'bwrap': bwrap_prefix,
+}
+
+class SandboxLimits:
+    """Per-run resource limits"""
+
+    def __init__(self, cpu_seconds=2, memory_bytes=256 * 1024 * 1024, wall_seconds=5,
+                 file_bytes=1024 * 1024, output_bytes=64 * 1024):
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.wall_seconds = wall_seconds
+        self.file_bytes = file_bytes
+        self.output_bytes = output_bytes
+
+class RunResult:
+    """Outcome of one sandboxed run: status is ok, error, timeout or unsupported"""
+
+    def __init__(self, status, stdout='', stderr=''):
+        self.status = status
+        self.stdout = stdout
+        self.stderr = stderr
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+class GradingQueueFull(Exception):
+    """Raised when the grading queue is at capacity; retry later"""
+
+class SandboxUnavailable(Exception):
+    """Raised when no OS-level sandbox is configured; code is never run unisolated by default"""
+
+def detect_sandbox():
+    """Name of the first installed OS-level sandbox, or None"""
+    for name in SANDBOXES:
+        if shutil.which(name):
+            return name
+    return None
+
+def python_command(source_path, limits):
+    return [
+        sys.executable, '-I', '-S', '-c', PYTHON_BOOTSTRAP, source_path,
+        str(limits.cpu_seconds), str(limits.memory_bytes), str(limits.file_bytes)
+    ]
+
+# Language -> command builder; add a runner here to grade another language
+RUNNERS = {
+    'python': python_command,
+}
+
+def run_code(language, source, stdin='', limits=None, sandbox=None):
+    """Run `source` once in a fresh, resource-limited process inside an OS-level sandbox.
+
+    Each run gets its own process and scratch directory, so nothing leaks
+    between submissions. `sandbox` names an entry of SANDBOXES (no
+    network, unprivileged uid, read-only filesystem apart from the
+    scratch directory); 'none' must be asked for explicitly, and without
+    a sandbox SandboxUnavailable is raised instead of running anything.
+    """
+    runner = RUNNERS.get((language or '').lower())
+    if runner is None:
+        return RunResult('unsupported')
+    if sandbox != 'none' and sandbox not in SANDBOXES:
+        raise SandboxUnavailable(f'No OS-level sandbox configured (got {sandbox!r})')
+    limits = limits or SandboxLimits()
+
+    workdir = tempfile.mkdtemp(prefix='grade-')
+    try:
+        os.chmod(workdir, 0o777)
+        source_path = os.path.join(workdir, 'answer')
+        with open(source_path, 'w', encoding='utf-8') as handle:
+            handle.write(source)
+        os.chmod(source_path, 0o644)
+        prefix = SANDBOXES[sandbox](workdir) if sandbox != 'none' else []
+
+        process = subprocess.Popen(
+            prefix + runner(source_path, limits),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=workdir,
+            env={'PATH': '/usr/bin:/bin', 'PYTHONIOENCODING': 'utf-8', 'PYTHONHASHSEED': '0'},
+            start_new_session=True
+        )
+        try:
+            stdout, stderr = process.communicate((stdin or '').encode('utf-8'), timeout=limits.wall_seconds)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+            return RunResult('timeout')
+
+        stdout = stdout[:limits.output_bytes].decode('utf-8', 'replace')
+        stderr = stderr[:limits.output_bytes].decode('utf-8', 'replace')
+        if process.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+            # Killed for running past its CPU limit
+            return RunResult('timeout', stdout, stderr)
+        return RunResult('ok' if process.returncode == 0 else 'error', stdout, stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+class GradingPool:
+    """Bounded pool that runs sandboxed gradings, with backpressure and a result cache.
+
+    At most `workers` sandboxes run at once and at most `queue_size` more
+    wait; beyond that `submit()` raises GradingQueueFull. Results are
+    cached by a hash of (question fingerprint, normalized answer), so
+    identical submissions are graded once.
+    """
+
+    def __init__(self, workers=2, queue_size=64, cache_size=10000):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='grader')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(fingerprint, answer):
+        return hashlib.sha256(f'{fingerprint}\0{answer}'.encode('utf-8')).hexdigest()
+
+    def cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def submit(self, key, fn, *args):
+        """Schedule fn(*args) unless its result is cached; returns a Future"""
+        result = self.cached(key)
+        if result is not None:
+            future = Future()
+            future.set_result(result)
+            return future
+        if not self._slots.acquire(blocking=False):
+            raise GradingQueueFull('Grading queue is full')
+        try:
+            future = self._executor.submit(self._run, key, fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        return future
+
+    def _run(self, key, fn, *args):
+        try:
+            result = self.cached(key)
+            if result is None:
+                result = fn(*args)
+                with self._lock:
+                    self._cache[key] = result
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self._cache_size:
+                        self._cache.popitem(last=False)
+            return result
+        finally:
+            self._slots.release()
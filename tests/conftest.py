@@ -0,0 +1,70 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# Add the backend directory (parent of src) to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from sqlalchemy import event
+from src.models.database import db, KEYSET_INDEXES, UPSERT_INDEXES
+from src.routes.user import user_bp
+from src.routes.auth import auth_bp
+from src.routes.course import course_bp
+from src.routes.quiz import quiz_bp
+from src.routes.article import article_bp
+from src.routes.game import game_bp
+from src.routes.ai_tool import ai_tool_bp
+from src.routes.admin import admin_bp
+from src.utils.query_budget import init_query_budget
+
+@pytest.fixture
+def app(tmp_path):
+    """App wired like main.py, on a scratch SQLite database"""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'code_aura_test.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Threaded tests wait on SQLite's write lock instead of failing at once
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+
+    JWTManager(app)
+    db.init_app(app)
+    init_query_budget(app)
+
+    for blueprint in (user_bp, auth_bp, course_bp, quiz_bp, article_bp, game_bp, ai_tool_bp, admin_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+        for index in KEYSET_INDEXES + UPSERT_INDEXES:
+            index.create(bind=db.engine, checkfirst=True)
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting every statement sent to the database inside it"""
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    return counting
@@ -0,0 +1,65 @@
+import pytest
+from werkzeug.security import generate_password_hash
+from src.models.database import db, Article, Category, Course, Quiz, User
+
+PAGE_ROWS = (1, 25)
+
+def add_courses(count):
+    category = Category(name='تطوير الويب', description='دورات تطوير مواقع الويب')
+    db.session.add(category)
+    for index in range(count):
+        course = Course(
+            title=f'Course {index}',
+            description='A course',
+            language='english',
+            level='beginner',
+            programming_language='Python',
+            duration_minutes=60,
+            instructor_name='Instructor'
+        )
+        course.categories.append(category)
+        db.session.add(course)
+    db.session.commit()
+
+def add_quizzes(count):
+    for index in range(count):
+        db.session.add(Quiz(
+            title=f'Quiz {index}',
+            description='A quiz',
+            programming_language='Python',
+            level='beginner',
+            question_count=0,
+            time_limit_minutes=20
+        ))
+    db.session.commit()
+
+def add_articles(count):
+    author = User(username='author', email='author@example.com', password_hash=generate_password_hash('secret'))
+    db.session.add(author)
+    db.session.flush()
+    for index in range(count):
+        db.session.add(Article(title=f'Article {index}', content='Body ' * 100, author_id=author.id, is_published=True))
+    db.session.commit()
+
+# Articles are served at /api: main.py's url_prefix replaces the blueprint's own
+@pytest.mark.parametrize('url, endpoint, add_rows, key', [
+    ('/api/courses?per_page=50', 'course.get_courses', add_courses, 'courses'),
+    ('/api/quizzes?per_page=50', 'quiz.get_quizzes', add_quizzes, 'quizzes'),
+    ('/api?limit=50', 'article.get_all_articles', add_articles, 'articles'),
+])
+def test_listing_query_count_does_not_grow_with_rows(app, client, count_queries, url, endpoint, add_rows, key):
+    counts = []
+    for rows in PAGE_ROWS:
+        db.drop_all()
+        db.create_all()
+        add_rows(rows)
+        db.session.remove()
+
+        with count_queries() as statements:
+            response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.get_json()[key]) == rows
+        counts.append(len(statements))
+
+    assert counts[0] == counts[-1], f'{url} ran {counts[0]} queries for 1 row and {counts[-1]} for {PAGE_ROWS[-1]}'
+    assert counts[0] <= app.view_functions[endpoint].query_budget
@@ -0,0 +1,35 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+from src.models.database import db
+from src.utils.query_budget import QueryBudgetExceeded, query_budget
+
+def add_route(app, budget, queries):
+    @app.route('/budgeted')
+    @query_budget(budget)
+    def budgeted():
+        for _ in range(queries):
+            db.session.execute(text('SELECT 1'))
+        return 'ok'
+
+def test_over_budget_request_raises_in_testing(app, client):
+    add_route(app, budget=1, queries=2)
+
+    with pytest.raises(QueryBudgetExceeded, match='budgeted ran 2 queries \\(budget 1\\)'):
+        client.get('/budgeted')
+
+def test_over_budget_request_is_logged_when_not_raising(app, client, caplog):
+    app.config['QUERY_BUDGET_RAISE'] = False
+    add_route(app, budget=1, queries=2)
+
+    with caplog.at_level(logging.WARNING):
+        response = client.get('/budgeted')
+
+    assert response.status_code == 200
+    assert 'Query budget exceeded: budgeted ran 2 queries (budget 1)' in caplog.text
+
+def test_request_within_budget_passes(app, client):
+    add_route(app, budget=2, queries=2)
+
+    assert client.get('/budgeted').status_code == 200
@@ -0,0 +1,70 @@
+import random
+import threading
+
+import pytest
+from src.models.database import db, CourseRating, UserGameScore
+from src.utils import upsert as upsert_module
+from src.utils.upsert import upsert
+
+THREADS = 16
+WRITES_PER_THREAD = 50
+
+@pytest.fixture(params=['on_conflict', 'fallback'])
+def upsert_path(request, monkeypatch):
+    """Run each test through ON CONFLICT and through the UPDATE/INSERT fallback"""
+    if request.param == 'fallback':
+        monkeypatch.setattr(upsert_module, 'ON_CONFLICT_INSERTS', {})
+    return request.param
+
+def hammer(app, work):
+    """Run work(thread_index) in THREADS threads, each in its own app context; returns their errors"""
+    errors = []
+
+    def run(index):
+        with app.app_context():
+            try:
+                work(index)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+def test_concurrent_conditional_upserts_keep_one_row_with_the_maximum(app, upsert_path):
+    submitted = []
+
+    def work(index):
+        for _ in range(WRITES_PER_THREAD):
+            score = random.randint(0, 100000)
+            submitted.append(score)
+            upsert(UserGameScore, {'user_id': 1, 'game_id': 1, 'score': score},
+                   ['user_id', 'game_id'], where=lambda current, new: new.score > current.score)
+            db.session.commit()
+
+    errors = hammer(app, work)
+
+    assert errors == []
+    rows = UserGameScore.query.filter_by(user_id=1, game_id=1).all()
+    assert len(rows) == 1
+    assert rows[0].score == max(submitted)
+
+def test_concurrent_insert_if_missing_creates_one_row(app, upsert_path):
+    inserted = []
+
+    def work(index):
+        if upsert(CourseRating, {'user_id': 1, 'course_id': 1, 'rating': index % 5 + 1},
+                  ['user_id', 'course_id'], update_columns=[]):
+            inserted.append(index)
+        db.session.commit()
+
+    errors = hammer(app, work)
+
+    assert errors == []
+    assert CourseRating.query.filter_by(user_id=1, course_id=1).count() == 1
+    assert len(inserted) == 1
@@ -0,0 +1,90 @@
+from sqlalchemy import and_, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from src.models.database import db
+
+# Dialects with INSERT ... ON CONFLICT support
+ON_CONFLICT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+class _NewValues:
+    """Stands in for `excluded` when the fallback path builds the WHERE clause"""
+
+    def __init__(self, table, values):
+        self._table = table
+        self._values = values
+
+    def __getattr__(self, name):
+        return literal(self._values[name], type_=self._table.c[name].type)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+def upsert(model, values, conflict_columns, update_columns=None, where=None, update_expressions=None):
+    """Insert a row, or update the existing one, in a single statement where possible.
+
+    `conflict_columns` must be covered by a primary key or unique index.
+    `update_columns` defaults to every non-conflict column of `values`; an
+    empty list inserts only when the row is missing. `where` is a callable
+    `(current, new) -> clause` limiting when an existing row is updated,
+    e.g. `lambda current, new: new.score > current.score`.
+    `update_expressions` maps a column to such a callable giving its new
+    value on update instead of the inserted one, e.g.
+    `{'attempts': lambda current, new: current.attempts + 1}`.
+
+    Runs in the current transaction (the caller commits) and returns True
+    when a row was inserted or updated, False when nothing changed.
+    Python-side `onupdate` defaults are not applied; pass such columns in
+    `values`.
+    """
+    table = model.__table__
+    update_expressions = update_expressions or {}
+    if update_columns is None:
+        update_columns = [name for name in values if name not in conflict_columns and name not in update_expressions]
+
+    insert = ON_CONFLICT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        return _upsert_fallback(table, values, conflict_columns, update_columns, where, update_expressions)
+
+    stmt = insert(table).values(**values)
+    if update_columns or update_expressions:
+        set_ = {name: stmt.excluded[name] for name in update_columns}
+        set_.update({name: expression(table.c, stmt.excluded) for name, expression in update_expressions.items()})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_=set_,
+            where=where(table.c, stmt.excluded) if where else None
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+
+    return db.session.execute(stmt).rowcount > 0
+
+def _upsert_fallback(table, values, conflict_columns, update_columns, where, update_expressions):
+    # UPDATE first (the common case for repeat writers), then INSERT in a
+    # savepoint; a concurrent insert of the same key makes us update again
+    new = _NewValues(table, values)
+
+    def update_existing():
+        if not update_columns and not update_expressions:
+            return False
+        stmt = table.update().where(
+            and_(*[table.c[name] == values[name] for name in conflict_columns])
+        )
+        if where:
+            stmt = stmt.where(where(table.c, new))
+        set_ = {name: values[name] for name in update_columns}
+        set_.update({name: expression(table.c, new) for name, expression in update_expressions.items()})
+        return db.session.execute(stmt.values(**set_)).rowcount > 0
+
+    if update_existing():
+        return True
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(**values))
+        return True
+    except IntegrityError:
+        return update_existing()